@@ -2,6 +2,14 @@
 Agent Hub Python API package.
 """
 
-from .main import app
+from typing import Any
 
 __all__ = ["app"]
+
+
+def __getattr__(name: str) -> Any:
+    # Build the app on first access so `import api.utils...` (e.g. in worker processes) stays cheap
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
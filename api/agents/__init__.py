@@ -1,4 +1,16 @@
-from .chat_agent import ChatAgentService
-from .image_analysis_agent import ImageAnalysisAgent
+from typing import Any
 
-__all__ = ["ChatAgentService", "ImageAnalysisAgent"]
+from .agent_registry import AgentRegistry, AgentUnavailableError, agent_registry
+
+__all__ = ["AgentRegistry", "AgentUnavailableError", "agent_registry", "ChatAgentService", "ImageAnalysisAgent"]
+
+
+def __getattr__(name: str) -> Any:
+    # Imported on first access; the agent modules pull in Semantic Kernel and the Azure SDKs
+    if name == "ChatAgentService":
+        from .chat_agent import ChatAgentService
+        return ChatAgentService
+    if name == "ImageAnalysisAgent":
+        from .image_analysis_agent import ImageAnalysisAgent
+        return ImageAnalysisAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+from ..utils.cache_utils import TTLCache
+
+
+class AgentClientPool:
+    """Process-wide Azure AI agent client shared across requests, with a TTL cache of agent definitions"""
+
+    def __init__(self, endpoint: Optional[str] = None):
+        load_dotenv()
+
+        self.logger = logging.getLogger(__name__)
+        self.endpoint = endpoint or os.getenv("AZURE_AI_AGENT_ENDPOINT")
+        # Create the client on the first request instead of at startup
+        self.lazy = os.getenv("AGENT_CLIENT_LAZY_INIT", "false").lower() == "true"
+        self._definitions = TTLCache(
+            max_entries=int(os.getenv("AZURE_AI_AGENT_DEFINITION_CACHE_SIZE", "32")),
+            ttl_seconds=float(os.getenv("AZURE_AI_AGENT_DEFINITION_TTL_SECONDS", "300"))
+        )
+        self._credential: Optional[Any] = None
+        self._client: Optional[Any] = None
+        self._lock = asyncio.Lock()
+
+        self.client_creations = 0
+        self.client_reuses = 0
+
+    async def start(self) -> None:
+        """Create the shared credential and client if they do not exist yet"""
+        async with self._lock:
+            if self._client is not None:
+                return
+            # Deferred so importing the API does not load Semantic Kernel and the Azure SDKs
+            from azure.identity.aio import DefaultAzureCredential
+            from semantic_kernel.agents import AzureAIAgent
+
+            credential = DefaultAzureCredential()
+            try:
+                self._client = AzureAIAgent.create_client(
+                    credential=credential, endpoint=self.endpoint)
+            except Exception:
+                await credential.close()
+                raise
+            self._credential = credential
+            self.client_creations += 1
+            self.logger.info("Created shared Azure AI agent client")
+
+    async def warm_up(self, agent_id: Optional[str] = None) -> None:
+        """
+        Create the client and fetch an agent's definition, e.g. from the FastAPI lifespan
+
+        The definition call acquires the first credential token, so the first request pays for
+        neither, and a wrong endpoint, credential or agent ID shows up at startup.
+
+        Args:
+            agent_id: Agent whose definition to cache; only the client is created when omitted
+        """
+        client = await self.get_client(count_reuse=False)
+        if agent_id:
+            self._definitions.set(agent_id, await client.agents.get_agent(agent_id=agent_id))
+
+    async def get_client(self, count_reuse: bool = True) -> Any:
+        """
+        Get the shared Azure AI project client, creating it on first use
+
+        Args:
+            count_reuse: Whether to count the call in client_reuses; False for background work such
+                as health probes, so the counter reflects requests only
+
+        Returns:
+            The long-lived async AIProjectClient
+        """
+        if self._client is None:
+            await self.start()
+        elif count_reuse:
+            self.client_reuses += 1
+        return self._client
+
+    async def get_agent_definition(self, agent_id: str) -> Any:
+        """
+        Get an agent definition, served from the cache while it is fresh
+
+        Args:
+            agent_id: ID of the agent on the Azure AI agent service
+
+        Returns:
+            The agent definition returned by the agent service
+        """
+        definition = self._definitions.get(agent_id)
+        if definition is None:
+            client = await self.get_client()
+            definition = await client.agents.get_agent(agent_id=agent_id)
+            self._definitions.set(agent_id, definition)
+        return definition
+
+    def invalidate_agent_definition(self, agent_id: Optional[str] = None) -> None:
+        """
+        Drop a cached agent definition so the next request fetches it again
+
+        Args:
+            agent_id: ID of the agent to invalidate, or None to invalidate every agent
+        """
+        self._definitions.invalidate(agent_id)
+        self.logger.info(f"Invalidated cached agent definition: {agent_id or 'all'}")
+
+    async def close(self) -> None:
+        """Close the shared client and credential"""
+        async with self._lock:
+            if self._client is not None:
+                await self._client.close()
+                self._client = None
+            if self._credential is not None:
+                await self._credential.close()
+                self._credential = None
+            self._definitions.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return client reuse and agent definition cache counters"""
+        return {
+            "client_creations": self.client_creations,
+            "client_reuses": self.client_reuses,
+            "agent_definition_cache": self._definitions.stats(),
+        }
+
+
+# Shared by every ChatAgentService in the process; opened and closed by the FastAPI lifespan
+agent_client_pool = AgentClientPool()
@@ -0,0 +1,110 @@
+import time
+import asyncio
+from typing import Any, Dict
+
+
+class AgentBusyError(RuntimeError):
+    """Raised when a request cannot get an agent slot"""
+
+
+class AgentQueueFullError(AgentBusyError):
+    """Raised without waiting when the agent's wait queue is already full"""
+
+
+class AgentQueueTimeoutError(AgentBusyError):
+    """Raised when a queued request did not get a slot within the queue timeout"""
+
+
+class AgentLease:
+    """A held agent slot; release() is idempotent so every exit path can call it"""
+
+    __slots__ = ("_limiter", "_released")
+
+    def __init__(self, limiter: "AgentLimiter"):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+
+class AgentLimiter:
+    """Caps in-flight requests for one agent, queueing the excess for a bounded time"""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout_seconds: float):
+        """
+        Args:
+            name: Agent name, used in error messages
+            max_in_flight: Requests allowed to run at once
+            max_queue: Requests allowed to wait for a slot; further requests are rejected immediately
+            queue_timeout_seconds: Longest time a request waits for a slot
+        """
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def acquire(self) -> AgentLease:
+        """
+        Wait for a slot
+
+        Returns:
+            A lease that must be released when the request finishes
+
+        Raises:
+            AgentQueueFullError: If the agent is saturated and max_queue requests are already waiting
+            AgentQueueTimeoutError: If no slot freed up within the queue timeout
+        """
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending, so it never counts as queued
+            await self._semaphore.acquire()
+        elif self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AgentQueueFullError(f"Agent '{self.name}' is at capacity; try again later")
+        else:
+            self.queued += 1
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise AgentQueueTimeoutError(
+                    f"Agent '{self.name}' did not accept the request within {self.queue_timeout_seconds:g}s")
+            finally:
+                self.queued -= 1
+
+            waited = time.monotonic() - start
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.admitted += 1
+        self.in_flight += 1
+        return AgentLease(self)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return slot usage, queue depth and wait time counters"""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+        }
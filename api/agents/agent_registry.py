@@ -0,0 +1,242 @@
+import os
+import time
+import asyncio
+import inspect
+import logging
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from ..models.api_models import ChatRequest, ChatThreadRequest, RequestResult
+from .agent_limiter import AgentLimiter
+
+
+class AgentUnavailableError(RuntimeError):
+    """Raised when an agent could not be constructed"""
+
+
+class AgentRegistry:
+    """
+    Builds agent services on first use (or at startup when configured) and owns their lifetime
+
+    Factories import their agent modules themselves, so importing the API does not pull in
+    Semantic Kernel or the Azure SDKs, and one misconfigured agent only fails its own routes.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._handlers: Dict[str, Callable[[Any, ChatRequest], Awaitable[RequestResult]]] = {}
+        self._limiters: Dict[str, AgentLimiter] = {}
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._build_order: List[str] = []
+        self.startup_timings: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any],
+                 handler: Optional[Callable[[Any, ChatRequest], Awaitable[RequestResult]]] = None,
+                 max_in_flight: int = 8, max_queue: int = 32, queue_timeout_seconds: float = 10) -> None:
+        """
+        Register an agent
+
+        Limits can be overridden with AGENT_<NAME>_MAX_IN_FLIGHT, AGENT_<NAME>_MAX_QUEUE and
+        AGENT_<NAME>_QUEUE_TIMEOUT_SECONDS.
+
+        Args:
+            name: Agent name used by routes, /agents/{name}/invoke and AGENT_EAGER_INIT
+            factory: Sync or async callable returning the agent; sync factories run in a worker thread
+            handler: Coroutine serving /agents/{name}/invoke with the built agent, or None if the agent
+                is not invocable through the generic route
+            max_in_flight: Requests allowed to run on the agent at once
+            max_queue: Requests allowed to wait for a slot before new ones are rejected
+            queue_timeout_seconds: Longest time a request waits for a slot
+        """
+        env_prefix = f"AGENT_{name.upper()}_"
+        self._factories[name] = factory
+        if handler:
+            self._handlers[name] = handler
+        self._limiters[name] = AgentLimiter(
+            name,
+            max_in_flight=int(os.getenv(env_prefix + "MAX_IN_FLIGHT", str(max_in_flight))),
+            max_queue=int(os.getenv(env_prefix + "MAX_QUEUE", str(max_queue))),
+            queue_timeout_seconds=float(os.getenv(env_prefix + "QUEUE_TIMEOUT_SECONDS", str(queue_timeout_seconds)))
+        )
+        self._locks[name] = asyncio.Lock()
+
+    async def get(self, name: str) -> Any:
+        """
+        Get an agent, building it on first use
+
+        Args:
+            name: Registered agent name
+
+        Returns:
+            The agent instance
+
+        Raises:
+            AgentUnavailableError: If the agent is unknown or its factory failed
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise AgentUnavailableError(f"Unknown agent '{name}'")
+
+        async with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+
+            factory = self._factories[name]
+            start = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(factory):
+                    instance = await factory()
+                else:
+                    # Constructors import SDKs and read config; keep that off the event loop
+                    instance = await asyncio.to_thread(factory)
+            except Exception as e:
+                self._errors[name] = str(e)
+                self.logger.error(f"Failed to build agent '{name}': {e}")
+                raise AgentUnavailableError(f"Agent '{name}' is unavailable: {e}") from e
+
+            elapsed = time.perf_counter() - start
+            self.startup_timings[f"agent:{name}"] = round(elapsed, 3)
+            self._errors.pop(name, None)
+            self._instances[name] = instance
+            self._build_order.append(name)
+            self.logger.info(f"Built agent '{name}' in {elapsed:.3f}s")
+            return instance
+
+    def limiter(self, name: str) -> AgentLimiter:
+        """Get the concurrency limiter of a registered agent"""
+        if name not in self._limiters:
+            raise AgentUnavailableError(f"Unknown agent '{name}'")
+        return self._limiters[name]
+
+    def handler(self, name: str) -> Optional[Callable[[Any, ChatRequest], Awaitable[RequestResult]]]:
+        """Get the generic invoke handler of an agent, or None if it has none"""
+        return self._handlers.get(name)
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Get an agent only if it has already been built"""
+        return self._instances.get(name)
+
+    async def start(self, names: Optional[List[str]] = None) -> None:
+        """
+        Build agents eagerly, e.g. from the FastAPI lifespan; failures are logged, not raised
+
+        Args:
+            names: Agents to build; read from AGENT_EAGER_INIT ("all" or a comma-separated list) when omitted
+        """
+        if names is None:
+            setting = os.getenv("AGENT_EAGER_INIT", "").strip()
+            if setting.lower() in ("", "false", "none"):
+                return
+            names = list(self._factories) if setting.lower() in ("all", "true") else [
+                name.strip() for name in setting.split(",") if name.strip()]
+
+        for name in names:
+            try:
+                await self.get(name)
+            except AgentUnavailableError:
+                # Already logged; the agent's routes answer 503 and retry the build on the next request
+                pass
+
+    @contextmanager
+    def timed(self, component: str) -> Iterator[None]:
+        """Record how long a startup step takes under startup_timings"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[component] = round(time.perf_counter() - start, 3)
+
+    async def close(self) -> None:
+        """Close built agents in reverse build order"""
+        for name in reversed(self._build_order):
+            close = getattr(self._instances[name], "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.logger.warning(f"Error closing agent '{name}': {e}")
+        self._instances.clear()
+        self._build_order.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return which agents are built, build failures, slot and queue counters and startup timings"""
+        return {
+            "agents": {
+                name: {
+                    "built": name in self._instances,
+                    "error": self._errors.get(name),
+                    "invocable": name in self._handlers,
+                    "limits": self._limiters[name].stats(),
+                } for name in self._factories
+            },
+            "startup_timings": dict(self.startup_timings),
+        }
+
+
+def _new_chat_agent_service():
+    from .chat_agent import ChatAgentService
+    return ChatAgentService()
+
+
+async def _build_chat_agent():
+    from .agent_client_pool import agent_client_pool
+    service = await asyncio.to_thread(_new_chat_agent_service)
+    try:
+        with agent_registry.timed("agent_client_pool"):
+            await agent_client_pool.start()
+    except Exception as e:
+        # Leave the agent usable; the pool retries on the first chat request
+        agent_registry.logger.warning(f"Shared agent client not created: {e}")
+    if service.thread_pool:
+        # Filled in the background, so with AGENT_EAGER_INIT even the first chat turn can take a thread
+        service.thread_pool.start()
+    return service
+
+
+def _build_image_analysis_agent():
+    from .image_analysis_agent import ImageAnalysisAgent
+    return ImageAnalysisAgent()
+
+
+async def _invoke_chat(agent: Any, request: ChatRequest) -> RequestResult:
+    return await agent.run_chat_sk(ChatThreadRequest(
+        message=request.message,
+        thread_id=request.thread_id,
+        file=request.file,
+        files=request.files
+    ))
+
+
+async def _invoke_image_analysis(agent: Any, request: ChatRequest) -> RequestResult:
+    if not request.files:
+        raise ValueError("No images provided for analysis")
+    return await agent.analyze_images(ChatThreadRequest(
+        message=request.message,
+        thread_id=request.thread_id,
+        files=request.files,
+        bypass_cache=request.bypass_cache
+    ))
+
+
+async def _build_image_batch_jobs():
+    from .image_batch_jobs import ImageBatchJobManager
+    return ImageBatchJobManager(await agent_registry.get("image_analysis"))
+
+
+agent_registry = AgentRegistry()
+agent_registry.register("chat", _build_chat_agent, handler=_invoke_chat,
+                        max_in_flight=16, max_queue=64, queue_timeout_seconds=10)
+# Image requests hold a model call per image set for much longer than a chat turn; keep them
+# from taking the upstream quota chat needs
+agent_registry.register("image_analysis", _build_image_analysis_agent, handler=_invoke_image_analysis,
+                        max_in_flight=4, max_queue=32, queue_timeout_seconds=30)
+# Batch items are bounded by IMAGE_BATCH_CONCURRENCY instead of a slot limit
+agent_registry.register("image_batch", _build_image_batch_jobs)
@@ -1,6 +1,8 @@
 import os
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
+
+from .prompt_store import Prompt, prompt_store
 
 
 class AgentUtils:
@@ -11,29 +13,43 @@ class AgentUtils:
     
     def get_system_prompt(self, prompt_filename: str) -> str:
         """
-        Load system prompt from a text file in the prompts directory
+        Get the text of a system prompt from the shared prompt store
         
         Args:
             prompt_filename: Name of the prompt file (e.g., 'image_analysis_system_prompt.txt')
             
         Returns:
             The content of the prompt file as a string
+
+        Raises:
+            PromptError: If the prompt file has never been readable
+        """
+        return self.get_prompt(prompt_filename).text
+
+    def get_prompt(self, prompt_filename: str) -> Prompt:
         """
-        try:
-            # Get the directory of the agents module
-            agents_dir = os.path.dirname(os.path.abspath(__file__))
-            prompt_file_path = os.path.join(agents_dir, "prompts", prompt_filename)
+        Get a system prompt together with its version ID, reloaded when the file changes
+        
+        Args:
+            prompt_filename: Name of the prompt file (e.g., 'image_analysis_system_prompt.txt')
             
-            with open(prompt_file_path, 'r', encoding='utf-8') as file:
-                return file.read().strip()
-        except FileNotFoundError:
-            self.logger.error(f"System prompt file not found at {prompt_file_path}")
-            # Fallback to a basic prompt
-            return "You are an AI assistant designed to help with various tasks."
-        except Exception as e:
-            self.logger.error(f"Error reading system prompt file: {e}")
-            # Fallback to a basic prompt
-            return "You are an AI assistant designed to help with various tasks."
+        Returns:
+            The current prompt; its version feeds cache keys and metrics
+
+        Raises:
+            PromptError: If the prompt file has never been readable
+        """
+        return prompt_store.get(prompt_filename)
+
+    def declare_prompt_values(self, prompt_filename: str, values: Dict[str, Any]) -> None:
+        """
+        Declare the placeholder values a prompt is rendered with, so a reload that needs others is refused
+
+        Args:
+            prompt_filename: Name of the prompt file (e.g., 'image_analysis_system_prompt.txt')
+            values: Values passed to Prompt.render
+        """
+        prompt_store.declare_values(prompt_filename, values)
     
     def validate_azure_openai_config(self, endpoint: Optional[str], api_key: Optional[str]) -> bool:
         """
@@ -78,8 +94,7 @@ class AgentUtils:
         Returns:
             Full path to the prompt file
         """
-        agents_dir = os.path.dirname(os.path.abspath(__file__))
-        return os.path.join(agents_dir, "prompts", prompt_filename)
+        return os.path.join(prompt_store.directory, prompt_filename)
     
     def validate_prompt_file_exists(self, prompt_filename: str) -> bool:
         """
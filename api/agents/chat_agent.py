@@ -1,21 +1,27 @@
-from ..models.api_models import Source, FileReference, ChatThreadRequest, RequestResult
+from ..models.api_models import ChatThreadRequest, RequestResult
 import os
+import time
 import uuid
-from typing import List, Optional
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, List, Optional, Tuple
 from dotenv import load_dotenv
 from opentelemetry import trace
-from azure.ai.projects import AIProjectClient
-from azure.storage.blob import BlobServiceClient
-from azure.identity.aio import DefaultAzureCredential
-from azure.identity import DefaultAzureCredential as SyncDefaultAzureCredential
-from azure.ai.agents.models import FileSearchTool
+from azure.storage.blob.aio import BlobServiceClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.ai.agents.models import (
+    FileSearchTool,
+    ListSortOrder,
+    RunStatus,
+    VectorStoreExpirationPolicy,
+    VectorStoreExpirationPolicyAnchor
+)
 
 from semantic_kernel.contents import (
     ChatMessageContent,
     FunctionCallContent,
     StreamingChatMessageContent,
-    StreamingAnnotationContent,
-    StreamingFileReferenceContent,
     ImageContent,
     FileReferenceContent
 )
@@ -23,246 +29,466 @@ from semantic_kernel.agents import AzureAIAgent, AzureAIAgentThread
 
 from ..utils.file_utils import download_and_process_file, create_chat_message_content
 from .agent_utils import AgentUtils
+from ..utils.thread_vector_store_cache import ThreadVectorStoreCache
+from ..utils.agent_file_cache import AgentFileCache
+from ..utils.document_vector_stores import DocumentVectorStoreIndex, SHARED_DOCUMENT_METADATA_KEY
+from ..utils.stream_accumulator import StreamAccumulator
+from ..utils.metrics import RequestTracker, stage_duration, track_stage
+from ..utils.resilience import UpstreamGuard
+from .agent_client_pool import AgentClientPool, agent_client_pool
+from .thread_warm_pool import ThreadWarmPool
+
+logger = logging.getLogger(__name__)
 
 
 class ChatAgentService:
-    def __init__(self):
+    def __init__(self, client_pool: Optional[AgentClientPool] = None):
         load_dotenv()
 
         self.agent_utils = AgentUtils()
+        self.client_pool = client_pool or agent_client_pool
         self.agent_id = os.getenv("AZURE_AI_AGENT_ID")
         blob_connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
+        self.document_container_name = os.getenv("AZURE_BLOB_DOCUMENT_CONTAINER_NAME", "documents")
+        self.document_spool_max_bytes = int(os.getenv("DOCUMENT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
         self.blob_service_client = None
 
         if blob_connection_string:
+            # Documents are streamed in 4 MiB ranges rather than read into memory whole
             self.blob_service_client = BlobServiceClient.from_connection_string(
-                blob_connection_string)
+                blob_connection_string,
+                max_single_get_size=4 * 1024 * 1024,
+                max_chunk_get_size=4 * 1024 * 1024)
+
+        # Thread -> vector store mappings, so adding a file to a known thread skips threads.get
+        self.vector_store_cache = ThreadVectorStoreCache(
+            max_entries=int(os.getenv("THREAD_VECTOR_STORE_CACHE_MAX_ENTRIES", "1024")),
+            db_path=os.getenv("THREAD_VECTOR_STORE_CACHE_DB_PATH") or None
+        )
+
+        # Document content hash -> agent file mappings, so a document is uploaded once
+        self.file_cache = AgentFileCache(
+            max_entries=int(os.getenv("AGENT_FILE_CACHE_MAX_ENTRIES", "1024")),
+            db_path=os.getenv("AGENT_FILE_CACHE_DB_PATH") or None
+        )
+
+        # Content hash -> vector store indexing that document, shared by every thread that starts from it
+        self.document_stores = DocumentVectorStoreIndex(
+            self._delete_vector_store,
+            idle_seconds=float(os.getenv("DOCUMENT_VECTOR_STORE_IDLE_SECONDS", "3600")),
+            sweep_interval_seconds=float(os.getenv("DOCUMENT_VECTOR_STORE_SWEEP_SECONDS", "300"))
+        )
+        # Backstop for stores this process loses track of; the service deletes them after this much inactivity
+        self.document_store_expiry_days = int(os.getenv("DOCUMENT_VECTOR_STORE_EXPIRY_DAYS", "7"))
+
+        # Empty threads created ahead of time for first turns without a file (optional)
+        thread_pool_size = int(os.getenv("AGENT_THREAD_POOL_SIZE", "0"))
+        self.thread_pool = ThreadWarmPool(
+            self.client_pool.get_client,
+            size=thread_pool_size,
+            max_age_seconds=float(os.getenv("AGENT_THREAD_POOL_MAX_AGE_SECONDS", "3600"))
+        ) if thread_pool_size > 0 else None
+
+        # Deadlines and circuit breaker for agent service calls. HTTP retries stay with the Azure SDK
+        # pipeline (which honours Retry-After), and a started run is never re-invoked: that would post
+        # the user message to the thread twice
+        self.upstream = UpstreamGuard(
+            "agent_service",
+            timeouts={"get_agent": 15, "vector_store": 300, "first_token": 90, "stream_idle": 60},
+            max_attempts=1
+        )
 
         # Log initialization details
         config_details = {
             "Agent ID": self.agent_id,
             "Blob Connection String": blob_connection_string,
-            "Blob Storage Configured": bool(self.blob_service_client)
+            "Blob Storage Configured": bool(self.blob_service_client),
+            "Document Container": self.document_container_name,
+            "Vector Store Cache DB": os.getenv("THREAD_VECTOR_STORE_CACHE_DB_PATH", ""),
+            "Agent File Cache DB": os.getenv("AGENT_FILE_CACHE_DB_PATH", ""),
+            "Thread Pool Size": thread_pool_size
         }
         self.agent_utils.log_agent_initialization("ChatAgentService", config_details)
 
     async def run_chat_sk(self, request: ChatThreadRequest) -> RequestResult:
         """Run chat with Semantic Kernel agent"""
+        async with aclosing(self.stream_chat_sk(request)) as events:
+            async for event_type, payload in events:
+                if event_type == "done":
+                    return payload
+        raise ValueError("No response received from the agent.")
+
+    async def stream_chat_sk(self, request: ChatThreadRequest) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Run chat with Semantic Kernel agent, yielding events as soon as the agent produces them
+
+        Yields:
+            (event_type, payload) tuples: ("thread", thread_id), ("delta", {"content", "code"}),
+            ("annotation", Source), ("file", FileReference), ("function_call", step) and a final
+            ("done", RequestResult)
+        """
         tracer = trace.get_tracer(__name__)
 
-        with tracer.start_as_current_span("Agent: Chat") as current_span:
+        with tracer.start_as_current_span("Agent: Chat") as current_span, RequestTracker("chat") as tracker:
             # Validate the request object
             if not request.message:
                 raise ValueError("No messages found in request.")
 
             user_message = request.message
 
-            # Check if a file was specified in the request
-            file_content = None
-            ai_project_file = None
+            # A requested document is streamed from blob storage and uploaded while the agent is set up
+            ingestion: Optional[asyncio.Task] = None
             if request.file and self.blob_service_client:
-                file_content, ai_project_file = await download_and_process_file(
-                    self.blob_service_client, request.file
-                )
+                ingestion = asyncio.create_task(self._ingest_document(request.file))
 
-            # Define a list to hold callback message content
+            # Define a list to hold callback message content; steps not yet streamed wait in pending_steps
             intermediate_steps: list[str] = []
+            pending_steps: list[str] = []
 
             async def handle_intermediate_steps(message: ChatMessageContent) -> None:
-                print("handle_intermediate_steps")
+                # Completed run steps carry the service's token usage
+                if message.metadata:
+                    tracker.usage(message.metadata.get("usage"))
                 if any(isinstance(item, FunctionCallContent) for item in message.items):
                     for fcc in message.items:
                         if isinstance(fcc, FunctionCallContent):
-                            intermediate_steps.append(
-                                f"Function Call: {fcc.name} with arguments: {fcc.arguments}"
-                            )
+                            step = f"Function Call: {fcc.name} with arguments: {fcc.arguments}"
+                            intermediate_steps.append(step)
+                            pending_steps.append(step)
                         else:
-                            print(f"{message.role}: {message.content}")
+                            logger.debug("Intermediate %s message: %s", message.role, message)
                 else:
-                    print(f"{message.role}: {message.content}")
-
-            creds = DefaultAzureCredential()
-            async with (AzureAIAgent.create_client(credential=creds) as client,):
-                # Create an agent on the Azure AI agent service. Create a Semantic Kernel agent for the Azure AI agent
-                if not self.agent_id:
-                    raise ValueError("AZURE_AI_AGENT_ID is not set")
-                agent_definition = await client.agents.get_agent(agent_id=self.agent_id)
-                agent = AzureAIAgent(
-                    client=client, definition=agent_definition)
-                thread: Optional[AzureAIAgentThread] = None
-
-                if request.thread_id:
-                    thread = AzureAIAgentThread(
-                        client=client, thread_id=request.thread_id)
-
-                if ai_project_file:
-                    try:
-                        project_client = AIProjectClient(
-                            credential=SyncDefaultAzureCredential(),
-                            endpoint=os.environ["AZURE_AI_AGENT_ENDPOINT"]
-                        )
-
-                        with project_client:
-                            # Check if we need to create a thread with vector store functionality
-                            thread_id = request.thread_id
-
-                            if not thread and not request.thread_id:
-                                # Create a vector store first
-                                print(
-                                    f"Creating new vector store with file ID: {ai_project_file.id}")
-                                vector_store = project_client.agents.vector_stores.create_and_poll(
-                                    file_ids=[ai_project_file.id],
-                                    name=f"rutzsco_paif_vs_{uuid.uuid4()}"
-                                )
-                                print(
-                                    f"Created vector store with ID: {vector_store.id}")
-
-                                # Create file search tool with the vector store
-                                file_search_tool = FileSearchTool(
-                                    vector_store_ids=[vector_store.id])
-
-                                # Create thread with the file search tool resources
-                                print(
-                                    "Creating new thread with vector store attachment")
-                                thread_response = project_client.agents.threads.create(
-                                    tool_resources=file_search_tool.resources
-                                )
-                                thread_id = thread_response.id
-                                thread = AzureAIAgentThread(
-                                    client=client, thread_id=thread_id)
-                                print(
-                                    f"Created new thread with ID: {thread_id} and vector store {vector_store.id}")
-
-                            elif thread_id:
-                                # Check if the existing thread already has a vector store
-                                vector_store_id = None
-                                try:
-                                    thread_details = project_client.agents.threads.get(
-                                        thread_id)
-                                    if (hasattr(thread_details, 'tool_resources') and
-                                        thread_details.tool_resources and
-                                        hasattr(thread_details.tool_resources, 'file_search') and
-                                        thread_details.tool_resources.file_search and
-                                            hasattr(thread_details.tool_resources.file_search, 'vector_store_ids')):
-                                        vector_store_ids = thread_details.tool_resources.file_search.vector_store_ids
-                                        if vector_store_ids:
-                                            vector_store_id = vector_store_ids[0]
-                                            print(
-                                                f"Found existing vector store ID: {vector_store_id}")
-                                except Exception as e:
-                                    print(f"Could not get thread details: {e}")
-
-                                if vector_store_id:
-                                    # Add the file to the existing vector store
-                                    print(
-                                        f"Adding file {ai_project_file.id} to existing vector store {vector_store_id}")
-                                    project_client.agents.vector_store_files.create_and_poll(
-                                        vector_store_id=vector_store_id,
-                                        file_id=ai_project_file.id
-                                    )
-                                    print(
-                                        f"Added file to existing vector store {vector_store_id}")
-                                else:
-                                    # Create a new vector store and update the thread
-                                    print(
-                                        f"Creating new vector store with file ID: {ai_project_file.id}")
-                                    vector_store = project_client.agents.vector_stores.create_and_poll(
-                                        file_ids=[ai_project_file.id],
-                                        name=f"rutzsco_paif_vs_{uuid.uuid4()}"
-                                    )
-                                    print(
-                                        f"Created vector store with ID: {vector_store.id}")
-
-                                    # Update the existing thread with file search tool resources
-                                    file_search_tool = FileSearchTool(
-                                        vector_store_ids=[vector_store.id])
-                                    project_client.agents.threads.update(
-                                        thread_id=thread_id,
-                                        tool_resources=file_search_tool.resources
-                                    )
-                                    print(
-                                        f"Updated thread {thread_id} with vector store {vector_store.id}")
-
-                    except Exception as e:
-                        print(f"Error setting up vector store: {e}")
-
-                annotations: list[StreamingAnnotationContent] = []
-                files: list[StreamingFileReferenceContent] = []
-                sources = []
-                file_references = []
-                responseContent = ''
-                code_output_content = ''
-
+                    logger.debug("Intermediate %s message: %s", message.role, message)
+
+            # Create a Semantic Kernel agent for the cached Azure AI agent definition on the shared client
+            if not self.agent_id:
+                raise ValueError("AZURE_AI_AGENT_ID is not set")
+            try:
+                with track_stage("chat", "get_client"):
+                    # Includes credential acquisition when the shared client is created on this request
+                    client = await self.client_pool.get_client()
+                with track_stage("chat", "get_agent"):
+                    agent_definition = await self.upstream.call(
+                        "get_agent", lambda: self.client_pool.get_agent_definition(self.agent_id))
+
+                ai_project_file = None
+                document_digest = ""
+                if ingestion:
+                    # Only the part of the ingestion that outlasted the agent setup is on this stage
+                    with track_stage("chat", "blob_download"):
+                        try:
+                            _, ai_project_file, document_digest = await ingestion
+                        except Exception as e:
+                            logger.warning("Could not ingest document %s, continuing without it: %s", request.file, e)
+            finally:
+                if ingestion and not ingestion.done():
+                    ingestion.cancel()
+            agent = AzureAIAgent(
+                client=client, definition=agent_definition)
+            thread: Optional[AzureAIAgentThread] = None
+
+            if request.thread_id:
+                thread = AzureAIAgentThread(
+                    client=client, thread_id=request.thread_id)
+
+            if ai_project_file:
                 try:
-                    # Create the appropriate ChatMessageContent based on whether we have a file
-                    cmc = create_chat_message_content(
-                        user_message=user_message,
-                        # file_content=file_content,
-                        # file_name=request.file,
-                        # ai_project_file=ai_project_file
-                    )
-
-                    async for result in agent.invoke_stream(
-                        messages=cmc[0] if cmc else user_message,
-                        thread=thread,
-                        on_intermediate_message=handle_intermediate_steps
-                    ):
-                        response = result
-
-                        annotations.extend([
-                            item for item in result.items
-                            if isinstance(item, StreamingAnnotationContent)
-                        ])
-                        files.extend([
-                            item for item in result.items
-                            if isinstance(item, StreamingFileReferenceContent)
-                        ])
-
-                        if isinstance(result.message, StreamingChatMessageContent):
-                            responseContent += result.message.content
-                        else:
-                            print(f"{result}")
-
-                        # Check for code in metadata
-                        if (hasattr(result, 'metadata') and result.metadata and
-                                result.metadata.get("code") is True):
-                            if (isinstance(result.message, StreamingChatMessageContent) and
-                                    result.message.content):
-                                code_output_content += result.message.content
-
-                    thread = response.thread  # type: ignore
-
-                    # Extract annotations from the ChatMessageContent response
-                    for item in annotations:
-                        source = Source(
-                            quote=item.quote if hasattr(
-                                item, 'quote') and item.quote else '',
-                            title=item.title if hasattr(
-                                item, 'title') and item.title else '',
-                            url=item.url if hasattr(
-                                item, 'url') and item.url else '',
-                            start_index=str(item.start_index) if hasattr(
-                                item, 'start_index') and item.start_index is not None else '',
-                            end_index=str(item.end_index) if hasattr(
-                                item, 'end_index') and item.end_index is not None else ''
+                    # The async operations on the shared client poll with asyncio.sleep, so indexing
+                    # a large file no longer stalls other requests on this worker
+                    with track_stage("chat", "vector_store"):
+                        thread_id = await self.upstream.call(
+                            "vector_store",
+                            lambda: self._attach_file_to_thread(
+                                client, request.thread_id, ai_project_file.id, document_digest),
+                            retry=False
                         )
-                        sources.append(source)
-
-                    for item in files:
-                        fr = FileReference(
-                            id=item.file_id if hasattr(item, 'file_id') and item.file_id else '')
-                        file_references.append(fr)
-
-                finally:
-                    print("Completed agent invocation")
-
-                request_result = RequestResult(
-                    content=responseContent,
-                    sources=sources,
-                    files=file_references,
-                    intermediate_steps=intermediate_steps,
-                    thread_id=thread.id if thread and thread.id else "",
-                    code_content=code_output_content.strip()
+                    if thread is None:
+                        thread = AzureAIAgentThread(
+                            client=client, thread_id=thread_id)
+                except Exception as e:
+                    logger.warning("Error setting up vector store: %s", e)
+
+            if thread is None:
+                # A pre-created thread if one is ready, otherwise created on the service by the first invoke;
+                # holding it lets an abandoned stream cancel its run
+                thread = AzureAIAgentThread(
+                    client=client, thread_id=self.thread_pool.take() if self.thread_pool else None)
+
+            accumulator = StreamAccumulator()
+            thread_announced = False
+            completed = False
+            generation_start = time.perf_counter()
+
+            try:
+                # Create the appropriate ChatMessageContent based on whether we have a file
+                cmc = create_chat_message_content(
+                    user_message=user_message,
+                    # file_content=file_content,
+                    # file_name=request.file,
+                    # ai_project_file=ai_project_file
                 )
 
-                return request_result
+                async with aclosing(self.upstream.stream("generation", lambda: agent.invoke_stream(
+                    messages=cmc[0] if cmc else user_message,
+                    thread=thread,
+                    on_intermediate_message=handle_intermediate_steps
+                ), retry=False)) as stream:
+                    async for result in stream:
+                        if not thread_announced and thread.id:
+                            thread_announced = True
+                            yield "thread", thread.id
+
+                        while pending_steps:
+                            yield "function_call", pending_steps.pop(0)
+
+                        for item in result.items:
+                            event = accumulator.add_item(item)
+                            if event is not None:
+                                yield event
+
+                        message = result.message
+                        if isinstance(message, StreamingChatMessageContent):
+                            content = message.content
+                            if content:
+                                # Check for code in metadata
+                                is_code = bool(message.metadata and message.metadata.get("code") is True)
+                                accumulator.add_text(content, is_code)
+                                tracker.first_token()
+                                yield "delta", {"content": content, "code": is_code}
+                        else:
+                            logger.debug("Non-message stream item: %s", result)
+
+                while pending_steps:
+                    yield "function_call", pending_steps.pop(0)
+                completed = True
+
+            finally:
+                stage_duration.observe(time.perf_counter() - generation_start, agent="chat", stage="generation")
+                if not completed and thread.id:
+                    # The consumer went away (or the run failed) before the agent finished; shield the
+                    # cancel call so it still reaches the service while this task is being cancelled
+                    await asyncio.shield(self._cancel_active_run(client, thread.id))
+                logger.debug("Completed agent invocation on thread %s", thread.id)
+
+            request_result = accumulator.result(
+                intermediate_steps, thread.id if thread and thread.id else "")
+
+            tracker.outcome = "success"
+            yield "done", request_result
+
+    async def _attach_file_to_thread(self, client, thread_id: Optional[str], file_id: str, digest: str) -> str:
+        """
+        Make an uploaded file searchable on a thread, creating the thread and/or vector store as needed
+
+        A thread without a vector store attaches the document's shared store, which is only created
+        and indexed the first time the document is seen.
+
+        Args:
+            client: The shared async AIProjectClient
+            thread_id: Existing thread ID, or None to create a thread
+            file_id: ID of the uploaded agent file
+            digest: SHA-256 hex digest of the file's content
+
+        Returns:
+            The ID of the thread the file is attached to
+        """
+        if not thread_id:
+            vector_store_id = await self._document_vector_store(client, digest, file_id)
+            try:
+                thread_id = await self._create_thread(client, vector_store_id)
+            except ResourceNotFoundError:
+                # The service expired the shared store before this index did
+                self.document_stores.forget(digest)
+                vector_store_id = await self._document_vector_store(client, digest, file_id)
+                thread_id = await self._create_thread(client, vector_store_id)
+            logger.info("Started thread %s with vector store %s", thread_id, vector_store_id)
+            self.document_stores.acquire(digest, thread_id)
+            await self.vector_store_cache.set(thread_id, vector_store_id)
+            return thread_id
+
+        # Known threads skip the threads.get round trip
+        vector_store_id = await self.vector_store_cache.get(thread_id)
+        if vector_store_id:
+            try:
+                vector_store_id = await self._add_file_to_thread_store(
+                    client, thread_id, vector_store_id, file_id, digest)
+                await self.vector_store_cache.set(thread_id, vector_store_id)
+                return thread_id
+            except Exception as e:
+                # The store may have expired or the thread been changed elsewhere; look it up again
+                logger.warning("Cached vector store %s for thread %s failed: %s", vector_store_id, thread_id, e)
+                await self.vector_store_cache.invalidate(thread_id)
+
+        # Check if the existing thread already has a vector store
+        vector_store_id = None
+        try:
+            thread_details = await client.agents.threads.get(thread_id)
+            tool_resources = getattr(thread_details, 'tool_resources', None)
+            file_search = getattr(tool_resources, 'file_search', None) if tool_resources else None
+            vector_store_ids = getattr(file_search, 'vector_store_ids', None) if file_search else None
+            if vector_store_ids:
+                vector_store_id = vector_store_ids[0]
+                logger.debug("Found existing vector store %s on thread %s", vector_store_id, thread_id)
+        except Exception as e:
+            logger.warning("Could not get details of thread %s: %s", thread_id, e)
+
+        if vector_store_id:
+            try:
+                vector_store_id = await self._add_file_to_thread_store(
+                    client, thread_id, vector_store_id, file_id, digest)
+            except ResourceNotFoundError:
+                logger.warning("Vector store %s of thread %s no longer exists", vector_store_id, thread_id)
+                vector_store_id = None
+        if not vector_store_id:
+            # Attach the document's shared store and update the thread
+            vector_store_id = await self._document_vector_store(client, digest, file_id)
+            await self._update_thread_vector_store(client, thread_id, vector_store_id)
+            self.document_stores.acquire(digest, thread_id)
+        await self.vector_store_cache.set(thread_id, vector_store_id)
+        return thread_id
+
+    async def _add_file_to_thread_store(self, client, thread_id: str, vector_store_id: str, file_id: str,
+                                        digest: str) -> str:
+        """
+        Add a file to the vector store a thread already uses
+
+        A shared document store is never changed for one thread: the thread gets a store of its own
+        holding the shared document and the new file instead.
+
+        Returns:
+            The ID of the thread's vector store afterwards
+        """
+        shared = self.document_stores.shared_document(vector_store_id)
+        shared_file_id = shared.file_id if shared else None
+        if shared is None and await self.vector_store_cache.is_own_store(vector_store_id):
+            await self._add_file_to_vector_store(client, vector_store_id, file_id)
+            return vector_store_id
+        if shared is None:
+            # Shared stores created by another replica or before a restart are recognised by their metadata
+            vector_store = await client.agents.vector_stores.get(vector_store_id)
+            if not (vector_store.metadata or {}).get(SHARED_DOCUMENT_METADATA_KEY):
+                await self._add_file_to_vector_store(client, vector_store_id, file_id)
+                await self.vector_store_cache.mark_own_store(vector_store_id)
+                return vector_store_id
+            shared_file_ids = [
+                stored.id async for stored in client.agents.vector_store_files.list(vector_store_id=vector_store_id)]
+            shared_file_id = shared_file_ids[0] if shared_file_ids else None
+        elif shared.digest == digest:
+            # The thread already searches this document
+            self.document_stores.acquire(digest, thread_id)
+            return vector_store_id
+
+        file_ids = [shared_file_id, file_id] if shared_file_id and shared_file_id != file_id else [file_id]
+        own_vector_store_id = await self._create_vector_store(client, file_ids)
+        await self.vector_store_cache.mark_own_store(own_vector_store_id)
+        await self._update_thread_vector_store(client, thread_id, own_vector_store_id)
+        self.document_stores.release(thread_id)
+        return own_vector_store_id
+
+    async def _document_vector_store(self, client, digest: str, file_id: str) -> str:
+        """Get the shared vector store of a document, creating and indexing it the first time the document is seen"""
+        return await self.document_stores.get_or_create(digest, file_id, lambda: self._create_vector_store(
+            client, [file_id],
+            name=f"rutzsco_paif_doc_{digest[:16]}",
+            metadata={SHARED_DOCUMENT_METADATA_KEY: digest},
+            expires_after=VectorStoreExpirationPolicy(
+                anchor=VectorStoreExpirationPolicyAnchor.LAST_ACTIVE_AT, days=self.document_store_expiry_days)
+        ))
+
+    async def _create_thread(self, client, vector_store_id: str) -> str:
+        """
+        Start a thread with the file search tool resources of a vector store
+
+        A pre-created thread from the warm pool gets the resources attached when one is ready;
+        otherwise the thread is created with them.
+
+        Returns:
+            The thread ID
+        """
+        file_search_tool = FileSearchTool(vector_store_ids=[vector_store_id])
+        thread_id = self.thread_pool.take() if self.thread_pool else None
+        if thread_id:
+            try:
+                await client.agents.threads.update(thread_id=thread_id, tool_resources=file_search_tool.resources)
+                return thread_id
+            except Exception as e:
+                # A missing vector store fails the creation below as well, which the caller handles
+                logger.warning("Could not attach vector store %s to pooled thread %s: %s",
+                               vector_store_id, thread_id, e)
+                self.thread_pool.discard(thread_id)
+        logger.debug("Creating new thread with vector store attachment")
+        thread = await client.agents.threads.create(tool_resources=file_search_tool.resources)
+        return thread.id
+
+    @staticmethod
+    async def _update_thread_vector_store(client, thread_id: str, vector_store_id: str) -> None:
+        """Point a thread's file search tool resources at a vector store"""
+        file_search_tool = FileSearchTool(vector_store_ids=[vector_store_id])
+        await client.agents.threads.update(
+            thread_id=thread_id,
+            tool_resources=file_search_tool.resources
+        )
+        logger.info("Updated thread %s with vector store %s", thread_id, vector_store_id)
+
+    @staticmethod
+    async def _create_vector_store(client, file_ids: List[str], name: Optional[str] = None, **kwargs) -> str:
+        """Create a vector store holding the given files and wait for them to be indexed"""
+        logger.debug("Creating new vector store with files %s", file_ids)
+        vector_store = await client.agents.vector_stores.create_and_poll(
+            file_ids=file_ids,
+            name=name or f"rutzsco_paif_vs_{uuid.uuid4()}",
+            **kwargs
+        )
+        logger.info("Created vector store %s", vector_store.id)
+        return vector_store.id
+
+    @staticmethod
+    async def _add_file_to_vector_store(client, vector_store_id: str, file_id: str) -> None:
+        """Add a file to an existing vector store and wait for it to be indexed"""
+        logger.debug("Adding file %s to vector store %s", file_id, vector_store_id)
+        await client.agents.vector_store_files.create_and_poll(
+            vector_store_id=vector_store_id,
+            file_id=file_id
+        )
+        logger.info("Added file %s to vector store %s", file_id, vector_store_id)
+
+    async def _delete_vector_store(self, vector_store_id: str) -> None:
+        """Delete a vector store that no thread references any more"""
+        client = await self.client_pool.get_client()
+        try:
+            await client.agents.vector_stores.delete(vector_store_id)
+        except ResourceNotFoundError:
+            pass
+        logger.info("Deleted vector store %s", vector_store_id)
+
+    async def _ingest_document(self, file_path: str) -> Tuple[Optional[str], Any, str]:
+        """Stream a document from blob storage into an agent file, reusing an earlier upload of the same content"""
+        client = await self.client_pool.get_client()
+        return await download_and_process_file(
+            self.blob_service_client, file_path, client, self.file_cache,
+            container_name=self.document_container_name,
+            spool_max_bytes=self.document_spool_max_bytes
+        )
+
+    async def close(self) -> None:
+        """Close the async blob storage client, the thread pool, the document store sweeper and the caches"""
+        if self.blob_service_client:
+            await self.blob_service_client.close()
+        if self.thread_pool:
+            await self.thread_pool.close()
+        await self.document_stores.close()
+        self.vector_store_cache.close()
+        self.file_cache.close()
+
+    @staticmethod
+    async def _cancel_active_run(client, thread_id: str) -> None:
+        """Cancel the latest run on a thread if it is still executing"""
+        try:
+            async for run in client.agents.runs.list(
+                    thread_id=thread_id, limit=1, order=ListSortOrder.DESCENDING):
+                if run.status in (RunStatus.QUEUED, RunStatus.IN_PROGRESS, RunStatus.REQUIRES_ACTION):
+                    await client.agents.runs.cancel(thread_id=thread_id, run_id=run.id)
+                    logger.info("Cancelled run %s on thread %s", run.id, thread_id)
+                break
+        except Exception as e:
+            logger.warning("Could not cancel active run on thread %s: %s", thread_id, e)
@@ -0,0 +1,110 @@
+import os
+import logging
+from functools import partial
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from ..utils.health_monitor import DependencyHealthMonitor
+from .agent_client_pool import agent_client_pool
+from .model_deployment_settings import configured_model_deployments
+
+
+class DependencyProbes:
+    """
+    Cheap calls against the agent endpoint, blob storage and every model deployment
+
+    Each probe exercises credentials as well as reachability, and keeps its own long-lived client
+    so probing does not open a connection per round. No probe is billed: each model deployment is
+    sent a chat request without messages, which the service rejects with 400 before generating
+    anything, but only after resolving the deployment, so a missing deployment answers 404.
+    """
+
+    def __init__(self):
+        load_dotenv()
+
+        self.logger = logging.getLogger(__name__)
+        self.agent_endpoint = os.getenv("AZURE_AI_AGENT_ENDPOINT")
+        self.agent_id = os.getenv("AZURE_AI_AGENT_ID")
+        self.blob_connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
+        self.blob_container_name = os.getenv("AZURE_BLOB_CONTAINER_NAME", "images")
+        self.openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+        try:
+            self.model_deployments: List[Dict[str, Any]] = configured_model_deployments()
+        except ValueError:
+            self.model_deployments = []
+
+        self._blob_service_client: Optional[Any] = None
+        # Deployment name -> OpenAI client of its endpoint
+        self._openai_clients: Dict[str, Any] = {}
+
+    def register(self, monitor: DependencyHealthMonitor) -> None:
+        """
+        Register the probes of every configured dependency with a health monitor
+
+        Args:
+            monitor: Monitor that runs the probes in the background
+        """
+        monitor.register("agent_endpoint", self.probe_agent_endpoint if self.agent_endpoint else None)
+        monitor.register("blob_storage", self.probe_blob_storage if self.blob_connection_string else None)
+        if not self.model_deployments:
+            monitor.register("model_deployment", None)
+        for deployment in self.model_deployments:
+            # The image agent moves calls off a failing deployment, so only losing all of them is fatal
+            monitor.register(f"model_deployment:{deployment['name']}",
+                             partial(self.probe_model_deployment, deployment), group="model_deployment")
+
+    async def probe_agent_endpoint(self) -> None:
+        """Fetch the chat agent's definition (or list one agent) through the shared agent client"""
+        client = await agent_client_pool.get_client(count_reuse=False)
+        if self.agent_id:
+            await client.agents.get_agent(agent_id=self.agent_id)
+        else:
+            async for _ in client.agents.list_agents(limit=1):
+                break
+
+    async def probe_blob_storage(self) -> None:
+        """Read the image container's properties"""
+        if self._blob_service_client is None:
+            from azure.storage.blob.aio import BlobServiceClient
+            self._blob_service_client = BlobServiceClient.from_connection_string(self.blob_connection_string)
+        container_client = self._blob_service_client.get_container_client(self.blob_container_name)
+        await container_client.get_container_properties()
+
+    async def probe_model_deployment(self, deployment: Dict[str, Any]) -> None:
+        """
+        Send the deployment an empty chat request, which checks its endpoint, API key and deployment
+        name without a billed call
+
+        Args:
+            deployment: One entry of configured_model_deployments()
+        """
+        from openai import AsyncAzureOpenAI, BadRequestError
+
+        client = self._openai_clients.get(deployment["name"])
+        if client is None:
+            client = self._openai_clients[deployment["name"]] = AsyncAzureOpenAI(
+                api_key=deployment["api_key"],
+                azure_endpoint=deployment["endpoint"],
+                api_version=self.openai_api_version,
+                max_retries=0
+            )
+        try:
+            await client.chat.completions.create(model=deployment["deployment_name"], messages=[], max_tokens=1)
+        except BadRequestError:
+            # The deployment exists and rejected the request before generating; an unknown one raises NotFoundError
+            return
+
+    async def close(self) -> None:
+        """Close the probe clients"""
+        if self._blob_service_client is not None:
+            await self._blob_service_client.close()
+            self._blob_service_client = None
+        clients, self._openai_clients = list(self._openai_clients.values()), {}
+        for client in clients:
+            await client.close()
+
+
+# Opened and closed by the FastAPI lifespan; /ready and /health/deep only read its cached results
+dependency_health = DependencyHealthMonitor()
+dependency_probes = DependencyProbes()
+dependency_probes.register(dependency_health)
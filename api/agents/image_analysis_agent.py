@@ -1,23 +1,31 @@
 import os
+import json
+import asyncio
 import logging
-import base64
-from typing import Optional, AsyncGenerator, List, Dict, Any, Union
+from contextlib import aclosing
+from typing import Optional, AsyncGenerator, List, Dict, Any, Tuple
 from dotenv import load_dotenv
-from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
+from azure.storage.blob.aio import BlobServiceClient
 from opentelemetry import trace
 
 import semantic_kernel as sk
 from semantic_kernel.agents import ChatCompletionAgent
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
-from semantic_kernel.contents import ChatMessageContent, FunctionCallContent
-from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents import ChatMessageContent, FunctionCallContent, TextContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
 from semantic_kernel.functions.kernel_arguments import KernelArguments
 
 from ..models.api_models import ChatThreadRequest, ImageFile, RequestResult
+from ..utils.image_payload import ImagePayload, EncodedImageContent
+from ..utils.image_preprocessing import ImagePreprocessor
+from ..utils.result_cache import ResultCache
+from ..utils.metrics import RequestTracker, track_stage
+from ..utils.resilience import UpstreamError, UpstreamGuard
+from ..utils.single_flight import SingleFlight
 from .agent_utils import AgentUtils
+from .model_deployment_pool import ModelDeploymentPool
+from .prompt_store import Prompt
 
 
 class ImageAnalysisAgent:
@@ -30,27 +38,24 @@ class ImageAnalysisAgent:
         self.agent_utils = AgentUtils()
 
         # Retrieve configuration from environment variables
-        api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        deployment_name = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "gpt-4o")
         self.azure_openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
 
-        if not endpoint or not deployment_name:
-            raise ValueError("Missing required environment variables for OpenAI configuration.")
-
         # Initialize Semantic Kernel
         self.kernel = sk.Kernel()
 
-        # Configure Azure OpenAI service - use API key authentication
-        if not api_key:
-            raise ValueError("Azure OpenAI API key must be configured")
-            
-        self.kernel.add_service(AzureChatCompletion(
-            api_key=api_key,
-            endpoint=endpoint,
-            deployment_name=deployment_name,
-            service_id="azure-chat-completion"
-        ))
+        # Configure the Azure OpenAI deployments (API key authentication); each call is routed to one
+        # of them by load and remaining quota
+        self.deployments = ModelDeploymentPool.from_env()
+        self.deployments.register(self.kernel)
+        # All deployments serve the same model, so cached results are keyed by the primary one
+        self.deployment_name = self.deployments.deployments[0].deployment_name
+
+        # Deadlines, retries and circuit breaker for model deployment calls; the OpenAI clients' own
+        # retries are off, so a retry honours Retry-After and lands on the next available deployment
+        self.upstream = UpstreamGuard(
+            "model_deployment",
+            timeouts={"generation": 120, "first_token": 60, "stream_idle": 30}
+        )
 
         # Azure Blob Storage configuration (optional)
         blob_connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
@@ -61,48 +66,83 @@ class ImageAnalysisAgent:
                 blob_connection_string
             )
 
+        # Bounds concurrent image fetches across all requests handled by this worker
+        self.image_fetch_concurrency = int(os.getenv("IMAGE_FETCH_CONCURRENCY", "8"))
+        self._fetch_semaphore = asyncio.Semaphore(self.image_fetch_concurrency)
+
+        # Downscale/recompress stage run in worker processes before images are sent (optional)
+        self.preprocessor: Optional[ImagePreprocessor] = None
+        if os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true":
+            self.preprocessor = ImagePreprocessor()
+
+        # Analysis results keyed by image content, prompts and deployment (optional)
+        self.result_cache: Optional[ResultCache] = None
+        if os.getenv("IMAGE_ANALYSIS_CACHE_ENABLED", "true").lower() == "true":
+            self.result_cache = ResultCache(
+                max_entries=int(os.getenv("IMAGE_ANALYSIS_CACHE_MAX_ENTRIES", "512")),
+                ttl_seconds=float(os.getenv("IMAGE_ANALYSIS_CACHE_TTL_SECONDS", "3600")),
+                db_path=os.getenv("IMAGE_ANALYSIS_CACHE_DB_PATH")
+            )
+
+        # Identical analyses in flight at the same time share one model call (optional)
+        self.coalescing: Optional[SingleFlight] = None
+        if os.getenv("IMAGE_ANALYSIS_COALESCING_ENABLED", "true").lower() == "true":
+            self.coalescing = SingleFlight()
+
+        # Chat completion agents are stateless between invocations, so one is built per prompt version
+        # and deployment and shared by concurrent requests; each invocation gets its own thread
+        self._agents: Dict[Tuple[str, str], ChatCompletionAgent] = {}
+        self.agent_builds = 0
+        self.agent_reuses = 0
+
+        # Values for the system prompt's ${name} placeholders, e.g. {"site": "Plant 4"}; fixed per process,
+        # since the agents built from a prompt are shared by every request
+        self.prompt_values: Dict[str, Any] = json.loads(os.getenv("IMAGE_ANALYSIS_PROMPT_VALUES") or "{}")
+        self._prompt_values_key = json.dumps(self.prompt_values, sort_keys=True)
+
+        # A reloaded prompt that needs other values keeps its previous version instead of failing requests
+        self.agent_utils.declare_prompt_values("image_analysis_system_prompt.txt", self.prompt_values)
+
+        # Loaded and rendered here so a missing prompt or value fails the agent's build instead of its first request
+        prompt = self._get_system_prompt()
+        prompt.render(**self.prompt_values)
+
         # Log initialization details
         config_details = {
-            "Azure OpenAI Endpoint": endpoint,
-            "Azure OpenAI API Key": api_key,
+            "System Prompt": prompt.version,
+            "Azure OpenAI Deployments": {
+                deployment.name: f"{deployment.endpoint} ({deployment.deployment_name})"
+                for deployment in self.deployments.deployments
+            },
+            "Balancing Strategy": self.deployments.strategy,
             "API Version": self.azure_openai_api_version,
-            "Chat Deployment": deployment_name,
             "Blob Container": self.blob_container_name,
             "Blob Storage Configured": bool(self.blob_service_client),
+            "Image Fetch Concurrency": self.image_fetch_concurrency,
+            "Image Preprocessing": self.preprocessor.options if self.preprocessor and self.preprocessor.enabled else "Disabled",
+            "Result Cache Enabled": bool(self.result_cache),
+            "Result Cache DB": os.getenv("IMAGE_ANALYSIS_CACHE_DB_PATH") or "Not configured",
+            "Request Coalescing Enabled": bool(self.coalescing),
             "Authentication Method": "API Key"
         }
         self.agent_utils.log_agent_initialization("ImageAnalysisAgent", config_details)
 
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for image analysis"""
-        return self.agent_utils.get_system_prompt("image_analysis_system_prompt.txt")
+    def _get_system_prompt(self) -> Prompt:
+        """Get the current version of the system prompt for image analysis"""
+        return self.agent_utils.get_prompt("image_analysis_system_prompt.txt")
 
-    async def _process_image_file(self, image_file: ImageFile) -> Optional[tuple[bytes, str]]:
-        """Process an image file and return image data and media type"""
+    async def _process_image_file(self, image_file: ImageFile) -> Optional[ImagePayload]:
+        """Process an image file and return its payload; data URLs are kept in their encoded form"""
         try:
-            image_data = None
-            media_type = None
+            payload = None
 
             # Handle data URL
             if image_file.data_url:
-                if image_file.data_url.startswith("data:"):
-                    data_parts = image_file.data_url.split(',')
-                    if len(data_parts) == 2:
-                        # e.g., "data:image/jpeg;base64"
-                        header_part = data_parts[0]
-                        base64_data = data_parts[1]
-
-                        # Extract media type
-                        media_type = header_part.split(
-                            ';')[0].replace("data:", "")
-
-                        # Convert base64 to bytes
-                        image_bytes = base64.b64decode(base64_data)
-                        image_data = image_bytes
-
-                        self.logger.info(
-                            f"Processed data URL for image {image_file.name} ({media_type}, {len(image_bytes)} bytes)"
-                        )
+                payload = ImagePayload.from_data_url(image_file.data_url)
+                if payload:
+                    self.logger.info(
+                        f"Processed data URL for image {image_file.name} ({payload.media_type}, {payload.size} bytes)"
+                    )
 
             # Handle blob name
             elif image_file.blob_name:
@@ -119,13 +159,12 @@ class ImageAnalysisAgent:
                         blob=image_file.blob_name
                     )
 
-                    # Download blob content
-                    blob_data = blob_client.download_blob()
-                    image_data = blob_data.readall()
-
-                    # Get content type from blob properties
-                    blob_properties = blob_client.get_blob_properties()
-                    media_type = blob_properties.content_settings.content_type or "image/jpeg"
+                    # Download blob content; the download response already carries the blob properties
+                    blob_data = await blob_client.download_blob()
+                    image_data = await blob_data.readall()
+                    media_type = blob_data.properties.content_settings.content_type or "image/jpeg"
+                    if image_data:
+                        payload = ImagePayload.from_bytes(image_data, media_type)
 
                     self.logger.info(
                         f"Downloaded blob {image_file.blob_name} for image {image_file.name} ({media_type}, {len(image_data)} bytes)"
@@ -142,8 +181,7 @@ class ImageAnalysisAgent:
                 )
                 return None
 
-            if image_data and media_type:
-                return image_data, media_type
+            return payload
 
         except Exception as ex:
             self.logger.warning(
@@ -151,11 +189,146 @@ class ImageAnalysisAgent:
 
         return None
 
+    async def _fetch_image_file(self, index: int, image_file: ImageFile) -> Tuple[int, ImageFile, Optional[ImagePayload], Optional[ImagePayload], int]:
+        """
+        Process an image file while holding a slot of the fetch semaphore, then preprocess it
+
+        Returns:
+            (index, image file, payload as fetched, payload to send, bytes saved by preprocessing)
+        """
+        async with self._fetch_semaphore:
+            with track_stage("image_analysis", "image_fetch"):
+                fetched = await self._process_image_file(image_file)
+        if not fetched or not self.preprocessor:
+            return index, image_file, fetched, fetched, 0
+        with track_stage("image_analysis", "preprocess"):
+            processed, bytes_saved = await self.preprocessor.process(fetched)
+        return index, image_file, fetched, processed, bytes_saved
+
+    async def _prepare_images(self, image_files: List[ImageFile]) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Fetch and preprocess all images concurrently and encode them for submission
+
+        Yields:
+            ("progress", {...}) events as each image is fetched, preprocessed and encoded, in completion order,
+            then ("image", ImagePayload) for every image that can be sent to the model, in request order
+        """
+        tasks = [
+            asyncio.ensure_future(self._fetch_image_file(index, image_file))
+            for index, image_file in enumerate(image_files)
+        ]
+        images: List[Optional[ImagePayload]] = [None] * len(image_files)
+        total_bytes_saved = 0
+
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                index, image_file, fetched, payload, bytes_saved = await next_completed
+                if not payload:
+                    yield "progress", {"image": image_file.name, "stage": "skipped"}
+                    continue
+
+                yield "progress", {
+                    "image": image_file.name,
+                    "stage": "fetched",
+                    "media_type": fetched.media_type,
+                    "bytes": fetched.size
+                }
+                if payload is not fetched:
+                    total_bytes_saved += bytes_saved
+                    yield "progress", {
+                        "image": image_file.name,
+                        "stage": "preprocessed",
+                        "media_type": payload.media_type,
+                        "bytes": payload.size,
+                        "bytes_saved": bytes_saved
+                    }
+
+                # Encodes blob bytes once; data URLs that arrived encoded are passed through as-is
+                encoded_bytes = len(payload.data_url)
+                images[index] = payload
+                yield "progress", {"image": image_file.name, "stage": "encoded", "encoded_bytes": encoded_bytes}
+                self.logger.info(f"Added image {image_file.name} to analysis request")
+        finally:
+            # Stop outstanding downloads if the consumer goes away
+            for task in tasks:
+                task.cancel()
+
+        if self.preprocessor:
+            trace.get_current_span().set_attribute("image_analysis.bytes_saved", total_bytes_saved)
+            self.logger.info(f"Image preprocessing saved {total_bytes_saved} bytes for this request")
+
+        for image in images:
+            if image:
+                yield "image", image
+
+    def _build_user_message(self, request: ChatThreadRequest, images: List[ImagePayload]) -> ChatMessageContent:
+        """Build the user message with text and image content"""
+        user_message_text = request.message or "Please analyze the provided images and extract any serial numbers, model numbers, or part numbers from equipment labels."
+
+        # Create a comprehensive message that includes text and image references
+        if images:
+            user_message_text += f"\n\nI have provided {len(images)} image(s) for analysis. Please examine each image carefully and extract any visible serial numbers, model numbers, part numbers, or other identifying information from equipment labels or nameplates."
+
+        items: List[Any] = [TextContent(text=user_message_text)]
+        items.extend(EncodedImageContent(payload) for payload in images)
+        return ChatMessageContent(role=AuthorRole.USER, items=items)
+
+    def _result_cache_key(self, user_message: ChatMessageContent, prompt: Prompt, images: List[ImagePayload]) -> str:
+        """Build the result cache key from image content, prompt text, system prompt version and values, deployment"""
+        return ResultCache.make_key(
+            *(payload.digest for payload in images), user_message.content, prompt.version, self._prompt_values_key,
+            self.deployment_name)
+
+    def _create_agent(self, system_message: str, service_id: str) -> ChatCompletionAgent:
+        """Create the chat completion agent with the given system prompt on one deployment's service"""
+        # Configure execution settings; the chat completion service works on a copy of them
+        settings = PromptExecutionSettings(
+            service_id=service_id,
+            function_choice_behavior=FunctionChoiceBehavior.Auto(),
+        )
+        kernel_arguments = KernelArguments(settings=settings)
+
+        return ChatCompletionAgent(
+            kernel=self.kernel,
+            name="ImageAnalysisAgent",
+            instructions=system_message,
+            arguments=kernel_arguments
+        )
+
+    def _get_agent(self, prompt: Prompt, service_id: str) -> ChatCompletionAgent:
+        """Get the shared agent for a prompt version and deployment, building it on first use"""
+        key = (prompt.version, service_id)
+        agent = self._agents.get(key)
+        if agent is not None:
+            self.agent_reuses += 1
+            return agent
+
+        # A new prompt version retires the agents built for the previous one
+        for stale in [cached for cached in self._agents if cached[0] != prompt.version]:
+            del self._agents[stale]
+        agent = self._create_agent(prompt.render(**self.prompt_values), service_id)
+        self._agents[key] = agent
+        self.agent_builds += 1
+        return agent
+
+    @staticmethod
+    def _invocation_arguments() -> KernelArguments:
+        """
+        Per-invocation arguments; merged over the shared agent's arguments into a new KernelArguments,
+        so nothing a request adds leaks into the agent shared with other requests
+        """
+        return KernelArguments(diagnostics=[])
+
+    def agent_cache_stats(self) -> Dict[str, int]:
+        """Return how often a shared chat completion agent was built or reused"""
+        return {"agents": len(self._agents), "builds": self.agent_builds, "reuses": self.agent_reuses}
+
     async def analyze_images(self, request: ChatThreadRequest) -> RequestResult:
         """Analyze images for serial number extraction using Semantic Kernel Agent"""
         
         tracer = trace.get_tracer(__name__)
-        with tracer.start_as_current_span("Agent: ImageAnalysis") as current_span:
+        with tracer.start_as_current_span("Agent: ImageAnalysis") as current_span, \
+                RequestTracker("image_analysis") as tracker:
             
             if not request.files:
                 return RequestResult(
@@ -167,65 +340,263 @@ class ImageAnalysisAgent:
             # Define a list to hold callback message content for intermediate steps
             intermediate_steps: List[str] = []
 
+            try:
+                # Process images and convert to base64 data URLs
+                images = [
+                    payload async for event_type, payload in self._prepare_images(request.files)
+                    if event_type == "image"
+                ]
+
+                result = await self.analyze_image_payloads(request, images, intermediate_steps, tracker)
+                tracker.outcome = "success"
+                return result
+
+            except UpstreamError:
+                # Timeouts and an open circuit are reported to the client as 503/504
+                raise
+            except Exception as e:
+                error_msg = f"Error during image analysis: {str(e)}"
+                self.logger.error(error_msg)
+                return RequestResult(
+                    content=error_msg,
+                    intermediate_steps=intermediate_steps,
+                    thread_id=""
+                )
+
+    async def analyze_image_payloads(self, request: ChatThreadRequest, images: List[ImagePayload],
+                                     intermediate_steps: Optional[List[str]] = None,
+                                     tracker: Optional[RequestTracker] = None) -> RequestResult:
+        """
+        Run the model on images that have already been fetched and preprocessed
+
+        Unlike analyze_images, errors are raised rather than returned as content, so callers
+        such as the batch job manager can retry them. Concurrent requests for the same images,
+        message and prompt version share one model call, unless they bypass the cache.
+
+        Args:
+            request: The analysis request (message and cache options)
+            images: Payloads to send, in order
+            intermediate_steps: List that receives the function call steps of the analysis
+            tracker: Request metrics tracker that receives the model's token usage
+
+        Returns:
+            The analysis result, served from the result cache when possible
+        """
+        if intermediate_steps is None:
+            intermediate_steps = []
+
+        user_message = self._build_user_message(request, images)
+        prompt = self._get_system_prompt()
+        trace.get_current_span().set_attribute("image_analysis.prompt_version", prompt.version)
+
+        cache_key = None
+        if self.result_cache:
+            cache_key = self._result_cache_key(user_message, prompt, images)
+            if request.bypass_cache:
+                self.result_cache.record_bypass()
+            else:
+                with track_stage("image_analysis", "cache_lookup"):
+                    cached = await self.result_cache.get(cache_key)
+                trace.get_current_span().set_attribute("image_analysis.cache_hit", cached is not None)
+                if cached is not None:
+                    intermediate_steps.extend(cached["intermediate_steps"])
+                    return RequestResult(**cached)
+
+        async def analyze() -> Dict[str, Any]:
+            steps: List[str] = []
+
             # Define an async method to handle the `on_intermediate_message` callback
             async def handle_intermediate_steps(message: ChatMessageContent) -> None:
                 if any(isinstance(item, FunctionCallContent) for item in message.items):
                     for fcc in message.items:
                         if isinstance(fcc, FunctionCallContent):
-                            intermediate_steps.append(f"Function Call: {fcc.name} with arguments: {fcc.arguments}")
+                            steps.append(f"Function Call: {fcc.name} with arguments: {fcc.arguments}")
+
+            async def invoke_agent():
+                # A retried attempt starts over, so drop the steps of the failed one
+                steps.clear()
+                async with self.deployments.lease() as deployment:
+                    agent = self._get_agent(prompt, deployment.service_id)
+                    # Iterate over the async generator to get the final response
+                    last = None
+                    async for result in agent.invoke(messages=user_message, arguments=self._invocation_arguments(),
+                                                     on_intermediate_message=handle_intermediate_steps):
+                        last = result
+                    return last
+
+            with track_stage("image_analysis", "generation"):
+                response = await self.upstream.call("generation", invoke_agent)
+
+            if response is None:
+                raise ValueError("No response received from the agent.")
+            # Tokens are counted once, on the request that started the call
+            if tracker and response.message.metadata:
+                tracker.usage(response.message.metadata.get("usage"))
+
+            analysis = {"content": f"{response}", "intermediate_steps": steps}
+            if cache_key:
+                await self.result_cache.set(cache_key, analysis)
+            thread = response.thread
+            return {**analysis, "thread_id": str(thread.id) if thread else ""}
+
+        if self.coalescing and not request.bypass_cache:
+            flight_key = cache_key or self._result_cache_key(user_message, prompt, images)
+            analysis = await self.coalescing.do(flight_key, analyze)
+        else:
+            analysis = await analyze()
+
+        intermediate_steps.extend(analysis["intermediate_steps"])
+        return RequestResult(
+            content=analysis["content"],
+            intermediate_steps=list(analysis["intermediate_steps"]),
+            thread_id=analysis["thread_id"]
+        )
+
+    async def _invoke_stream_on_deployment(self, prompt: Prompt, user_message: ChatMessageContent,
+                                           on_intermediate_message) -> AsyncGenerator[Any, None]:
+        """Stream the agent's response from the deployment the pool picks, holding it for the whole stream"""
+        async with self.deployments.lease() as deployment:
+            agent = self._get_agent(prompt, deployment.service_id)
+            async with aclosing(agent.invoke_stream(
+                messages=user_message,
+                arguments=self._invocation_arguments(),
+                on_intermediate_message=on_intermediate_message
+            )) as stream:
+                async for result in stream:
+                    yield result
+
+    async def list_blob_names(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        List blob names in the image container that start with a prefix
+
+        Args:
+            prefix: Blob name prefix, e.g. 'audits/2024-06-site-12/'
+            limit: Maximum number of names to return
+
+        Returns:
+            Matching blob names
+        """
+        if not self.blob_service_client:
+            raise ValueError("Blob storage is not configured")
+
+        container_client = self.blob_service_client.get_container_client(self.blob_container_name)
+        blob_names: List[str] = []
+        async for blob in container_client.list_blobs(name_starts_with=prefix):
+            blob_names.append(blob.name)
+            if limit and len(blob_names) >= limit:
+                break
+        return blob_names
+
+    async def close(self) -> None:
+        """Close the async blob storage client, the deployments' clients, the preprocessing workers and the result cache"""
+        if self.blob_service_client:
+            await self.blob_service_client.close()
+        await self.deployments.close()
+        if self.preprocessor:
+            self.preprocessor.close()
+        if self.result_cache:
+            self.result_cache.close()
 
-            try:
-                # Build the user message with text and image content
-                user_message_text = request.message or "Please analyze the provided images and extract any serial numbers, model numbers, or part numbers from equipment labels."
-                
-                # Process images and convert to base64 data URLs
-                image_data_urls = []
-                for image_file in request.files:
-                    image_result = await self._process_image_file(image_file)
-                    if image_result:
-                        image_data, media_type = image_result
-                        image_base64 = base64.b64encode(image_data).decode('utf-8')
-                        data_url = f"data:{media_type};base64,{image_base64}"
-                        image_data_urls.append(data_url)
-                        self.logger.info(f"Added image {image_file.name} to analysis request")
-
-                # Create a comprehensive message that includes text and image references
-                if image_data_urls:
-                    user_message_text += f"\n\nI have provided {len(image_data_urls)} image(s) for analysis. Please examine each image carefully and extract any visible serial numbers, model numbers, part numbers, or other identifying information from equipment labels or nameplates."
-
-                system_message = self._get_system_prompt()
-                
-                # Configure execution settings
-                settings = PromptExecutionSettings(
-                    function_choice_behavior=FunctionChoiceBehavior.Auto(),
-                )
-                kernel_arguments = KernelArguments(settings=settings)
-                kernel_arguments["diagnostics"] = []
-
-                # Create the chat completion agent
-                agent = ChatCompletionAgent(
-                    kernel=self.kernel,
-                    name="ImageAnalysisAgent",
-                    instructions=system_message,
-                    arguments=kernel_arguments
-                )
+    async def reply_planner_async(self, request: ChatThreadRequest) -> RequestResult:
+        """Main entry point for the image analysis agent (compatible with C# interface)"""
+        return await self.analyze_images(request)
+    
+    async def analyze_images_streaming(self, request: ChatThreadRequest) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Analyze images, streaming progress and model output as it is produced
+
+        Yields:
+            (event_type, payload) tuples: ("progress", {"image", "stage", ...}) while images are
+            fetched, encoded and submitted, ("delta", text) for each token delta,
+            ("function_call", step), ("error", message) on failure and a final ("done", RequestResult)
+        """
+        tracer = trace.get_tracer(__name__)
+        with tracer.start_as_current_span("Agent: ImageAnalysis (stream)") as current_span, \
+                RequestTracker("image_analysis") as tracker:
 
-                # Note: For now, we'll handle images by including them in the message context
-                # The Semantic Kernel agent framework may need additional configuration for image handling
-                
-                # Iterate over the async generator to get the final response
-                response = None
-                thread = None
+            if not request.files:
+                yield "done", RequestResult(
+                    content="No images provided for analysis.",
+                    intermediate_steps=[],
+                    thread_id=""
+                )
+                return
 
-                async for result in agent.invoke(messages=user_message_text, thread=thread, on_intermediate_message=handle_intermediate_steps):
-                    response = result
-                    thread = response.thread
+            intermediate_steps: List[str] = []
+            pending_steps: List[str] = []
 
-                if response is None:
-                    raise ValueError("No response received from the agent.")
+            async def handle_intermediate_steps(message: ChatMessageContent) -> None:
+                for fcc in message.items:
+                    if isinstance(fcc, FunctionCallContent):
+                        step = f"Function Call: {fcc.name} with arguments: {fcc.arguments}"
+                        intermediate_steps.append(step)
+                        pending_steps.append(step)
 
-                return RequestResult(
-                    content=f"{response}",
+            try:
+                image_names: List[str] = []
+                images: List[ImagePayload] = []
+                async for event_type, payload in self._prepare_images(request.files):
+                    if event_type == "image":
+                        images.append(payload)
+                    else:
+                        if payload["stage"] == "encoded":
+                            image_names.append(payload["image"])
+                        yield event_type, payload
+
+                user_message = self._build_user_message(request, images)
+                prompt = self._get_system_prompt()
+                current_span.set_attribute("image_analysis.prompt_version", prompt.version)
+
+                cache_key = None
+                if self.result_cache:
+                    cache_key = self._result_cache_key(user_message, prompt, images)
+                    if request.bypass_cache:
+                        self.result_cache.record_bypass()
+                    else:
+                        with track_stage("image_analysis", "cache_lookup"):
+                            cached = await self.result_cache.get(cache_key)
+                        current_span.set_attribute("image_analysis.cache_hit", cached is not None)
+                        if cached is not None:
+                            tracker.first_token()
+                            yield "delta", cached["content"]
+                            tracker.outcome = "success"
+                            yield "done", RequestResult(**cached)
+                            return
+
+                for image_name in image_names:
+                    yield "progress", {"image": image_name, "stage": "submitted"}
+
+                content = ""
+                thread = None
+                with track_stage("image_analysis", "generation"):
+                    async with aclosing(self.upstream.stream("generation", lambda: self._invoke_stream_on_deployment(
+                        prompt, user_message, handle_intermediate_steps
+                    ))) as stream:
+                        async for result in stream:
+                            thread = result.thread
+                            while pending_steps:
+                                yield "function_call", pending_steps.pop(0)
+                            if result.message.metadata:
+                                # The final chunk carries the completion's token usage
+                                tracker.usage(result.message.metadata.get("usage"))
+                            delta = result.message.content
+                            if delta:
+                                tracker.first_token()
+                                content += delta
+                                yield "delta", delta
+
+                while pending_steps:
+                    yield "function_call", pending_steps.pop(0)
+
+                if cache_key:
+                    await self.result_cache.set(cache_key, {
+                        "content": content,
+                        "intermediate_steps": intermediate_steps
+                    })
+
+                tracker.outcome = "success"
+                yield "done", RequestResult(
+                    content=content,
                     intermediate_steps=intermediate_steps,
                     thread_id=str(thread.id) if thread else ""
                 )
@@ -233,17 +604,4 @@ class ImageAnalysisAgent:
             except Exception as e:
                 error_msg = f"Error during image analysis: {str(e)}"
                 self.logger.error(error_msg)
-                return RequestResult(
-                    content=error_msg,
-                    intermediate_steps=intermediate_steps,
-                    thread_id=""
-                )
-
-    async def reply_planner_async(self, request: ChatThreadRequest) -> RequestResult:
-        """Main entry point for the image analysis agent (compatible with C# interface)"""
-        return await self.analyze_images(request)
-    
-    async def analyze_images_streaming(self, request: ChatThreadRequest) -> AsyncGenerator[str, None]:
-        """Streaming version for backward compatibility"""
-        result = await self.analyze_images(request)
-        yield result.content
+                yield "error", error_msg
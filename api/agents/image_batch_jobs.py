@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ..models.api_models import ChatThreadRequest, ImageBatchJobStatus, ImageFile
+from ..utils.resilience import UpstreamError
+from .image_analysis_agent import ImageAnalysisAgent
+
+
+class ImageBatchJob:
+    """State of one batch image analysis job"""
+
+    def __init__(self, job_id: str, message: Optional[str], bypass_cache: bool, results_path: str):
+        self.job_id = job_id
+        self.message = message
+        self.bypass_cache = bypass_cache
+        self.results_path = results_path
+        self.status = "queued"
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.error = ""
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.completed_at = ""
+        self.completed_monotonic: Optional[float] = None
+        self.done = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.succeeded - self.failed
+
+    def to_status(self) -> ImageBatchJobStatus:
+        return ImageBatchJobStatus(
+            job_id=self.job_id,
+            status=self.status,
+            total=self.total,
+            succeeded=self.succeeded,
+            failed=self.failed,
+            created_at=self.created_at,
+            completed_at=self.completed_at,
+            error=self.error,
+            results_url=f"/image-analysis/batch/{self.job_id}/results"
+        )
+
+
+class ImageBatchJobManager:
+    """
+    Runs batch image analysis jobs on an in-process worker pool, writing results to JSONL
+
+    Completed jobs are kept, with their result files, for retention_seconds, and at most
+    max_jobs are kept at all; the oldest completed jobs are evicted first. Running jobs are
+    never evicted.
+    """
+
+    def __init__(self, agent: ImageAnalysisAgent, results_dir: Optional[str] = None,
+                 concurrency: Optional[int] = None, max_attempts: Optional[int] = None,
+                 retention_seconds: Optional[float] = None, max_jobs: Optional[int] = None):
+        """
+        Args:
+            agent: Image analysis agent used to fetch and analyze each image
+            results_dir: Directory for the per-job JSONL result files
+            concurrency: Number of images analyzed at once across all jobs
+            max_attempts: Attempts per image before it is recorded as failed
+            retention_seconds: Time a completed job and its result file are kept
+            max_jobs: Number of jobs kept before the oldest completed ones are evicted
+        """
+        self.logger = logging.getLogger(__name__)
+        self.agent = agent
+        self.results_dir = results_dir or os.getenv(
+            "IMAGE_BATCH_RESULTS_DIR", os.path.join(tempfile.gettempdir(), "image_batch_results"))
+        self.concurrency = concurrency or int(os.getenv("IMAGE_BATCH_CONCURRENCY", "4"))
+        self.max_attempts = max_attempts or int(os.getenv("IMAGE_BATCH_MAX_ATTEMPTS", "3"))
+        self.retry_backoff_seconds = float(os.getenv("IMAGE_BATCH_RETRY_BACKOFF_SECONDS", "1"))
+        self.max_items = int(os.getenv("IMAGE_BATCH_MAX_ITEMS", "10000"))
+        self.retention_seconds = retention_seconds or float(os.getenv("IMAGE_BATCH_RETENTION_SECONDS", "86400"))
+        self.max_jobs = max_jobs or int(os.getenv("IMAGE_BATCH_MAX_JOBS", "100"))
+
+        self.jobs: Dict[str, ImageBatchJob] = {}
+        self._queue: "asyncio.Queue[Tuple[ImageBatchJob, str]]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+
+    async def submit(self, message: Optional[str] = None, blob_names: Optional[List[str]] = None,
+                     prefix: Optional[str] = None, bypass_cache: bool = False) -> ImageBatchJob:
+        """
+        Create a job for a list of blob names and/or every blob under a prefix
+
+        Args:
+            message: Prompt used for every image; the agent's default prompt when omitted
+            blob_names: Blob names in the image container
+            prefix: Blob name prefix to expand into blob names
+            bypass_cache: Skip the result cache lookup for every image
+
+        Returns:
+            The queued job
+        """
+        names = list(blob_names or [])
+        if prefix:
+            names.extend(await self.agent.list_blob_names(prefix, limit=self.max_items))
+        # Drop duplicates but keep the submitted order
+        names = list(dict.fromkeys(names))
+        if not names:
+            raise ValueError("No blobs found for the batch job")
+        if len(names) > self.max_items:
+            raise ValueError(f"Batch jobs are limited to {self.max_items} images")
+
+        await self._evict(reserve=1)
+        os.makedirs(self.results_dir, exist_ok=True)
+        job_id = str(uuid.uuid4())
+        job = ImageBatchJob(job_id, message, bypass_cache, os.path.join(self.results_dir, f"{job_id}.jsonl"))
+        job.total = len(names)
+        self.jobs[job_id] = job
+
+        self._ensure_workers()
+        for blob_name in names:
+            self._queue.put_nowait((job, blob_name))
+
+        self.logger.info(f"Queued batch job {job_id} with {job.total} images")
+        return job
+
+    def get(self, job_id: str) -> Optional[ImageBatchJob]:
+        """Get a job by ID"""
+        return self.jobs.get(job_id)
+
+    def _ensure_workers(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"image-batch-worker-{index}")
+                for index in range(self.concurrency)
+            ]
+
+    async def _worker(self) -> None:
+        while True:
+            job, blob_name = await self._queue.get()
+            try:
+                if job.status == "queued":
+                    job.status = "running"
+                record = await self._process_item(job, blob_name)
+                # Counted only once written, so a failed write is counted once, as a failure
+                await asyncio.to_thread(self._append_result, job.results_path, record)
+                if record["status"] == "succeeded":
+                    job.succeeded += 1
+                else:
+                    job.failed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive; the item is counted as failed
+                self.logger.error(f"Batch job {job.job_id} failed on {blob_name}: {e}")
+                job.failed += 1
+            finally:
+                self._queue.task_done()
+                if job.pending == 0 and not job.done.is_set():
+                    job.status = "completed"
+                    job.completed_at = datetime.now(timezone.utc).isoformat()
+                    job.completed_monotonic = time.monotonic()
+                    job.done.set()
+                    self.logger.info(
+                        f"Batch job {job.job_id} completed: {job.succeeded} succeeded, {job.failed} failed")
+                    await self._evict()
+
+    async def _process_item(self, job: ImageBatchJob, blob_name: str) -> dict:
+        """Fetch and analyze one image, retrying with exponential backoff"""
+        request = ChatThreadRequest(message=job.message or "", bypass_cache=job.bypass_cache)
+        image_file = ImageFile(name=blob_name, blob_name=blob_name)
+        last_error = ""
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                _, _, _, payload, _ = await self.agent._fetch_image_file(0, image_file)
+                if payload is None:
+                    raise ValueError(f"Could not fetch blob {blob_name}")
+                result = await self.agent.analyze_image_payloads(request, [payload])
+                return {
+                    "blob_name": blob_name,
+                    "status": "succeeded",
+                    "attempts": attempt,
+                    "content": result.content,
+                    "intermediate_steps": result.intermediate_steps
+                }
+            except Exception as e:
+                last_error = str(e)
+                self.logger.warning(f"Batch job {job.job_id}: attempt {attempt} for {blob_name} failed: {e}")
+                if attempt < self.max_attempts:
+                    delay = self.retry_backoff_seconds * 2 ** (attempt - 1)
+                    if isinstance(e, UpstreamError) and e.retry_after:
+                        # Wait out an open circuit or the model's Retry-After instead of failing fast again
+                        delay = max(delay, e.retry_after)
+                    await asyncio.sleep(delay)
+
+        return {
+            "blob_name": blob_name,
+            "status": "failed",
+            "attempts": self.max_attempts,
+            "error": last_error
+        }
+
+    @staticmethod
+    def _append_result(results_path: str, record: dict) -> None:
+        with open(results_path, "a", encoding="utf-8") as results_file:
+            results_file.write(json.dumps(record) + "\n")
+
+    async def _evict(self, reserve: int = 0) -> None:
+        """Drop completed jobs past their retention, then the oldest completed ones beyond max_jobs"""
+        now = time.monotonic()
+        completed = sorted(
+            (job for job in self.jobs.values() if job.completed_monotonic is not None),
+            key=lambda job: job.completed_monotonic)
+        excess = len(self.jobs) + reserve - self.max_jobs
+        evicted = []
+        for job in completed:
+            if now - job.completed_monotonic > self.retention_seconds or excess > 0:
+                del self.jobs[job.job_id]
+                evicted.append(job.results_path)
+                excess -= 1
+        if evicted:
+            await asyncio.to_thread(self._remove_results, evicted)
+            self.logger.info(f"Evicted {len(evicted)} completed batch jobs")
+
+    def _remove_results(self, results_paths: List[str]) -> None:
+        for results_path in results_paths:
+            try:
+                os.remove(results_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"Could not remove batch results {results_path}: {e}")
+
+    async def close(self) -> None:
+        """Stop the workers; unfinished items are abandoned"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
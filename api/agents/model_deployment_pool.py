@@ -0,0 +1,237 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+
+from ..utils.metrics import metrics
+from ..utils.resilience import (
+    CircuitOpenError, UpstreamUnavailableError, classify_error, deadline_expired, error_status_code
+)
+from .model_deployment_settings import configured_model_deployments
+
+deployment_latency = metrics.histogram(
+    "model_deployment_latency_seconds", "Model call time per deployment, by result", ("deployment", "result"))
+
+
+class ModelDeployment:
+    """One Azure OpenAI endpoint/deployment pair with its load, quota and ejection state"""
+
+    def __init__(self, name: str, endpoint: str, deployment_name: str, api_key: str, weight: float = 1.0):
+        self.name = name
+        self.endpoint = endpoint
+        self.deployment_name = deployment_name
+        self.weight = weight
+        self.service_id = f"azure-chat-completion-{name}"
+
+        self.service = AzureChatCompletion(
+            api_key=api_key,
+            endpoint=endpoint,
+            deployment_name=deployment_name,
+            service_id=self.service_id
+        )
+        # Retries belong to the image agent's UpstreamGuard, which moves them to another deployment;
+        # the hook reads the quota headers of every response
+        self.service.client = self.service.client.with_options(
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(event_hooks={"response": [self._record_quota]})
+        )
+
+        self.outstanding = 0
+        self.remaining_tokens: Optional[int] = None
+        self.remaining_requests: Optional[int] = None
+        self.ejected_until = 0.0
+        self.ejections_in_row = 0
+        self.consecutive_failures = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.ejections = 0
+        self.latency_seconds_total = 0.0
+
+    async def _record_quota(self, response: httpx.Response) -> None:
+        remaining_tokens = response.headers.get("x-ratelimit-remaining-tokens")
+        remaining_requests = response.headers.get("x-ratelimit-remaining-requests")
+        if remaining_tokens is not None and remaining_tokens.isdigit():
+            self.remaining_tokens = int(remaining_tokens)
+        if remaining_requests is not None and remaining_requests.isdigit():
+            self.remaining_requests = int(remaining_requests)
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self.requests - self.outstanding
+        return {
+            "available": self.available(time.monotonic()),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "ejections": self.ejections,
+            "remaining_tokens": self.remaining_tokens if self.remaining_tokens is not None else -1,
+            "remaining_requests": self.remaining_requests if self.remaining_requests is not None else -1,
+            "latency_seconds_avg": round(self.latency_seconds_total / completed, 3) if completed else 0.0,
+        }
+
+
+class ModelDeploymentPool:
+    """
+    Spreads model calls across several Azure OpenAI deployments
+
+    Each call goes to the available deployment with the fewest outstanding requests per unit of
+    weight ('least_outstanding'), or with the most remaining token quota as reported by the
+    x-ratelimit-remaining-tokens header ('remaining_quota'). A throttled deployment is ejected
+    until its Retry-After has passed; one that keeps failing is ejected for an interval that
+    doubles while failures continue. After the interval it is re-admitted on probation, where a
+    single failure ejects it again.
+    """
+
+    def __init__(self, deployments: List[ModelDeployment], strategy: Optional[str] = None,
+                 eject_after_failures: Optional[int] = None, eject_seconds: Optional[float] = None,
+                 max_eject_seconds: Optional[float] = None):
+        """
+        Args:
+            deployments: Deployments to balance across; all are expected to serve the same model
+            strategy: 'least_outstanding' or 'remaining_quota'
+            eject_after_failures: Consecutive transient failures that eject a deployment
+            eject_seconds: First ejection interval; also used for 429s without Retry-After
+            max_eject_seconds: Cap of the doubling ejection interval
+        """
+        if not deployments:
+            raise ValueError("At least one model deployment must be configured")
+        self.logger = logging.getLogger(__name__)
+        self.deployments = deployments
+        self.strategy = strategy or os.getenv("AZURE_OPENAI_BALANCING_STRATEGY", "least_outstanding")
+        if self.strategy not in ("least_outstanding", "remaining_quota"):
+            raise ValueError(f"Unknown balancing strategy '{self.strategy}'")
+        self.eject_after_failures = eject_after_failures or int(os.getenv("AZURE_OPENAI_EJECT_AFTER_FAILURES", "3"))
+        self.eject_seconds = eject_seconds or float(os.getenv("AZURE_OPENAI_EJECT_SECONDS", "10"))
+        self.max_eject_seconds = max_eject_seconds or float(os.getenv("AZURE_OPENAI_MAX_EJECT_SECONDS", "300"))
+        self._rotation = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "ModelDeploymentPool":
+        """Build the pool from the deployments configured in the environment; see configured_model_deployments"""
+        return cls([ModelDeployment(**settings) for settings in configured_model_deployments()])
+
+    def register(self, kernel: Kernel) -> None:
+        """Add every deployment's chat completion service to a kernel"""
+        for deployment in self.deployments:
+            kernel.add_service(deployment.service)
+
+    def _select(self) -> ModelDeployment:
+        now = time.monotonic()
+        candidates = [deployment for deployment in self.deployments if deployment.available(now)]
+        if not candidates:
+            retry_after = min(deployment.ejected_until for deployment in self.deployments) - now
+            raise CircuitOpenError("All model deployments are ejected", retry_after=max(1.0, retry_after))
+
+        # Rotate so ties do not always land on the first deployment
+        offset = next(self._rotation) % len(candidates)
+        candidates = candidates[offset:] + candidates[:offset]
+        if self.strategy == "remaining_quota":
+            # Deployments that have not reported quota yet are tried first
+            return max(candidates, key=lambda deployment: (
+                deployment.remaining_tokens if deployment.remaining_tokens is not None else float("inf"),
+                -deployment.outstanding))
+        return min(candidates, key=lambda deployment: deployment.outstanding / deployment.weight)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[ModelDeployment]:
+        """
+        Pick a deployment for one model call and record how the call went
+
+        Transient failures are re-raised as UpstreamUnavailableError whose retry_after is None while
+        another deployment is available, so a retry moves on immediately instead of waiting out the
+        throttled deployment's Retry-After.
+
+        Yields:
+            The deployment whose service_id the call must use
+
+        Raises:
+            CircuitOpenError: If every deployment is ejected
+        """
+        deployment = self._select()
+        deployment.outstanding += 1
+        deployment.requests += 1
+        start = time.perf_counter()
+        try:
+            yield deployment
+        except asyncio.CancelledError:
+            if deadline_expired():
+                deployment.timeouts += 1
+                self._record_failure(deployment, retry_after=None)
+                self._observe(deployment, start, "timeout")
+            raise
+        except Exception as e:
+            retryable, retry_after = classify_error(e)
+            if not retryable:
+                self._observe(deployment, start, "error")
+                raise
+            throttled = error_status_code(e) == 429
+            if throttled:
+                deployment.throttled += 1
+                self._eject(deployment, retry_after or self.eject_seconds, "throttled")
+            else:
+                self._record_failure(deployment, retry_after)
+            self._observe(deployment, start, "throttled" if throttled else "error")
+            raise UpstreamUnavailableError(
+                f"Model deployment '{deployment.name}' failed: {e}", retry_after=self._retry_after()) from e
+        else:
+            deployment.consecutive_failures = 0
+            deployment.ejections_in_row = 0
+            self._observe(deployment, start, "success")
+        finally:
+            deployment.outstanding -= 1
+
+    def _observe(self, deployment: ModelDeployment, start: float, result: str) -> None:
+        elapsed = time.perf_counter() - start
+        deployment.latency_seconds_total += elapsed
+        deployment_latency.observe(elapsed, deployment=deployment.name, result=result)
+
+    def _record_failure(self, deployment: ModelDeployment, retry_after: Optional[float]) -> None:
+        deployment.failures += 1
+        deployment.consecutive_failures += 1
+        # A deployment back from ejection is on probation: its first failure ejects it again
+        if deployment.ejections_in_row or deployment.consecutive_failures >= self.eject_after_failures:
+            interval = min(self.max_eject_seconds, self.eject_seconds * 2 ** deployment.ejections_in_row)
+            self._eject(deployment, max(interval, retry_after or 0.0), "failing")
+
+    def _eject(self, deployment: ModelDeployment, seconds: float, reason: str) -> None:
+        now = time.monotonic()
+        deployment.consecutive_failures = 0
+        if not deployment.available(now):
+            # Calls that were already in flight when it was ejected only extend the interval
+            deployment.ejected_until = max(deployment.ejected_until, now + seconds)
+            return
+        deployment.ejected_until = now + seconds
+        deployment.ejections += 1
+        deployment.ejections_in_row += 1
+        self.logger.warning(f"Ejected model deployment '{deployment.name}' ({reason}) for {seconds:.1f}s")
+
+    def _retry_after(self) -> Optional[float]:
+        now = time.monotonic()
+        if any(deployment.available(now) for deployment in self.deployments):
+            return None
+        return max(0.0, min(deployment.ejected_until for deployment in self.deployments) - now)
+
+    async def close(self) -> None:
+        """Close the deployments' HTTP clients"""
+        for deployment in self.deployments:
+            await deployment.service.client.close()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-deployment load, quota, latency, throttle and ejection counters"""
+        return {deployment.name: deployment.stats() for deployment in self.deployments}
+
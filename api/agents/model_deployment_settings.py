@@ -0,0 +1,48 @@
+import os
+import json
+from typing import Any, Dict, List
+
+
+def configured_model_deployments() -> List[Dict[str, Any]]:
+    """
+    Read the chat model deployments from AZURE_OPENAI_CHAT_DEPLOYMENTS, a JSON list such as
+    [{"name": "eastus", "endpoint": "https://...", "deployment": "gpt-4o", "api_key": "...", "weight": 2}],
+    or from the single AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_CHAT_DEPLOYMENT_NAME pair when it is unset.
+    Entries without api_key use AZURE_OPENAI_API_KEY.
+
+    Kept apart from ModelDeploymentPool so the health probes can read the configuration without
+    importing Semantic Kernel.
+
+    Returns:
+        One dict per deployment with name, endpoint, deployment_name, api_key and weight
+
+    Raises:
+        ValueError: If an entry lacks its endpoint, deployment name or API key
+    """
+    default_api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    configured = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENTS")
+    if configured:
+        entries = json.loads(configured)
+    else:
+        entries = [{
+            "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
+            "deployment": os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "gpt-4o"),
+        }]
+
+    deployments = []
+    for index, entry in enumerate(entries):
+        endpoint = entry.get("endpoint")
+        deployment_name = entry.get("deployment")
+        api_key = entry.get("api_key") or default_api_key
+        if not endpoint or not deployment_name:
+            raise ValueError("Missing required environment variables for OpenAI configuration.")
+        if not api_key:
+            raise ValueError("Azure OpenAI API key must be configured")
+        deployments.append({
+            "name": entry.get("name") or (deployment_name if len(entries) == 1 else f"{deployment_name}-{index}"),
+            "endpoint": endpoint,
+            "deployment_name": deployment_name,
+            "api_key": api_key,
+            "weight": float(entry.get("weight", 1.0)),
+        })
+    return deployments
@@ -0,0 +1,226 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# ${name} placeholders; '$${' escapes a literal '${'. A lone '$' is plain text.
+_PLACEHOLDER = re.compile(r"\$(\$)?\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class PromptError(RuntimeError):
+    """Raised when a prompt cannot be loaded or rendered"""
+
+
+class Prompt:
+    """One loaded prompt file, precompiled into literal and placeholder segments"""
+
+    __slots__ = ("name", "path", "text", "version", "variables", "mtime_ns", "loaded_at", "_segments")
+
+    def __init__(self, name: str, path: str, text: str, mtime_ns: int):
+        self.name = name
+        self.path = path
+        self.text = text
+        self.mtime_ns = mtime_ns
+        self.loaded_at = time.time()
+        # Content-addressed, so the same text always gets the same version across processes and restarts
+        self.version = f"{name}@{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+
+        segments: List[Tuple[bool, str]] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(text):
+            segments.append((False, text[position:match.start()]))
+            if match.group(1):
+                segments.append((False, "${" + match.group(2) + "}"))
+            else:
+                segments.append((True, match.group(2)))
+            position = match.end()
+        segments.append((False, text[position:]))
+        self._segments = [segment for segment in segments if segment[0] or segment[1]]
+        self.variables = frozenset(value for is_variable, value in self._segments if is_variable)
+
+    def render(self, **values: Any) -> str:
+        """
+        Substitute the prompt's ${name} placeholders
+
+        Args:
+            **values: A value for every placeholder in the prompt; extra values are ignored
+
+        Returns:
+            The rendered prompt text
+
+        Raises:
+            PromptError: If a placeholder has no value
+        """
+        if not self.variables:
+            return self.text
+        missing = self.variables.difference(values)
+        if missing:
+            raise PromptError(f"Prompt {self.version} is missing values for: {', '.join(sorted(missing))}")
+        return "".join(str(values[value]) if is_variable else value for is_variable, value in self._segments)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "variables": sorted(self.variables),
+            "loaded_at": self.loaded_at,
+        }
+
+
+class PromptStore:
+    """
+    In-memory prompts loaded from the agents' prompts directory
+
+    Prompts are read once and served from memory. The files' modification times are checked at
+    most every check_interval_seconds, and a changed file is reloaded on its next use. A file
+    that becomes unreadable or empty, or that adds a placeholder its agent has no value for, keeps
+    serving its last good version; a prompt that was never loaded raises PromptError instead of
+    falling back to a generic prompt.
+    """
+
+    def __init__(self, directory: Optional[str] = None, check_interval_seconds: Optional[float] = None):
+        """
+        Args:
+            directory: Directory holding the prompt files
+            check_interval_seconds: Minimum time between modification time checks of a prompt;
+                0 checks on every use, a negative value never checks
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory or os.getenv(
+            "PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts"))
+        self.check_interval_seconds = (
+            check_interval_seconds if check_interval_seconds is not None
+            else float(os.getenv("PROMPT_RELOAD_CHECK_SECONDS", "2")))
+        self._prompts: Dict[str, Prompt] = {}
+        self._checked_at: Dict[str, float] = {}
+        # Prompt name -> placeholder names its agent supplies values for
+        self._value_names: Dict[str, frozenset] = {}
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.reloads = 0
+        self.reload_errors = 0
+
+    @staticmethod
+    def prompt_name(prompt_filename: str) -> str:
+        """Prompt ID for a file name, e.g. 'image_analysis_system_prompt' for 'image_analysis_system_prompt.txt'"""
+        return os.path.splitext(os.path.basename(prompt_filename))[0]
+
+    def _path(self, prompt_filename: str) -> str:
+        if not os.path.splitext(prompt_filename)[1]:
+            prompt_filename += ".txt"
+        return os.path.join(self.directory, prompt_filename)
+
+    def declare_values(self, prompt_filename: str, names: Iterable[str]) -> None:
+        """
+        Declare the placeholder values an agent renders a prompt with
+
+        A version of the prompt that uses any other placeholder fails to load, so a hot reload that
+        adds one keeps the previous version instead of failing every request.
+
+        Args:
+            prompt_filename: Name of the prompt file (e.g., 'image_analysis_system_prompt.txt')
+            names: Names of the values passed to Prompt.render
+        """
+        with self._lock:
+            self._value_names[self.prompt_name(prompt_filename)] = frozenset(names)
+
+    def _load(self, name: str, path: str) -> Prompt:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            with open(path, 'r', encoding='utf-8') as file:
+                text = file.read().strip()
+        except OSError as e:
+            raise PromptError(f"Cannot read prompt file {path}: {e}") from e
+        if not text:
+            raise PromptError(f"Prompt file {path} is empty")
+        prompt = Prompt(name, path, text, mtime_ns)
+        value_names = self._value_names.get(name)
+        if value_names is not None and not prompt.variables <= value_names:
+            missing = ", ".join(sorted(prompt.variables - value_names))
+            raise PromptError(f"Prompt {prompt.version} uses placeholders without values: {missing}")
+        return prompt
+
+    def get(self, prompt_filename: str) -> Prompt:
+        """
+        Get a prompt, loading it on first use and reloading it when its file has changed
+
+        Args:
+            prompt_filename: Name of the prompt file (e.g., 'image_analysis_system_prompt.txt')
+
+        Returns:
+            The current version of the prompt
+
+        Raises:
+            PromptError: If the prompt has never been loaded successfully
+        """
+        name = self.prompt_name(prompt_filename)
+        prompt = self._prompts.get(name)
+        now = time.monotonic()
+        if prompt is not None and (
+                self.check_interval_seconds < 0 or now - self._checked_at[name] < self.check_interval_seconds):
+            return prompt
+
+        with self._lock:
+            prompt = self._prompts.get(name)
+            self._checked_at[name] = now
+            if prompt is None:
+                prompt = self._load(name, self._path(prompt_filename))
+                self._prompts[name] = prompt
+                self.loads += 1
+                self.logger.info(f"Loaded prompt {prompt.version}")
+                return prompt
+            try:
+                if os.stat(prompt.path).st_mtime_ns != prompt.mtime_ns:
+                    return self._replace(prompt, self._load(name, prompt.path))
+            except (OSError, PromptError) as e:
+                self.reload_errors += 1
+                self.logger.error(f"Keeping prompt {prompt.version}, reload failed: {e}")
+            return prompt
+
+    def _replace(self, current: Prompt, loaded: Prompt) -> Prompt:
+        self._prompts[current.name] = loaded
+        self.reloads += 1
+        if loaded.version != current.version:
+            self.logger.info(f"Reloaded prompt {current.name}: {current.version} -> {loaded.version}")
+        return loaded
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        Re-read every loaded prompt now, regardless of modification times
+
+        Returns:
+            Per prompt, its version and whether it changed, or the error that kept the previous version
+        """
+        report: Dict[str, Any] = {}
+        with self._lock:
+            for name, prompt in list(self._prompts.items()):
+                self._checked_at[name] = time.monotonic()
+                try:
+                    loaded = self._replace(prompt, self._load(name, prompt.path))
+                    report[name] = {"version": loaded.version, "changed": loaded.version != prompt.version}
+                except PromptError as e:
+                    self.reload_errors += 1
+                    self.logger.error(f"Keeping prompt {prompt.version}, reload failed: {e}")
+                    report[name] = {"version": prompt.version, "changed": False, "error": str(e)}
+        return report
+
+    def versions(self) -> Dict[str, Dict[str, Any]]:
+        """Return the version, path, placeholders and load time of every loaded prompt"""
+        return {name: prompt.info() for name, prompt in self._prompts.items()}
+
+    def stats(self) -> Dict[str, int]:
+        """Return load, reload and reload error counters"""
+        return {
+            "prompts": len(self._prompts),
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+
+# Shared by every agent in the process
+prompt_store = PromptStore()
@@ -1,10 +1,44 @@
+import os
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .routes import default, agents
+from .agents.agent_client_pool import agent_client_pool
+from .agents.agent_registry import agent_registry
+from .agents.dependency_probes import dependency_health, dependency_probes
+from .utils.loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared agent client, build eager agents and start dependency probes; close everything on shutdown"""
+    await loop_monitor.start()
+    if agent_client_pool.endpoint and not agent_client_pool.lazy:
+        try:
+            with agent_registry.timed("agent_client_warm_up"):
+                await agent_client_pool.warm_up(os.getenv("AZURE_AI_AGENT_ID"))
+        except Exception as e:
+            # Serve anyway; the pool retries on the first chat request
+            logger.error(f"Shared agent client not ready at startup: {e}")
+    with agent_registry.timed("eager_init"):
+        await agent_registry.start()
+    logger.info(f"Startup timings: {agent_registry.startup_timings}")
+    await dependency_health.start()
+    yield
+    await dependency_health.stop()
+    await dependency_probes.close()
+    await agent_registry.close()
+    await agent_client_pool.close()
+    await loop_monitor.stop()
+
 
 app = FastAPI(
     title="Agent Hub Python API",
     description="FastAPI application with status endpoint and AI agent chat capabilities",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Include route modules
@@ -29,6 +29,7 @@ class ChatThreadRequest(BaseModel):
     thread_id: Optional[str] = None
     file: Optional[str] = None
     files: Optional[List[ImageFile]] = None
+    bypass_cache: bool = False
 
 
 class RequestResult(BaseModel):
@@ -47,6 +48,7 @@ class ChatRequest(BaseModel):
     thread_id: Optional[str] = None
     file: Optional[str] = None
     files: Optional[List[ImageFile]] = None
+    bypass_cache: bool = False
 
 
 class ChatResponse(BaseModel):
@@ -57,3 +59,24 @@ class ChatResponse(BaseModel):
     files: List[dict] = []
     intermediate_steps: List[str] = []
     code_content: str = ""
+
+
+class ImageBatchRequest(BaseModel):
+    """Model for a batch image analysis job request"""
+    message: Optional[str] = None
+    blob_names: Optional[List[str]] = None
+    prefix: Optional[str] = None
+    bypass_cache: bool = False
+
+
+class ImageBatchJobStatus(BaseModel):
+    """Model for batch image analysis job status"""
+    job_id: str
+    status: str
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    created_at: str = ''
+    completed_at: str = ''
+    error: str = ''
+    results_url: str = ''
@@ -1,15 +1,96 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from ..models.api_models import ChatRequest, ChatResponse, ChatThreadRequest
-from ..agents.chat_agent import ChatAgentService
-from ..agents.image_analysis_agent import ImageAnalysisAgent
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from ..models.api_models import ChatRequest, ChatResponse, ChatThreadRequest, RequestResult, ImageBatchRequest, ImageBatchJobStatus
+from ..agents.agent_client_pool import agent_client_pool
+from ..agents.agent_registry import AgentUnavailableError, agent_registry
+from ..agents.prompt_store import prompt_store
+from ..agents.agent_limiter import AgentLease, AgentQueueFullError, AgentQueueTimeoutError
+from ..utils.resilience import UpstreamError
+import os
 import json
+import math
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Optional
 
 router = APIRouter()
 
-# Initialize the agent services
-chat_agent_service = ChatAgentService()
-image_analysis_agent = ImageAnalysisAgent()
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _format_sse(event_type: Optional[str], data: Any) -> str:
+    """Frame a single server-sent event; unnamed events carry only a data line"""
+    if event_type:
+        return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+    return f"data: {json.dumps(data)}\n\n"
+
+
+async def _get_agent(name: str) -> Any:
+    """Get an agent from the registry, answering 503 if it cannot be built"""
+    try:
+        return await agent_registry.get(name)
+    except AgentUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def _acquire_slot(name: str) -> AgentLease:
+    """Take one of the agent's in-flight slots, answering 429/503 when the agent is saturated"""
+    try:
+        return await agent_registry.limiter(name).acquire()
+    except AgentQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except AgentQueueTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+def _upstream_http_error(error: UpstreamError) -> HTTPException:
+    """Answer 503 (504 for deadlines) when upstream is degraded, passing on how long to back off"""
+    headers = {"Retry-After": str(max(1, math.ceil(error.retry_after)))} if error.retry_after else None
+    return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+
+
+async def _release_when_done(stream: AsyncIterator[str], lease: AgentLease) -> AsyncIterator[str]:
+    """Hold an agent slot for as long as a streaming response is being produced"""
+    try:
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        lease.release()
+
+
+def _streaming_response(stream: AsyncIterator[str], lease: AgentLease) -> StreamingResponse:
+    # The background task covers responses that end before the stream is first iterated
+    return StreamingResponse(
+        _release_when_done(stream, lease),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(lease.release)
+    )
+
+
+def _to_chat_response(result: RequestResult) -> ChatResponse:
+    """Convert an agent result into the API chat response"""
+    return ChatResponse(
+        content=result.content,
+        thread_id=result.thread_id,
+        sources=[{
+            "quote": source.quote,
+            "title": source.title,
+            "url": source.url,
+            "start_index": source.start_index,
+            "end_index": source.end_index
+        } for source in result.sources],
+        files=[{"id": file_ref.id} for file_ref in result.files],
+        intermediate_steps=result.intermediate_steps,
+        code_content=result.code_content
+    )
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -17,6 +98,9 @@ async def chat_with_agent(request: ChatRequest):
     """
     Chat with the AI agent.
     """
+    chat_agent_service = await _get_agent("chat")
+    lease = await _acquire_slot("chat")
+
     try:
         # Create the chat thread request
         chat_request = ChatThreadRequest(
@@ -30,26 +114,115 @@ async def chat_with_agent(request: ChatRequest):
         result = await chat_agent_service.run_chat_sk(chat_request)
 
         # Return the response
-        return ChatResponse(
-            content=result.content,
-            thread_id=result.thread_id,
-            sources=[{
-                "quote": source.quote,
-                "title": source.title,
-                "url": source.url,
-                "start_index": source.start_index,
-                "end_index": source.end_index
-            } for source in result.sources],
-            files=[{"id": file_ref.id} for file_ref in result.files],
-            intermediate_steps=result.intermediate_steps,
-            code_content=result.code_content
-        )
+        return _to_chat_response(result)
 
+    except UpstreamError as ue:
+        raise _upstream_http_error(ue)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        lease.release()
+
+
+@router.post("/chat-stream")
+async def chat_with_agent_stream(request: ChatRequest, http_request: Request):
+    """
+    Chat with the AI agent, streaming each delta, annotation, file reference and
+    function call as a server-sent event, followed by a final "done" event.
+    """
+    if not request.message:
+        raise HTTPException(status_code=400, detail="No messages found in request.")
+
+    chat_request = ChatThreadRequest(
+        message=request.message,
+        thread_id=request.thread_id,
+        file=request.file,
+        files=request.files
+    )
+    chat_agent_service = await _get_agent("chat")
+    lease = await _acquire_slot("chat")
+
+    # Wait for the first event before the response starts, so failures up to the first token
+    # (setup, circuit open, first-token deadline) get the same status codes as /chat
+    events = chat_agent_service.stream_chat_sk(chat_request)
+    try:
+        first_event = await events.__anext__()
+    except StopAsyncIteration:
+        first_event = None
+    except UpstreamError as ue:
+        lease.release()
+        raise _upstream_http_error(ue)
+    except ValueError as ve:
+        lease.release()
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        lease.release()
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {str(e)}")
+    except BaseException:
+        # Cancelled, e.g. by a client disconnect: closing the agent stream cancels the upstream run
+        await events.aclose()
+        lease.release()
+        raise
+
+    async def all_events():
+        if first_event is not None:
+            yield first_event
+            async for event in events:
+                yield event
+
+    async def generate_events():
+        # Closing the agent stream on disconnect cancels the upstream run
+        async with aclosing(events), aclosing(all_events()) as chat_events:
+            try:
+                async for event_type, payload in chat_events:
+                    if await http_request.is_disconnected():
+                        break
+                    if event_type == "done":
+                        yield _format_sse("done", _to_chat_response(payload).model_dump())
+                    elif event_type == "thread":
+                        yield _format_sse("thread", {"thread_id": payload})
+                    elif event_type == "function_call":
+                        yield _format_sse("function_call", {"content": payload})
+                    elif isinstance(payload, BaseModel):
+                        yield _format_sse(event_type, payload.model_dump())
+                    else:
+                        yield _format_sse(event_type, payload)
+            except ValueError as ve:
+                yield _format_sse("error", {"detail": str(ve)})
+            except Exception as e:
+                yield _format_sse("error", {"detail": f"Internal server error: {str(e)}"})
+
+    return _streaming_response(generate_events(), lease)
+
+
+@router.post("/chat/agent-cache/invalidate")
+async def invalidate_agent_cache(agent_id: Optional[str] = None):
+    """
+    Drop cached agent definitions so the next chat request fetches them again.
+    """
+    agent_client_pool.invalidate_agent_definition(agent_id)
+    return {"invalidated": agent_id or "all", "agent_client_pool": agent_client_pool.stats()}
+
+
+@router.get("/prompts")
+async def get_prompts():
+    """
+    Version ID, file and placeholders of every loaded system prompt.
+    """
+    return {"prompts": prompt_store.versions(), "prompt_store": prompt_store.stats()}
+
+
+@router.post("/prompts/reload")
+async def reload_prompts():
+    """
+    Re-read every loaded system prompt from disk now instead of waiting for the modification time check.
+    A prompt that fails to load keeps its previous version.
+    """
+    return {"prompts": prompt_store.reload(), "prompt_store": prompt_store.stats()}
 
 
 @router.post("/image-analysis")
@@ -57,6 +230,9 @@ async def analyze_images(request: ChatRequest):
     """
     Analyze images for serial number extraction from equipment labels.
     """
+    image_analysis_agent = await _get_agent("image_analysis")
+    lease = await _acquire_slot("image_analysis")
+
     try:
         # Validate that images are provided
         if not request.files:
@@ -66,7 +242,8 @@ async def analyze_images(request: ChatRequest):
         analysis_request = ChatThreadRequest(
             message=request.message,
             thread_id=request.thread_id,
-            files=request.files
+            files=request.files,
+            bypass_cache=request.bypass_cache
         )
 
         # Get the analysis result
@@ -82,18 +259,26 @@ async def analyze_images(request: ChatRequest):
             code_content=""
         )
 
+    except UpstreamError as ue:
+        raise _upstream_http_error(ue)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        lease.release()
 
 
 @router.post("/image-analysis-stream")
-async def analyze_images_stream(request: ChatRequest):
+async def analyze_images_stream(request: ChatRequest, http_request: Request):
     """
-    Analyze images for serial number extraction (streaming version for backward compatibility).
+    Analyze images for serial number extraction, streaming per-image progress
+    events and then the model's token deltas as server-sent events.
     """
+    image_analysis_agent = await _get_agent("image_analysis")
+    lease = await _acquire_slot("image_analysis")
+
     try:
         # Validate that images are provided
         if not request.files:
@@ -103,30 +288,123 @@ async def analyze_images_stream(request: ChatRequest):
         analysis_request = ChatThreadRequest(
             message=request.message,
             thread_id=request.thread_id,
-            files=request.files
+            files=request.files,
+            bypass_cache=request.bypass_cache
         )
 
-        # Stream the analysis results
+        # Stream progress events and token deltas as they are produced
         async def generate_response():
-            full_response = ""
-            async for chunk in image_analysis_agent.analyze_images_streaming(analysis_request):
-                full_response += chunk
-                yield f"data: {json.dumps({'content': chunk, 'type': 'text'})}\n\n"
-
-            # Send final response
-            yield f"data: {json.dumps({'content': '', 'type': 'end', 'full_response': full_response})}\n\n"
-
-        return StreamingResponse(
-            generate_response(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-            }
+            async with aclosing(image_analysis_agent.analyze_images_streaming(analysis_request)) as events:
+                async for event_type, payload in events:
+                    if await http_request.is_disconnected():
+                        break
+                    if event_type == "delta":
+                        yield _format_sse(None, {'content': payload, 'type': 'text'})
+                    elif event_type == "progress":
+                        yield _format_sse(None, {**payload, 'type': 'progress'})
+                    elif event_type == "function_call":
+                        yield _format_sse(None, {'content': payload, 'type': 'function_call'})
+                    elif event_type == "error":
+                        yield _format_sse(None, {'content': payload, 'type': 'error'})
+                    elif event_type == "done":
+                        # Send final response
+                        yield _format_sse(None, {
+                            'content': '',
+                            'type': 'end',
+                            'full_response': payload.content,
+                            'thread_id': payload.thread_id,
+                            'intermediate_steps': payload.intermediate_steps
+                        })
+
+        return _streaming_response(generate_response(), lease)
+
+    except ValueError as ve:
+        lease.release()
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        lease.release()
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/image-analysis/batch", response_model=ImageBatchJobStatus, status_code=202)
+async def submit_image_batch(request: ImageBatchRequest):
+    """
+    Queue a batch image analysis job for a list of blob names and/or a blob name prefix.
+    """
+    if not request.blob_names and not request.prefix:
+        raise HTTPException(status_code=400, detail="Provide blob_names or prefix")
+    image_batch_jobs = await _get_agent("image_batch")
+
+    try:
+        job = await image_batch_jobs.submit(
+            message=request.message,
+            blob_names=request.blob_names,
+            prefix=request.prefix,
+            bypass_cache=request.bypass_cache
         )
+        return job.to_status()
+
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/image-analysis/batch/{job_id}", response_model=ImageBatchJobStatus)
+async def get_image_batch(job_id: str):
+    """
+    Get the progress of a batch image analysis job.
+    """
+    image_batch_jobs = agent_registry.peek("image_batch")
+    job = image_batch_jobs.get(job_id) if image_batch_jobs else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job {job_id} not found")
+    return job.to_status()
+
+
+@router.get("/image-analysis/batch/{job_id}/results")
+async def get_image_batch_results(job_id: str):
+    """
+    Stream the per-image results written so far as JSON lines.
+    """
+    image_batch_jobs = agent_registry.peek("image_batch")
+    job = image_batch_jobs.get(job_id) if image_batch_jobs else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job {job_id} not found")
+
+    async def read_results():
+        if not os.path.exists(job.results_path):
+            return
+        with open(job.results_path, "rb") as results_file:
+            while chunk := await asyncio.to_thread(results_file.read, 64 * 1024):
+                yield chunk
+
+    return StreamingResponse(read_results(), media_type="application/x-ndjson")
+
+
+@router.post("/agents/{name}/invoke", response_model=ChatResponse)
+async def invoke_agent(name: str, request: ChatRequest):
+    """
+    Invoke any registered agent by name, subject to its in-flight and queue limits.
+    """
+    handler = agent_registry.handler(name)
+    if handler is None:
+        raise HTTPException(status_code=404, detail=f"Agent '{name}' not found or not invocable")
+    agent = await _get_agent(name)
+    lease = await _acquire_slot(name)
+
+    try:
+        result = await handler(agent, request)
+        return _to_chat_response(result)
 
+    except UpstreamError as ue:
+        raise _upstream_http_error(ue)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        lease.release()
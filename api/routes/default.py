@@ -1,5 +1,12 @@
+from typing import Iterator
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from ..agents.agent_client_pool import agent_client_pool
+from ..agents.agent_registry import agent_registry
+from ..agents.dependency_probes import dependency_health
+from ..agents.prompt_store import prompt_store
+from ..utils.loop_monitor import loop_monitor
+from ..utils.metrics import StatsSource, metrics
 
 router = APIRouter()
 
@@ -14,11 +21,100 @@ async def get_status():
         content={
             "status": "healthy",
             "message": "Service is running",
-            "version": "0.1.0"
+            "version": "0.1.0",
+            "agents": agent_registry.stats()
         }
     )
 
 
+@router.get("/ready")
+async def get_ready():
+    """
+    Readiness endpoint for load balancers: 503 while a required dependency's last probe failed
+    or is stale. Served from cached probe results, never calls upstream.
+    """
+    readiness = dependency_health.readiness()
+    return JSONResponse(status_code=200 if readiness["status"] == "ready" else 503, content=readiness)
+
+
+@router.get("/health/deep")
+async def get_deep_health():
+    """
+    Cached result, latency and age of the latest probe of the agent endpoint, blob storage
+    and the model deployment.
+    """
+    report = dependency_health.report()
+    return JSONResponse(status_code=200 if report["status"] == "ready" else 503, content=report)
+
+
+def _component_stats() -> Iterator[StatsSource]:
+    """Counters kept by the agents' clients, caches and limiters, for folding into /metrics"""
+    registry_stats = agent_registry.stats()
+    for name, agent_stats in registry_stats["agents"].items():
+        yield "agent", {"agent": name}, {"built": agent_stats["built"], **agent_stats["limits"]}
+    for component, seconds in registry_stats["startup_timings"].items():
+        yield "startup", {"component": component}, {"seconds": seconds}
+    yield "agent_client_pool", {}, agent_client_pool.stats()
+    yield "event_loop", {}, loop_monitor.stats()
+    for dependency, dependency_stats in dependency_health.stats().items():
+        yield "dependency", {"dependency": dependency}, dependency_stats
+    yield "prompt_store", {}, prompt_store.stats()
+    for name, prompt in prompt_store.versions().items():
+        yield "prompt", {"prompt": name, "version": prompt["version"]}, {"loaded_at": prompt["loaded_at"]}
+
+    # Report only agents that were already built; scraping must not trigger their construction
+    chat_agent_service = agent_registry.peek("chat")
+    if chat_agent_service:
+        yield "thread_vector_store_cache", {}, chat_agent_service.vector_store_cache.stats()
+        yield "agent_file_cache", {}, chat_agent_service.file_cache.stats()
+        yield "document_vector_stores", {}, chat_agent_service.document_stores.stats()
+        if chat_agent_service.thread_pool:
+            yield "agent_thread_pool", {}, chat_agent_service.thread_pool.stats()
+        yield "upstream", {"upstream": chat_agent_service.upstream.name}, chat_agent_service.upstream.stats()
+    image_analysis_agent = agent_registry.peek("image_analysis")
+    if image_analysis_agent:
+        yield "upstream", {"upstream": image_analysis_agent.upstream.name}, image_analysis_agent.upstream.stats()
+        yield "image_analysis_agent_cache", {}, image_analysis_agent.agent_cache_stats()
+        if image_analysis_agent.coalescing:
+            yield "image_analysis_coalescing", {}, image_analysis_agent.coalescing.stats()
+        for deployment, deployment_stats in image_analysis_agent.deployments.stats().items():
+            yield "model_deployment", {"deployment": deployment}, deployment_stats
+    if image_analysis_agent and image_analysis_agent.result_cache:
+        yield "image_analysis_cache", {}, image_analysis_agent.result_cache.stats()
+    if image_analysis_agent and image_analysis_agent.preprocessor:
+        yield "image_preprocessing", {}, image_analysis_agent.preprocessor.stats()
+
+
+@router.get("/debug/event-loop")
+async def get_event_loop_diagnostics(limit: int = 10):
+    """
+    Event-loop lag and the stacks that blocked the loop for the longest total time. Stacks are
+    captured only with LOOP_MONITOR_CAPTURE_STACKS=true.
+    """
+    return loop_monitor.report(limit)
+
+
+@router.post("/debug/event-loop/reset")
+async def reset_event_loop_diagnostics():
+    """
+    Forget recorded lag and blocking stacks.
+    """
+    loop_monitor.reset()
+    return loop_monitor.report(0)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, time to first token, token counts,
+    in-flight gauges and the counters of the shared clients, caches and agent limiters.
+    """
+    return PlainTextResponse(
+        metrics.render(_component_stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @router.get("/")
 async def root():
     """
@@ -27,6 +123,9 @@ async def root():
     return {
         "message": "Welcome to Agent Hub Python API",
         "status_endpoint": "/status",
+        "ready_endpoint": "/ready",
+        "deep_health_endpoint": "/health/deep",
+        "metrics_endpoint": "/metrics",
         "chat_endpoint": "/chat",
         "image_analysis_endpoint": "/image-analysis",
         "docs": "/docs"
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .cache_utils import TTLCache, SqliteKeyValueStore
+
+
+class AgentFileCache:
+    """
+    Maps document content hashes to uploaded agent file IDs, and blob versions to content hashes
+
+    Like ThreadVectorStoreCache, mappings live in an in-memory LRU plus an optional SQLite tier
+    shared by replicas. A blob version is its name and ETag, so an unchanged blob is recognised
+    from its properties alone, before anything is downloaded.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of mappings kept in memory
+            db_path: Path of an SQLite database shared by replicas, or None to keep mappings in memory only
+        """
+        self.logger = logging.getLogger(__name__)
+        self._memory = TTLCache(max_entries=max_entries)
+        self._disk = SqliteKeyValueStore(db_path, table="agent_files") if db_path else None
+        # Uploads in progress by content hash, so concurrent requests for one document upload it once
+        self._uploads: Dict[str, "asyncio.Task[Any]"] = {}
+
+        self.disk_hits = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.shared_uploads = 0
+
+    async def _get(self, key: str) -> Optional[str]:
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        if self._disk:
+            try:
+                value = await asyncio.to_thread(self._disk.get, key)
+            except Exception as e:
+                self.logger.warning(f"Agent file cache disk lookup failed: {e}")
+                value = None
+            if value is not None:
+                self._memory.set(key, value)
+                self.disk_hits += 1
+        return value
+
+    async def _set(self, key: str, value: str) -> None:
+        self._memory.set(key, value)
+        if self._disk:
+            try:
+                await asyncio.to_thread(self._disk.set, key, value)
+            except Exception as e:
+                self.logger.warning(f"Agent file cache disk write failed: {e}")
+
+    async def get_file_id(self, digest: str) -> Optional[str]:
+        """
+        Look up the agent file uploaded for a document
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+
+        Returns:
+            The agent file ID, or None if the content has not been uploaded
+        """
+        return await self._get(f"sha256:{digest}")
+
+    async def get_digest(self, blob_version: str) -> Optional[str]:
+        """
+        Look up the content hash of a blob version seen before
+
+        Args:
+            blob_version: Container, blob name and ETag, e.g. 'documents/manual.pdf@"0x8DC..."'
+
+        Returns:
+            The SHA-256 hex digest of the blob's content, or None if this version is unknown
+        """
+        return await self._get(f"blob:{blob_version}")
+
+    async def set(self, digest: str, file_id: str, blob_version: Optional[str] = None) -> None:
+        """
+        Record the agent file uploaded for a document and, optionally, the blob version it came from
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+            file_id: ID of the uploaded agent file
+            blob_version: Container, blob name and ETag of the blob the content was read from
+        """
+        await self._set(f"sha256:{digest}", file_id)
+        if blob_version:
+            await self._set(f"blob:{blob_version}", digest)
+        self.stores += 1
+
+    async def invalidate(self, digest: str) -> None:
+        """
+        Forget the agent file of a document, e.g. after it turned out to be deleted on the service
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+        """
+        key = f"sha256:{digest}"
+        self._memory.invalidate(key)
+        self.invalidations += 1
+        if self._disk:
+            try:
+                await asyncio.to_thread(self._disk.delete, key)
+            except Exception as e:
+                self.logger.warning(f"Agent file cache disk delete failed: {e}")
+
+    async def upload_once(self, digest: str, upload: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run an upload, or wait for the one already running for the same content
+
+        The upload runs in its own task, so a request that is cancelled while waiting does not
+        abort it for the other requests waiting on the same document.
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+            upload: Coroutine function that uploads the document and returns its file info
+
+        Returns:
+            The uploaded file's info
+        """
+        task = self._uploads.get(digest)
+        if task is None:
+            task = asyncio.create_task(upload())
+            self._uploads[digest] = task
+            task.add_done_callback(lambda _: self._uploads.pop(digest, None))
+        else:
+            self.shared_uploads += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters for both tiers and the number of uploads shared"""
+        memory_stats = self._memory.stats()
+        return {
+            "hits": memory_stats["hits"] + self.disk_hits,
+            "disk_hits": self.disk_hits,
+            "misses": memory_stats["misses"] - self.disk_hits,
+            "evictions": memory_stats["evictions"],
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "shared_uploads": self.shared_uploads,
+            "uploads_in_progress": len(self._uploads),
+            "size": memory_stats["size"],
+            "disk_enabled": self._disk is not None,
+        }
+
+    def close(self) -> None:
+        """Close the on-disk tier"""
+        if self._disk:
+            self._disk.close()
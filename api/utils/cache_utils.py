@@ -0,0 +1,171 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """In-memory LRU cache with an optional per-entry time-to-live"""
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            max_entries: Maximum number of entries kept before the least recently used one is evicted
+            ttl_seconds: Lifetime of an entry in seconds, or None for entries that never expire
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value and mark it as most recently used
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            The cached value, or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries if the cache is full
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Remove a single entry, or every entry when no key is given
+
+        Args:
+            key: Cache key to remove, or None to clear the cache
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current size"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SqliteKeyValueStore:
+    """Persistent key/value table with per-entry expiry, backed by SQLite"""
+
+    def __init__(self, db_path: str, table: str = "cache_entries"):
+        """
+        Args:
+            db_path: Path of the SQLite database file; created if it does not exist
+            table: Name of the table holding the entries
+        """
+        self.db_path = db_path
+        self.table = table
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a stored value
+
+        Args:
+            key: Entry key
+
+        Returns:
+            The stored value, or None if it is missing or expired
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value, replacing any existing entry
+
+        Args:
+            key: Entry key
+            value: Value to store
+            ttl_seconds: Lifetime of the entry in seconds, or None for entries that never expire
+        """
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if it exists"""
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """
+        Remove every expired entry
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,223 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+# Metadata key marking a vector store as shared by every thread that references one document
+SHARED_DOCUMENT_METADATA_KEY = "document_sha256"
+
+
+class DocumentVectorStore:
+    """A vector store indexing a single document, shared by the threads that reference it"""
+
+    __slots__ = ("digest", "vector_store_id", "file_id", "threads", "created_at", "last_used")
+
+    def __init__(self, digest: str, vector_store_id: str, file_id: str):
+        self.digest = digest
+        self.vector_store_id = vector_store_id
+        self.file_id = file_id
+        # IDs of the threads whose file search uses the store
+        self.threads: Set[str] = set()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class DocumentVectorStoreIndex:
+    """
+    Maps document content hashes to ready vector stores, so a document is indexed once
+
+    Threads that start from a known document attach its vector store instead of creating and
+    indexing a new one. Each store records the threads that reference it. A reference is only
+    dropped when its thread moves to a store of its own, since a quiet thread still points at the
+    store and may be served by another replica. A background sweep deletes stores that no thread
+    references and that have not been used for idle_seconds, e.g. ones whose thread creation failed
+    or whose threads all moved on. Stores that keep references, and stores the index loses track of
+    on a restart, are deleted by the expiry policy they were created with.
+    """
+
+    def __init__(self, delete_vector_store: Callable[[str], Awaitable[Any]], idle_seconds: float = 3600,
+                 sweep_interval_seconds: float = 300):
+        """
+        Args:
+            delete_vector_store: Coroutine function that deletes a vector store on the service
+            idle_seconds: Time a store without references is kept for reuse before it is deleted
+            sweep_interval_seconds: Time between sweeps for orphaned stores
+        """
+        self.logger = logging.getLogger(__name__)
+        self._delete_vector_store = delete_vector_store
+        self.idle_seconds = idle_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        self._by_digest: Dict[str, DocumentVectorStore] = {}
+        self._by_vector_store: Dict[str, DocumentVectorStore] = {}
+        self._by_thread: Dict[str, DocumentVectorStore] = {}
+        # Stores being created by content hash, so concurrent requests for one document index it once
+        self._creating: Dict[str, "asyncio.Task[str]"] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.reuses = 0
+        self.creations = 0
+        self.shared_creations = 0
+        self.releases = 0
+        self.deletions = 0
+        self.delete_errors = 0
+
+    async def get_or_create(self, digest: str, file_id: str, create: Callable[[], Awaitable[str]]) -> str:
+        """
+        Get the vector store of a document, creating and indexing it if the document is new
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+            file_id: ID of the uploaded agent file holding the document
+            create: Coroutine function that creates the vector store and returns its ID once indexed
+
+        Returns:
+            The ID of a ready vector store holding the document
+        """
+        entry = self._by_digest.get(digest)
+        if entry is not None:
+            self.reuses += 1
+            entry.last_used = time.monotonic()
+            return entry.vector_store_id
+
+        task = self._creating.get(digest)
+        if task is None:
+            task = asyncio.create_task(create())
+            self._creating[digest] = task
+            task.add_done_callback(lambda done: self._created(digest, file_id, done))
+        else:
+            self.shared_creations += 1
+        self._ensure_sweeper()
+        return await asyncio.shield(task)
+
+    def _created(self, digest: str, file_id: str, task: "asyncio.Task[str]") -> None:
+        self._creating.pop(digest, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        entry = DocumentVectorStore(digest, task.result(), file_id)
+        self._by_digest[digest] = entry
+        self._by_vector_store[entry.vector_store_id] = entry
+        self.creations += 1
+
+    def acquire(self, digest: str, thread_id: str) -> None:
+        """
+        Record that a thread's file search uses a document's vector store
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+            thread_id: Agent thread ID
+        """
+        entry = self._by_digest.get(digest)
+        if entry is None:
+            return
+        previous = self._by_thread.get(thread_id)
+        if previous is not None and previous is not entry:
+            self.release(thread_id)
+        entry.threads.add(thread_id)
+        entry.last_used = time.monotonic()
+        self._by_thread[thread_id] = entry
+
+    def release(self, thread_id: str) -> None:
+        """
+        Drop a thread's reference, e.g. after it moved to a vector store of its own
+
+        Args:
+            thread_id: Agent thread ID
+        """
+        entry = self._by_thread.pop(thread_id, None)
+        if entry is not None and thread_id in entry.threads:
+            entry.threads.discard(thread_id)
+            entry.last_used = time.monotonic()
+            self.releases += 1
+
+    def shared_document(self, vector_store_id: str) -> Optional[DocumentVectorStore]:
+        """
+        Look up a vector store in the index
+
+        Args:
+            vector_store_id: Vector store ID
+
+        Returns:
+            The shared document store, or None if this index does not know the store
+        """
+        return self._by_vector_store.get(vector_store_id)
+
+    def forget(self, digest: str) -> None:
+        """
+        Drop a document's store from the index without deleting it, e.g. after the service expired it
+
+        Args:
+            digest: SHA-256 hex digest of the document content
+        """
+        entry = self._by_digest.pop(digest, None)
+        if entry is None:
+            return
+        self._by_vector_store.pop(entry.vector_store_id, None)
+        for thread_id in entry.threads:
+            self._by_thread.pop(thread_id, None)
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None and self.sweep_interval_seconds > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="document-vector-store-sweeper")
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.logger.error(f"Document vector store sweep failed: {e}")
+
+    async def sweep(self) -> List[str]:
+        """
+        Delete the stores that no thread references and that have not been used for idle_seconds
+
+        Returns:
+            IDs of the deleted vector stores
+        """
+        now = time.monotonic()
+        orphaned: List[DocumentVectorStore] = [
+            entry for entry in self._by_digest.values()
+            if not entry.threads and now - entry.last_used > self.idle_seconds
+        ]
+
+        deleted = []
+        for entry in orphaned:
+            # Taken out of the index first, so no request attaches it while it is being deleted
+            self.forget(entry.digest)
+            try:
+                await self._delete_vector_store(entry.vector_store_id)
+                deleted.append(entry.vector_store_id)
+                self.deletions += 1
+            except Exception as e:
+                # The store's expiry policy deletes it on the service eventually
+                self.logger.warning(f"Could not delete orphaned vector store {entry.vector_store_id}: {e}")
+                self.delete_errors += 1
+        if deleted:
+            self.logger.info(f"Deleted {len(deleted)} orphaned document vector stores")
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        """Return store and reference counts and reuse/cleanup counters"""
+        return {
+            "indexed_stores": len(self._by_digest),
+            "references": len(self._by_thread),
+            "orphaned_stores": sum(1 for entry in self._by_digest.values() if not entry.threads),
+            "creating": len(self._creating),
+            "reuses": self.reuses,
+            "creations": self.creations,
+            "shared_creations": self.shared_creations,
+            "releases": self.releases,
+            "deletions": self.deletions,
+            "delete_errors": self.delete_errors,
+        }
+
+    async def close(self) -> None:
+        """Stop the sweeper; stores are left to their expiry policy"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
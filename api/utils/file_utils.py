@@ -1,13 +1,117 @@
-from typing import List, Optional
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Any, Optional, Tuple, List
+from azure.ai.agents.models import FilePurpose
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError
 from semantic_kernel.contents import ChatMessageContent
 from semantic_kernel.contents.utils.author_role import AuthorRole
 
+from .agent_file_cache import AgentFileCache
 
-async def download_and_process_file(blob_service_client, file_path: str):
-    """Download and process file from blob storage"""
-    # This is a placeholder implementation
-    # You would implement the actual file download logic here
-    return None, None
+logger = logging.getLogger(__name__)
+
+# Chunks at least this large are hashed and spooled in a worker thread instead of on the event loop
+_THREAD_CHUNK_BYTES = 256 * 1024
+
+
+async def download_and_process_file(blob_service_client, file_path: str, client, file_cache: AgentFileCache,
+                                    container_name: str, spool_max_bytes: int = 8 * 1024 * 1024) -> Tuple[Optional[str], Any, str]:
+    """
+    Upload a blob document as an agent file, reusing an earlier upload of the same content
+
+    The blob is streamed chunk by chunk into a spooled temporary file that moves to disk past
+    spool_max_bytes, and hashed on the way; the upload then streams from that file. A blob version
+    (name and ETag) that was ingested before is recognised from its properties without downloading
+    it, and other blobs with the same content reuse its agent file. Reused file IDs are checked on
+    the service, so a deleted file is uploaded again.
+
+    Args:
+        blob_service_client: Async BlobServiceClient
+        file_path: Name of the blob in the container
+        client: The shared async AIProjectClient
+        file_cache: Content hash to agent file ID mappings
+        container_name: Container holding the documents
+        spool_max_bytes: Size above which the downloaded document is kept on disk instead of in memory
+
+    Returns:
+        (file_content, ai_project_file, digest): file_content is always None, since the document is
+        searched through the file search tool rather than inlined in the message; ai_project_file is
+        the agent file info, and digest the SHA-256 hex digest of the document content
+    """
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=file_path)
+    properties = await blob_client.get_blob_properties()
+    blob_version = f"{container_name}/{file_path}@{properties.etag}"
+
+    digest = await file_cache.get_digest(blob_version)
+    if digest:
+        file_info = await _existing_file(client, file_cache, digest)
+        if file_info is not None:
+            logger.info("Reusing agent file %s for unchanged blob %s", file_info.id, file_path)
+            return None, file_info, digest
+
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    spool_owned_by_upload = False
+    try:
+        # Pinned to the ETag read above, so the hash always belongs to that blob version
+        downloader = await blob_client.download_blob(etag=properties.etag, match_condition=MatchConditions.IfNotModified)
+        hasher = hashlib.sha256()
+        size = 0
+
+        def consume(chunk: bytes) -> None:
+            hasher.update(chunk)
+            spool.write(chunk)
+
+        async for chunk in downloader.chunks():
+            size += len(chunk)
+            if len(chunk) >= _THREAD_CHUNK_BYTES:
+                await asyncio.to_thread(consume, chunk)
+            else:
+                consume(chunk)
+        digest = hasher.hexdigest()
+
+        file_info = await _existing_file(client, file_cache, digest)
+        if file_info is not None:
+            logger.info("Reusing agent file %s for blob %s with known content", file_info.id, file_path)
+        else:
+            async def upload():
+                try:
+                    await asyncio.to_thread(spool.seek, 0)
+                    return await client.agents.files.upload(
+                        file=(os.path.basename(file_path), spool), purpose=FilePurpose.AGENTS)
+                finally:
+                    spool.close()
+
+            def start_upload():
+                # From here on the upload task closes the spool, even if this request is cancelled
+                nonlocal spool_owned_by_upload
+                spool_owned_by_upload = True
+                return upload()
+
+            file_info = await file_cache.upload_once(digest, start_upload)
+            logger.info("Uploaded blob %s (%d bytes) as agent file %s", file_path, size, file_info.id)
+
+        await file_cache.set(digest, file_info.id, blob_version)
+        return None, file_info, digest
+    finally:
+        if not spool_owned_by_upload:
+            spool.close()
+
+
+async def _existing_file(client, file_cache: AgentFileCache, digest: str) -> Optional[Any]:
+    """Get the agent file already uploaded for a content hash, forgetting it if the service no longer has it"""
+    file_id = await file_cache.get_file_id(digest)
+    if not file_id:
+        return None
+    try:
+        return await client.agents.files.get(file_id)
+    except ResourceNotFoundError:
+        logger.warning("Agent file %s was deleted on the service; uploading the document again", file_id)
+        await file_cache.invalidate(digest)
+        return None
 
 
 def create_chat_message_content(user_message: str, file_content: Optional[str] = None,
@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# A probe makes one cheap upstream call and raises if the dependency is not usable
+Probe = Callable[[], Awaitable[None]]
+
+
+class ProbeResult:
+    """Outcome of the most recent probe of one dependency"""
+
+    __slots__ = ("status", "latency_seconds", "checked_at", "checked_monotonic", "error")
+
+    def __init__(self, status: str, latency_seconds: Optional[float] = None, error: Optional[str] = None):
+        self.status = status
+        self.latency_seconds = latency_seconds
+        self.error = error
+        self.checked_at = datetime.now(timezone.utc) if status in ("ok", "error") else None
+        self.checked_monotonic = time.monotonic()
+
+    def to_dict(self, required: bool) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "required": required,
+            "latency_ms": round(self.latency_seconds * 1000, 1) if self.latency_seconds is not None else None,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "age_seconds": round(time.monotonic() - self.checked_monotonic, 1) if self.checked_at else None,
+            "error": self.error,
+        }
+
+
+class DependencyHealthMonitor:
+    """
+    Probes upstream dependencies on a fixed interval in the background and serves the cached results
+
+    Health check requests only read the cache, so they cost no upstream calls no matter how often
+    the load balancer polls, and each dependency has at most one probe in flight.
+    """
+
+    def __init__(self, interval_seconds: Optional[float] = None, timeout_seconds: Optional[float] = None,
+                 max_age_seconds: Optional[float] = None):
+        """
+        Args:
+            interval_seconds: Time between probe rounds
+            timeout_seconds: Time after which a probe counts as failed
+            max_age_seconds: Age after which a result is stale and the service is reported not ready,
+                e.g. when the probe loop has stopped; defaults to three intervals plus the timeout
+        """
+        self.logger = logging.getLogger(__name__)
+        self.enabled = os.getenv("HEALTH_PROBE_ENABLED", "true").lower() == "true"
+        self.interval_seconds = interval_seconds or float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "30"))
+        self.timeout_seconds = timeout_seconds or float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+        self.max_age_seconds = max_age_seconds or float(os.getenv(
+            "HEALTH_PROBE_MAX_AGE_SECONDS", str(3 * self.interval_seconds + self.timeout_seconds)))
+
+        self._probes: Dict[str, Optional[Probe]] = {}
+        self._required: Dict[str, bool] = {}
+        self._groups: Dict[str, str] = {}
+        self._results: Dict[str, ProbeResult] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+
+    def register(self, name: str, probe: Optional[Probe], required: bool = True, group: Optional[str] = None) -> None:
+        """
+        Register a dependency
+
+        Args:
+            name: Dependency name reported in the health payload
+            probe: Coroutine function that raises when the dependency is unusable, or None if the
+                dependency is not configured in this deployment
+            required: Whether a failing probe makes the service not ready
+            group: Name shared by interchangeable dependencies, e.g. the deployments of one model;
+                a required group makes the service not ready only when all of its members fail
+        """
+        self._probes[name] = probe
+        self._required[name] = required
+        if group:
+            self._groups[name] = group
+        self._results[name] = ProbeResult("pending" if probe else "not_configured")
+
+    async def start(self) -> None:
+        """Start the background probe loop; the first round runs without delaying startup"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="dependency-health-probes")
+
+    async def stop(self) -> None:
+        """Stop the background probe loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.logger.error(f"Dependency probe round failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def refresh(self) -> None:
+        """Probe every configured dependency once, concurrently"""
+        names = [name for name, probe in self._probes.items() if probe is not None]
+        results = await asyncio.gather(*(self._probe(name) for name in names))
+        for name, result in zip(names, results):
+            previous = self._results.get(name)
+            if previous and previous.status != result.status and previous.status != "pending":
+                self.logger.warning(f"Dependency '{name}' is now {result.status}: {result.error or 'ok'}")
+            self._results[name] = result
+        self.rounds += 1
+
+    async def _probe(self, name: str) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._probes[name](), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            return ProbeResult("error", time.perf_counter() - start, f"Timed out after {self.timeout_seconds:g}s")
+        except Exception as e:
+            return ProbeResult("error", time.perf_counter() - start, f"{type(e).__name__}: {e}")
+        return ProbeResult("ok", time.perf_counter() - start)
+
+    def _failing(self) -> List[str]:
+        now = time.monotonic()
+        failing = []
+        failing_groups: Dict[str, List[str]] = {}
+        healthy_groups = set()
+        for name, result in self._results.items():
+            if not self._required[name] or result.status == "not_configured":
+                continue
+            healthy = result.status == "ok" and now - result.checked_monotonic <= self.max_age_seconds
+            group = self._groups.get(name)
+            if group is None:
+                if not healthy:
+                    failing.append(name)
+            elif healthy:
+                healthy_groups.add(group)
+            else:
+                failing_groups.setdefault(group, []).append(name)
+        for group, names in failing_groups.items():
+            if group not in healthy_groups:
+                failing.extend(names)
+        return failing
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Summarize whether the service should receive traffic, from cached results only
+
+        Returns:
+            'status' is 'ready', 'starting' (first round not finished) or 'not_ready', with the
+            required dependencies that are failing or stale
+        """
+        if not self.enabled:
+            return {"status": "ready", "probes": "disabled", "failing": []}
+        failing = self._failing()
+        if not failing:
+            status = "ready"
+        elif self.rounds == 0:
+            status = "starting"
+        else:
+            status = "not_ready"
+        return {"status": status, "failing": failing}
+
+    def report(self) -> Dict[str, Any]:
+        """Return the readiness summary plus the cached result and latency of every dependency"""
+        return {
+            **self.readiness(),
+            "interval_seconds": self.interval_seconds,
+            "dependencies": {
+                name: result.to_dict(self._required[name]) for name, result in self._results.items()
+            },
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-dependency up/latency values for the metrics endpoint"""
+        return {
+            name: {
+                "up": result.status == "ok",
+                "latency_seconds": result.latency_seconds or 0.0,
+            } for name, result in self._results.items() if result.status != "not_configured"
+        }
@@ -0,0 +1,141 @@
+import re
+import base64
+import hashlib
+import binascii
+from typing import Any, Optional
+
+from pydantic import PrivateAttr
+from semantic_kernel.contents import ImageContent
+
+# Canonical (padded, non-URL-safe, no whitespace) base64 text
+_BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+# The URL-safe alphabet (RFC 4648 section 5) mapped onto the standard one
+_URL_SAFE_ALPHABET = str.maketrans("-_", "+/")
+
+# Hash data URLs in slices so hashing never copies the whole image at once
+_HASH_CHUNK_CHARS = 1 << 20
+
+
+class ImagePayload:
+    """
+    An image kept in the form it arrived in and converted lazily
+
+    Data URLs that are already canonical base64 are passed to the model untouched; the
+    decoded bytes are only produced when a stage actually needs them (e.g. resizing).
+    """
+
+    __slots__ = ("media_type", "_data_url", "_data_offset", "_raw", "_digest")
+
+    def __init__(self, media_type: str, data_url: Optional[str] = None, raw: Optional[bytes] = None):
+        """
+        Args:
+            media_type: MIME type of the image, e.g. 'image/jpeg'
+            data_url: Canonical 'data:<media_type>;base64,' URL holding the image
+            raw: Decoded image bytes
+        """
+        if data_url is None and raw is None:
+            raise ValueError("ImagePayload needs either a data URL or raw bytes")
+        self.media_type = media_type
+        self._data_url = data_url
+        self._data_offset = data_url.index(",") + 1 if data_url else 0
+        self._raw = raw
+        self._digest: Optional[str] = None
+
+    @classmethod
+    def from_data_url(cls, data_url: str) -> Optional["ImagePayload"]:
+        """
+        Create a payload from a data URL, keeping the original string when it is already valid
+
+        Args:
+            data_url: A 'data:<media_type>;base64,<data>' URL
+
+        Returns:
+            The payload, or None if the URL is not a base64 data URL or carries no data
+        """
+        if not data_url.startswith("data:"):
+            return None
+        comma = data_url.find(",")
+        if comma < 0 or comma == len(data_url) - 1:
+            return None
+
+        # e.g., "data:image/jpeg;base64"
+        header = data_url[5:comma]
+        media_type, _, encoding = header.partition(";")
+        if encoding != "base64" or not media_type:
+            return None
+
+        # Validate in place; slicing the data out would copy the whole image
+        if (len(data_url) - comma - 1) % 4 == 0 and _BASE64_PATTERN.fullmatch(data_url, comma + 1):
+            return cls(media_type, data_url=data_url)
+
+        # Non-canonical base64 (line breaks, missing padding, URL-safe alphabet): normalised, then
+        # decoded strictly once and re-encoded on demand; any other character rejects the URL
+        data = _WHITESPACE_PATTERN.sub("", data_url[comma + 1:]).translate(_URL_SAFE_ALPHABET).rstrip("=")
+        if len(data) % 4 == 1:
+            return None
+        try:
+            raw = base64.b64decode(data + "=" * (-len(data) % 4), validate=True)
+        except (binascii.Error, ValueError):
+            return None
+        if not raw:
+            return None
+        return cls(media_type, raw=raw)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, media_type: str) -> "ImagePayload":
+        """Create a payload from decoded image bytes"""
+        return cls(media_type, raw=raw)
+
+    @property
+    def data_url(self) -> str:
+        """The image as a base64 data URL, encoded at most once"""
+        if self._data_url is None:
+            encoded = base64.b64encode(self._raw).decode("ascii")
+            self._data_url = f"data:{self.media_type};base64,{encoded}"
+            self._data_offset = self._data_url.index(",") + 1
+        return self._data_url
+
+    @property
+    def raw(self) -> memoryview:
+        """The decoded image bytes, decoded at most once"""
+        if self._raw is None:
+            self._raw = base64.b64decode(self._data_url[self._data_offset:])
+        return memoryview(self._raw)
+
+    @property
+    def size(self) -> int:
+        """Size of the decoded image in bytes, computed without decoding"""
+        if self._raw is not None:
+            return len(self._raw)
+        encoded_length = len(self._data_url) - self._data_offset
+        padding = self._data_url.endswith("==") + self._data_url.endswith("=")
+        return encoded_length // 4 * 3 - padding
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 over the media type and the canonical base64 form of the image"""
+        if self._digest is None:
+            data_url = self.data_url
+            sha = hashlib.sha256(self.media_type.encode("utf-8") + b"\0")
+            for start in range(self._data_offset, len(data_url), _HASH_CHUNK_CHARS):
+                sha.update(data_url[start:start + _HASH_CHUNK_CHARS].encode("ascii"))
+            self._digest = sha.hexdigest()
+        return self._digest
+
+
+class EncodedImageContent(ImageContent):
+    """ImageContent that sends an ImagePayload's data URL as-is instead of decoding and re-encoding it"""
+
+    _payload: ImagePayload = PrivateAttr()
+
+    def __init__(self, payload: ImagePayload, **kwargs: Any):
+        super().__init__(mime_type=payload.media_type, **kwargs)
+        self._payload = payload
+
+    def __str__(self) -> str:
+        return self._payload.data_url
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert the instance to a dictionary."""
+        return {"type": "image_url", "image_url": {"url": self._payload.data_url}}
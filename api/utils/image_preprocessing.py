@@ -0,0 +1,166 @@
+import io
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from .image_payload import ImagePayload
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # Without Pillow (e.g. a trimmed install) images are sent as received
+    Image = None
+
+_OUTPUT_MEDIA_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+@dataclass(frozen=True)
+class ImagePreprocessingOptions:
+    """Settings for the downscale/recompress stage; passed to worker processes"""
+    max_edge: int = 2048
+    output_format: str = "JPEG"
+    quality: int = 85
+    crop_to_label: bool = False
+    min_bytes: int = 256 * 1024
+
+    @classmethod
+    def from_env(cls) -> "ImagePreprocessingOptions":
+        """Read the options from IMAGE_PREPROCESS_* environment variables"""
+        return cls(
+            max_edge=int(os.getenv("IMAGE_PREPROCESS_MAX_EDGE", "2048")),
+            output_format=os.getenv("IMAGE_PREPROCESS_FORMAT", "JPEG").upper(),
+            quality=int(os.getenv("IMAGE_PREPROCESS_QUALITY", "85")),
+            crop_to_label=os.getenv("IMAGE_PREPROCESS_CROP_TO_LABEL", "false").lower() == "true",
+            min_bytes=int(os.getenv("IMAGE_PREPROCESS_MIN_BYTES", str(256 * 1024)))
+        )
+
+
+def _crop_to_label(image: "Image.Image") -> "Image.Image":
+    """Crop to the bounding box of high-contrast detail, where label text usually is"""
+    edges = image.convert("L").filter(ImageFilter.FIND_EDGES).point(lambda value: 255 if value > 48 else 0)
+    bbox = edges.getbbox()
+    if not bbox:
+        return image
+
+    left, top, right, bottom = bbox
+    # Keep a margin around the detected region and never crop to a sliver of the photo
+    margin_x, margin_y = (right - left) // 10, (bottom - top) // 10
+    bbox = (max(0, left - margin_x), max(0, top - margin_y),
+            min(image.width, right + margin_x), min(image.height, bottom + margin_y))
+    if (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) < 0.1 * image.width * image.height:
+        return image
+    return image.crop(bbox)
+
+
+def preprocess_image_bytes(data: bytes, options: ImagePreprocessingOptions) -> Optional[Tuple[bytes, str]]:
+    """
+    Fix EXIF orientation, optionally crop to the label, downscale and re-encode an image
+
+    Runs in a worker process.
+
+    Args:
+        data: Encoded image bytes
+        options: Preprocessing settings
+
+    Returns:
+        (image bytes, media type), or None if the original image should be kept
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # Let the JPEG decoder scale down by a power of two while decoding
+        original.draft("RGB", (options.max_edge, options.max_edge))
+        image = ImageOps.exif_transpose(original)
+        if options.crop_to_label:
+            image = _crop_to_label(image)
+        image.thumbnail((options.max_edge, options.max_edge), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format=options.output_format, quality=options.quality, optimize=True)
+
+    processed = output.getvalue()
+    if len(processed) >= len(data):
+        return None
+    return processed, _OUTPUT_MEDIA_TYPES[options.output_format]
+
+
+class ImagePreprocessor:
+    """Downscales and recompresses images in a process pool before they are sent to the model"""
+
+    def __init__(self, options: Optional[ImagePreprocessingOptions] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            options: Preprocessing settings; read from the environment when omitted
+            max_workers: Number of worker processes; read from IMAGE_PREPROCESS_WORKERS when omitted
+        """
+        self.logger = logging.getLogger(__name__)
+        self.options = options or ImagePreprocessingOptions.from_env()
+        self.max_workers = max_workers or int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))
+        self.enabled = Image is not None and self.options.output_format in _OUTPUT_MEDIA_TYPES
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        if Image is None:
+            self.logger.warning("Pillow is not installed; images are sent to the model without preprocessing")
+
+        self.images_processed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers do not inherit the server's event loop or open sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def process(self, payload: ImagePayload) -> Tuple[ImagePayload, int]:
+        """
+        Preprocess an image off the event loop
+
+        Args:
+            payload: The image as fetched
+
+        Returns:
+            (payload to send, bytes saved); the original payload is returned when preprocessing
+            is disabled, the image is already small, or re-encoding would not make it smaller
+        """
+        size = payload.size
+        if not self.enabled or size < self.options.min_bytes:
+            return payload, 0
+
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_executor(), preprocess_image_bytes, bytes(payload.raw), self.options)
+        except Exception as e:
+            self.logger.warning(f"Image preprocessing failed, sending original image: {e}")
+            return payload, 0
+
+        self.images_processed += 1
+        self.bytes_in += size
+        if result is None:
+            self.bytes_out += size
+            return payload, 0
+
+        processed, media_type = result
+        self.bytes_out += len(processed)
+        return ImagePayload.from_bytes(processed, media_type), size - len(processed)
+
+    def close(self) -> None:
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return preprocessing counters"""
+        return {
+            "enabled": self.enabled,
+            "images_processed": self.images_processed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+        }
@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+
+# Lag is the sampling sleep's overshoot, so useful buckets start well below a millisecond
+event_loop_lag = metrics.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic sleep",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+_API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STACK_DEPTH = 16
+
+StackKey = Tuple[Tuple[str, int, str], ...]
+
+
+class BlockingSite:
+    """Aggregated blocking episodes that were caught at the same stack"""
+
+    __slots__ = ("site", "stack", "count", "blocked_seconds_total", "blocked_seconds_max", "last_seen")
+
+    def __init__(self, site: str, stack: List[str]):
+        self.site = site
+        self.stack = stack
+        self.count = 0
+        self.blocked_seconds_total = 0.0
+        self.blocked_seconds_max = 0.0
+        self.last_seen = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "site": self.site,
+            "count": self.count,
+            "blocked_seconds_total": round(self.blocked_seconds_total, 3),
+            "blocked_seconds_max": round(self.blocked_seconds_max, 3),
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+class EventLoopMonitor:
+    """
+    Measures event-loop lag continuously and catches the code that blocks the loop
+
+    A task on the loop sleeps for interval_seconds and records how late it woke up. With stack
+    capture on, a watchdog thread also checks that the task keeps waking up. When its sleep should
+    have ended more than block_threshold_seconds ago, the loop is stuck in one step of a coroutine
+    or callback, and the thread records the loop thread's stack at that moment. Episodes are
+    aggregated by stack, so the worst offenders can be read from the debug endpoint.
+    """
+
+    def __init__(self, interval_seconds: Optional[float] = None, block_threshold_seconds: Optional[float] = None,
+                 capture_stacks: Optional[bool] = None, max_sites: int = 50):
+        """
+        Args:
+            interval_seconds: Time between lag samples
+            block_threshold_seconds: Lag above which a blocking episode is recorded
+            capture_stacks: Run the watchdog thread that captures the stacks of blocking episodes
+            max_sites: Distinct stacks kept; the ones with the least blocked time are dropped first
+        """
+        self.logger = logging.getLogger(__name__)
+        self.enabled = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+        self.interval_seconds = interval_seconds or float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.1"))
+        self.block_threshold_seconds = block_threshold_seconds or float(
+            os.getenv("LOOP_MONITOR_BLOCK_THRESHOLD_SECONDS", "0.1"))
+        self.capture_stacks = (
+            capture_stacks if capture_stacks is not None
+            else os.getenv("LOOP_MONITOR_CAPTURE_STACKS", "false").lower() == "true")
+        self.max_sites = max_sites
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        # Monotonic time at which the sampling sleep should end; lag is measured from it
+        self._wake_due = time.monotonic() + self.interval_seconds
+        # Stack captured by the watchdog during the current episode; completed by the next beat
+        self._pending: Optional[Tuple[StackKey, str, List[str]]] = None
+        self._sites: Dict[StackKey, BlockingSite] = {}
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self.samples = 0
+        self.lag_seconds_total = 0.0
+        self.lag_seconds_max = 0.0
+        self.lag_seconds_last = 0.0
+        self.blocking_episodes = 0
+        self.blocked_seconds_total = 0.0
+        self.stacks_captured = 0
+
+    async def start(self) -> None:
+        """Start sampling on the running loop and, with stack capture on, the watchdog thread"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._wake_due = time.monotonic() + self.interval_seconds
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        if self.capture_stacks:
+            self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+            self._watchdog.start()
+        self.logger.info(
+            f"Event loop monitor started (interval {self.interval_seconds}s, "
+            f"threshold {self.block_threshold_seconds}s, stacks {'on' if self.capture_stacks else 'off'})")
+
+    async def stop(self) -> None:
+        """Stop sampling and the watchdog thread"""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            self._wake_due = time.monotonic() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            lag = max(0.0, loop.time() - start - self.interval_seconds)
+            self.samples += 1
+            self.lag_seconds_total += lag
+            self.lag_seconds_last = lag
+            self.lag_seconds_max = max(self.lag_seconds_max, lag)
+            event_loop_lag.observe(lag)
+            if lag >= self.block_threshold_seconds:
+                self._record_episode(lag)
+            elif self._pending is not None:
+                # Caught on a stall that ended just under the threshold
+                with self._lock:
+                    self._pending = None
+
+    def _record_episode(self, lag: float) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self.blocking_episodes += 1
+            self.blocked_seconds_total += lag
+            if pending is None:
+                return
+            self.stacks_captured += 1
+            key, site, stack = pending
+            entry = self._sites.get(key)
+            if entry is None:
+                if len(self._sites) >= self.max_sites:
+                    least = min(self._sites, key=lambda existing: self._sites[existing].blocked_seconds_total)
+                    del self._sites[least]
+                entry = self._sites[key] = BlockingSite(site, stack)
+            entry.count += 1
+            entry.blocked_seconds_total += lag
+            entry.blocked_seconds_max = max(entry.blocked_seconds_max, lag)
+            entry.last_seen = time.time()
+        self.logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms at {site}")
+
+    def _watch(self) -> None:
+        # Polls a few times per threshold so a stack is taken while the loop is still stuck
+        poll = self.block_threshold_seconds / 4
+        while not self._stopping.wait(poll):
+            # Lag counted the same way as by the sampling task. Checked against the threshold less one
+            # poll, so even a stall that ends just over the threshold is caught; the stack of one that
+            # ends under it is dropped by the next beat
+            late = time.monotonic() - self._wake_due
+            if late < self.block_threshold_seconds - poll or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            summary = traceback.extract_stack(frame)[-_STACK_DEPTH:]
+            del frame
+            key = tuple((entry.filename, entry.lineno, entry.name) for entry in summary)
+            with self._lock:
+                self._pending = (key, self._site(summary), [line.rstrip() for line in traceback.format_list(summary)])
+
+    @staticmethod
+    def _site(summary: List[traceback.FrameSummary]) -> str:
+        """The innermost frame in this service's code, which is usually the call to fix"""
+        for entry in reversed(summary):
+            if entry.filename.startswith(_API_DIR) and not entry.filename.endswith("loop_monitor.py"):
+                return f"{os.path.relpath(entry.filename, os.path.dirname(_API_DIR))}:{entry.lineno} in {entry.name}"
+        entry = summary[-1]
+        return f"{entry.filename}:{entry.lineno} in {entry.name}"
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        """
+        Lag summary and the stacks that blocked the loop for the longest total time
+
+        Args:
+            limit: Number of blocking sites to return
+
+        Returns:
+            Lag statistics, blocking totals and the top sites with their stacks
+        """
+        with self._lock:
+            top = sorted(self._sites.values(), key=lambda site: site.blocked_seconds_total, reverse=True)[:limit]
+            sites = [site.to_dict() for site in top]
+        return {
+            "enabled": self.enabled and self._task is not None,
+            "capture_stacks": self.capture_stacks,
+            "interval_seconds": self.interval_seconds,
+            "block_threshold_seconds": self.block_threshold_seconds,
+            **self.stats(),
+            "top_blocking_sites": sites,
+        }
+
+    def reset(self) -> None:
+        """Forget recorded lag and blocking sites, e.g. after a deployment or between load test phases"""
+        with self._lock:
+            self._sites.clear()
+            self._pending = None
+            self._reset_counters()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lag and blocking counters"""
+        return {
+            "samples": self.samples,
+            "lag_seconds_last": round(self.lag_seconds_last, 6),
+            "lag_seconds_avg": round(self.lag_seconds_total / self.samples, 6) if self.samples else 0.0,
+            "lag_seconds_max": round(self.lag_seconds_max, 6),
+            "blocking_episodes": self.blocking_episodes,
+            "blocked_seconds_total": round(self.blocked_seconds_total, 3),
+            "stacks_captured": self.stacks_captured,
+        }
+
+
+# Started and stopped by the FastAPI lifespan
+loop_monitor = EventLoopMonitor()
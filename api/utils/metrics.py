@@ -0,0 +1,265 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+
+# Request stages range from sub-millisecond cache hits to minute-long vector store indexing
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (metric name prefix, labels, stats dict) triples folded into the exposition
+StatsSource = Tuple[str, Dict[str, str], Dict[str, Any]]
+
+# Component stats keys that only ever grow; folded in as counters, every other key as a gauge.
+# Keys ending in '_total' are counters as well.
+COUNTER_STATS = frozenset({
+    "abandoned", "admitted", "blocking_episodes", "bypasses", "bytes_in", "bytes_out",
+    "bytes_saved", "calls", "client_creations", "client_reuses", "create_errors", "created",
+    "creations", "delete_errors", "deletions", "disk_hits", "ejections", "evictions", "expirations",
+    "failures", "followers", "hits", "images_processed", "invalidations", "leaders", "loads",
+    "memory_hits", "misses", "opened", "recycled", "rejected", "releases", "reload_errors",
+    "reloads", "requests", "retries", "reuses", "samples", "shared_creations", "shared_uploads",
+    "short_circuited", "stacks_captured", "stores", "throttled", "timed_out", "timeouts",
+})
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in values]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down"""
+
+    metric_type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, (list(series[0]), series[1], series[2])) for key, series in self._values.items()]
+        lines = self._header()
+        for key, (bucket_counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self, namespace: str = "agent_hub"):
+        self.namespace = namespace
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(f"{self.namespace}_{name}", documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(f"{self.namespace}_{name}", documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(f"{self.namespace}_{name}", documentation, label_names, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, stats: Iterable[StatsSource] = ()) -> str:
+        """
+        Render every metric, plus component stats() dictionaries
+
+        Args:
+            stats: (prefix, labels, stats) triples; numeric and boolean values (including nested
+                ones) become '<namespace>_<prefix>_<key>' metrics, counters for the keys in
+                COUNTER_STATS and gauges otherwise; other values are skipped
+
+        Returns:
+            The exposition text
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        folded: Dict[str, List[str]] = {}
+        metric_types: Dict[str, str] = {}
+        for prefix, labels, values in stats:
+            for key, leaf, value in self._flatten(values):
+                name = f"{self.namespace}_{prefix}_{key}"
+                label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                folded.setdefault(name, []).append(f"{name}{label_text} {float(value)}")
+                is_counter = leaf in COUNTER_STATS or leaf.endswith("_total")
+                metric_types[name] = "counter" if is_counter else "gauge"
+        for name, samples in folded.items():
+            lines.append(f"# TYPE {name} {metric_types[name]}")
+            lines.extend(samples)
+
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def _flatten(cls, values: Dict[str, Any], parent: str = "") -> Iterator[Tuple[str, str, Any]]:
+        # (flattened name, key within its own dict, value)
+        for key, value in values.items():
+            name = f"{parent}_{key}" if parent else key
+            if isinstance(value, dict):
+                yield from cls._flatten(value, name)
+            elif isinstance(value, (bool, int, float)):
+                yield name, key, value
+
+
+metrics = MetricsRegistry()
+
+stage_duration = metrics.histogram(
+    "agent_stage_duration_seconds", "Time spent in each stage of an agent request", ("agent", "stage"))
+request_duration = metrics.histogram(
+    "agent_request_duration_seconds", "End-to-end agent request time", ("agent", "outcome"))
+time_to_first_token = metrics.histogram(
+    "agent_time_to_first_token_seconds", "Time from request start to the first streamed content", ("agent",))
+tokens = metrics.counter(
+    "agent_tokens_total", "Tokens reported by the model service", ("agent", "type"))
+requests_in_flight = metrics.gauge(
+    "agent_requests_in_flight", "Agent requests currently being processed", ("agent",))
+
+_tracer = trace.get_tracer(__name__)
+
+
+@contextmanager
+def track_stage(agent: str, stage: str) -> Iterator[None]:
+    """
+    Time a request stage as a child span and in the stage duration histogram
+
+    Args:
+        agent: Agent name label, e.g. 'chat'
+        stage: Stage name label, e.g. 'get_agent'
+    """
+    start = time.perf_counter()
+    with _tracer.start_as_current_span(f"{agent}.{stage}"):
+        try:
+            yield
+        finally:
+            stage_duration.observe(time.perf_counter() - start, agent=agent, stage=stage)
+
+
+class RequestTracker:
+    """
+    Tracks one agent request's in-flight gauge, duration, time to first token and token usage
+
+    Use as a context manager around the request; set outcome = "success" before returning
+    (or before yielding the final event of a stream).
+    """
+
+    __slots__ = ("agent", "start", "first_token_at", "outcome")
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.outcome = "error"
+        requests_in_flight.inc(agent=agent)
+
+    def __enter__(self) -> "RequestTracker":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type in (GeneratorExit, asyncio.CancelledError) and self.outcome != "success":
+            self.outcome = "cancelled"
+        self.finish()
+
+    def first_token(self) -> None:
+        """Record time to first token; later calls are ignored"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            time_to_first_token.observe(self.first_token_at - self.start, agent=self.agent)
+
+    def usage(self, usage: Any) -> None:
+        """Count prompt/completion tokens from a model usage object, if the service returned one"""
+        if usage is None:
+            return
+        for token_type in ("prompt_tokens", "completion_tokens"):
+            count = getattr(usage, token_type, None)
+            if count:
+                tokens.inc(count, agent=self.agent, type=token_type.replace("_tokens", ""))
+
+    def finish(self) -> None:
+        """Record the request duration under the current outcome and leave the in-flight gauge"""
+        requests_in_flight.dec(agent=self.agent)
+        request_duration.observe(time.perf_counter() - self.start, agent=self.agent, outcome=self.outcome)
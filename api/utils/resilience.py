@@ -0,0 +1,466 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import aclosing
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Statuses that mean the upstream is overloaded or failing rather than that the request is wrong
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Transport errors of the OpenAI and Azure SDKs, matched by name so this module imports neither
+TRANSIENT_ERROR_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError", "ServiceRequestError", "ServiceResponseError",
+})
+
+
+# asyncio.timeout_at arrived in Python 3.11; older versions fall back to a timer of our own
+_timeout_at = getattr(asyncio, "timeout_at", None)
+
+
+class _Deadline:
+    """
+    Point in loop time at which a guarded attempt is cancelled
+
+    Used as `async with`, in the task that awaits the attempt: unlike asyncio.wait_for, no task is
+    started, so context set by the awaited code, e.g. an OpenTelemetry span a stream keeps open
+    across items, stays in the consuming task. Raises asyncio.TimeoutError once the deadline passes.
+    """
+
+    __slots__ = ("_loop", "when", "_token", "_timeout", "_task", "_handle", "_fired")
+
+    # Timers fire up to one clock tick early
+    _CLOCK_RESOLUTION = time.get_clock_info("monotonic").resolution
+
+    def __init__(self, seconds: float):
+        self._loop = asyncio.get_running_loop()
+        self.when = self._loop.time() + seconds
+
+    def expired(self) -> bool:
+        return self._loop.time() + self._CLOCK_RESOLUTION >= self.when
+
+    async def __aenter__(self) -> "_Deadline":
+        # Set before the attempt starts, so code inside it can tell a deadline from a client disconnect
+        self._token = _current_deadline.set(self)
+        if _timeout_at is not None:
+            self._timeout = _timeout_at(self.when)
+            await self._timeout.__aenter__()
+        else:
+            self._task = asyncio.current_task()
+            self._fired = False
+            self._handle = self._loop.call_at(self.when, self._cancel)
+        return self
+
+    def _cancel(self) -> None:
+        self._fired = True
+        self._task.cancel()
+
+    async def __aexit__(self, exc_type, exc, traceback) -> Optional[bool]:
+        try:
+            if _timeout_at is not None:
+                return await self._timeout.__aexit__(exc_type, exc, traceback)
+            self._handle.cancel()
+            if self._fired and exc_type is asyncio.CancelledError:
+                raise asyncio.TimeoutError() from exc
+            return None
+        finally:
+            _current_deadline.reset(self._token)
+
+
+# Deadline of the guarded attempt running in the current task, so code inside the attempt can tell
+# a deadline cancellation from a client disconnect
+_current_deadline: ContextVar[Optional[_Deadline]] = ContextVar("upstream_deadline", default=None)
+
+
+def deadline_expired() -> bool:
+    """Whether the current guarded attempt is being cancelled because its deadline passed"""
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired()
+
+
+class UpstreamError(RuntimeError):
+    """Raised when an upstream call failed in a way the client should retry later"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UpstreamTimeoutError(UpstreamError):
+    """Raised when an upstream stage did not finish within its deadline"""
+
+    status_code = 504
+
+
+class UpstreamUnavailableError(UpstreamError):
+    """Raised when an upstream call still failed with a transient error after the last attempt"""
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without calling upstream while its circuit breaker is open"""
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    # Semantic Kernel wraps SDK errors in its own exceptions; the SDK error is on the cause chain
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _parse_retry_after(headers: Any) -> Optional[float]:
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """
+    Find the HTTP status of an upstream error
+
+    Args:
+        error: Exception raised by an SDK call, possibly wrapped by Semantic Kernel
+
+    Returns:
+        The status code of the first error on the cause chain that carries one, or None
+    """
+    for cause in _error_chain(error):
+        status_code = getattr(cause, "status_code", None) or getattr(getattr(cause, "response", None), "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+    return None
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Decide whether an upstream error is transient
+
+    Args:
+        error: Exception raised by an SDK call, possibly wrapped by Semantic Kernel
+
+    Returns:
+        (retryable, retry-after seconds requested by the upstream, if any)
+    """
+    for cause in _error_chain(error):
+        if isinstance(cause, UpstreamError):
+            return True, cause.retry_after
+        if isinstance(cause, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+            return True, None
+        response = getattr(cause, "response", None)
+        status_code = getattr(cause, "status_code", None) or getattr(response, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code in RETRYABLE_STATUS_CODES, _parse_retry_after(getattr(response, "headers", None))
+        if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(cause).__mro__):
+            return True, None
+    return False, None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, stretched to at least the upstream's Retry-After"""
+
+    def __init__(self, max_attempts: int = 3, base_delay_seconds: float = 0.5, max_delay_seconds: float = 8,
+                 max_retry_after_seconds: float = 30):
+        """
+        Args:
+            max_attempts: Attempts per call, including the first; 1 disables retries
+            base_delay_seconds: Upper bound of the first backoff, doubled on every further attempt
+            max_delay_seconds: Cap of the exponential backoff
+            max_retry_after_seconds: Longest Retry-After that is waited out; longer ones fail the call
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_retry_after_seconds = max_retry_after_seconds
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Time to wait before the next attempt
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first failure)
+            retry_after: Seconds the upstream asked the client to wait, if it did
+
+        Returns:
+            Seconds to sleep, or None if no further attempt should be made
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if retry_after is not None and retry_after > self.max_retry_after_seconds:
+            return None
+        backoff = random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** (attempt - 1)))
+        return max(backoff, retry_after or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after consecutive upstream failures, then lets a trial call through
+
+    Closed: calls pass. Open: calls raise CircuitOpenError until recovery_seconds have passed.
+    Half-open: one trial call passes; its success closes the circuit, its failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30):
+        """
+        Args:
+            name: Upstream name, used in errors and logs
+            failure_threshold: Consecutive transient failures that open the circuit
+            recovery_seconds: Time the circuit stays open before a trial call
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        self.opened = 0
+        self.short_circuited = 0
+
+    def before_call(self) -> None:
+        """
+        Admit a call
+
+        Raises:
+            CircuitOpenError: While the circuit is open, or while a half-open trial call is running
+        """
+        if self.state == "closed":
+            return
+        remaining = self._opened_at + self.recovery_seconds - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.short_circuited += 1
+        raise CircuitOpenError(
+            f"Upstream '{self.name}' is unavailable; failing fast while it recovers",
+            retry_after=max(1.0, remaining))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            self.logger.info(f"Circuit for '{self.name}' closed")
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or (
+                self.state == "closed" and self._consecutive_failures >= self.failure_threshold):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self.opened += 1
+            self.logger.warning(
+                f"Circuit for '{self.name}' opened after {self._consecutive_failures} consecutive failures")
+
+    def release(self) -> None:
+        """End a call that neither succeeded nor failed upstream, e.g. one cancelled by its client"""
+        self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self.state == "open",
+            "half_open": self.state == "half_open",
+            "consecutive_failures": self._consecutive_failures,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class UpstreamGuard:
+    """
+    Per-stage deadlines, retries and a circuit breaker for one upstream dependency
+
+    Every setting can be overridden with UPSTREAM_<NAME>_* environment variables, e.g.
+    UPSTREAM_MODEL_DEPLOYMENT_MAX_ATTEMPTS or UPSTREAM_MODEL_DEPLOYMENT_FIRST_TOKEN_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self, name: str, timeouts: Dict[str, float], max_attempts: int = 3,
+                 base_delay_seconds: float = 0.5, max_delay_seconds: float = 8, max_retry_after_seconds: float = 30,
+                 failure_threshold: int = 5, recovery_seconds: float = 30):
+        """
+        Args:
+            name: Upstream name, e.g. 'model_deployment'
+            timeouts: Deadline in seconds per stage; streams use 'first_token' until the first item
+                and 'stream_idle' between items
+            max_attempts: Attempts per retryable call, including the first
+            base_delay_seconds: First backoff bound; see RetryPolicy
+            max_delay_seconds: Backoff cap; see RetryPolicy
+            max_retry_after_seconds: Longest Retry-After waited out; see RetryPolicy
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_seconds: Time the circuit stays open before a trial call
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self._env_prefix = f"UPSTREAM_{name.upper()}_"
+        self.timeouts = {
+            stage: self._setting(f"{stage.upper()}_TIMEOUT_SECONDS", seconds) for stage, seconds in timeouts.items()
+        }
+        self.retry_policy = RetryPolicy(
+            max_attempts=int(self._setting("MAX_ATTEMPTS", max_attempts)),
+            base_delay_seconds=self._setting("BASE_DELAY_SECONDS", base_delay_seconds),
+            max_delay_seconds=self._setting("MAX_DELAY_SECONDS", max_delay_seconds),
+            max_retry_after_seconds=self._setting("MAX_RETRY_AFTER_SECONDS", max_retry_after_seconds)
+        )
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(self._setting("FAILURE_THRESHOLD", failure_threshold)),
+            recovery_seconds=self._setting("RECOVERY_SECONDS", recovery_seconds)
+        )
+
+        self.calls = 0
+        self.retries = 0
+        self.timeouts_hit = 0
+        self.failures = 0
+
+    def _setting(self, key: str, default: float) -> float:
+        return float(os.getenv(self._env_prefix + key, str(default)))
+
+    async def call(self, stage: str, operation: Callable[[], Awaitable[T]], retry: bool = True) -> T:
+        """
+        Run an upstream operation under the stage deadline, retrying transient failures
+
+        Args:
+            stage: Key of the deadline in timeouts
+            operation: Zero-argument coroutine function; called again for every attempt
+            retry: False for operations that are not safe to repeat
+
+        Returns:
+            The operation's result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            UpstreamTimeoutError: If the last attempt exceeded the stage deadline
+            UpstreamUnavailableError: If the last attempt failed with a transient error
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            self.calls += 1
+            try:
+                async with _Deadline(self.timeouts[stage]):
+                    result = await operation()
+            except BaseException as e:
+                error = self._on_failure(stage, e, self.timeouts[stage])
+                await self._backoff_or_raise(attempt, retry, e, error)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def stream(self, stage: str, open_stream: Callable[[], AsyncIterator[T]],
+                     retry: bool = True) -> AsyncIterator[T]:
+        """
+        Iterate an upstream stream under first-item and idle deadlines
+
+        Failures before the first item are retried like call(); once an item has been yielded
+        the stream is not restarted, since the consumer has already seen its output.
+
+        Args:
+            stage: Name reported in errors and logs
+            open_stream: Zero-argument function returning a new stream; called again for every attempt
+            retry: False for streams that are not safe to restart
+
+        Yields:
+            The stream's items
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            self.calls += 1
+            started = False
+            timeout = self.timeouts["first_token"]
+            try:
+                async with aclosing(open_stream()) as items:
+                    iterator = items.__aiter__()
+                    while True:
+                        timeout = self.timeouts["stream_idle" if started else "first_token"]
+                        try:
+                            # Awaited in this task: the stream may keep context, e.g. a span, across items
+                            async with _Deadline(timeout):
+                                item = await iterator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        started = True
+                        yield item
+            except BaseException as e:
+                error = self._on_failure(stage, e, timeout)
+                await self._backoff_or_raise(attempt, retry and not started, e, error)
+                continue
+            self.breaker.record_success()
+            return
+
+    def _on_failure(self, stage: str, error: BaseException, timeout: float) -> Optional[UpstreamError]:
+        """Record a failed attempt; returns the error to raise in its place for transient failures"""
+        if not isinstance(error, Exception):
+            # Cancellation or generator close: the upstream did not fail
+            self.breaker.release()
+            return None
+        if isinstance(error, CircuitOpenError):
+            return None
+        # Distinct from the builtin TimeoutError before Python 3.11
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+            self.timeouts_hit += 1
+            self.failures += 1
+            self.breaker.record_failure()
+            return UpstreamTimeoutError(
+                f"Upstream '{self.name}' {stage} exceeded its {timeout:g}s deadline")
+
+        retryable, retry_after = classify_error(error)
+        if not retryable:
+            # The upstream answered; a rejected request says nothing about its health
+            self.breaker.record_success()
+            return None
+        self.failures += 1
+        self.breaker.record_failure()
+        return UpstreamUnavailableError(f"Upstream '{self.name}' {stage} failed: {error}", retry_after=retry_after)
+
+    async def _backoff_or_raise(self, attempt: int, retry: bool, original: BaseException,
+                                error: Optional[UpstreamError]) -> None:
+        if error is None:
+            raise original
+        delay = self.retry_policy.delay(attempt, error.retry_after) if retry else None
+        if delay is None or self.breaker.state == "open":
+            raise error from original
+        self.retries += 1
+        self.logger.warning(f"{error}; retrying in {delay:.2f}s (attempt {attempt + 1})")
+        await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call, retry, timeout and failure counters and the circuit state"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts_hit,
+            "failures": self.failures,
+            "circuit": self.breaker.stats(),
+        }
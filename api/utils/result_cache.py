@@ -0,0 +1,115 @@
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Union
+
+from .cache_utils import TTLCache, SqliteKeyValueStore
+
+
+class ResultCache:
+    """Content-addressed result cache: an in-memory LRU tier plus an optional SQLite tier that survives restarts"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = 3600, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of results kept in memory
+            ttl_seconds: Lifetime of a cached result in seconds, or None for results that never expire
+            db_path: Path of an SQLite database for the on-disk tier, or None to keep results in memory only
+        """
+        self.logger = logging.getLogger(__name__)
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._disk = SqliteKeyValueStore(db_path, table="result_cache") if db_path else None
+
+        self.disk_hits = 0
+        self.stores = 0
+        self.bypasses = 0
+
+    @staticmethod
+    def make_key(*parts: Union[str, bytes]) -> str:
+        """
+        Build a cache key from a hash of the given parts
+
+        Args:
+            parts: Values that determine the result, e.g. image digests, prompt text and deployment name
+
+        Returns:
+            Hex SHA-256 digest identifying the combination of parts
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode("utf-8") if isinstance(part, str) else part
+            # Length-prefix each part so ("ab", "c") and ("a", "bc") hash differently
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result, checking memory first and then disk
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+
+        if self._disk:
+            try:
+                stored = await asyncio.to_thread(self._disk.get, key)
+            except Exception as e:
+                self.logger.warning(f"Result cache disk lookup failed: {e}")
+                stored = None
+            if stored is not None:
+                value = json.loads(stored)
+                self._memory.set(key, value)
+                self.disk_hits += 1
+                return value
+
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a result in every tier
+
+        Args:
+            key: Cache key from make_key
+            value: JSON-serializable result
+        """
+        self._memory.set(key, value)
+        self.stores += 1
+        if self._disk:
+            try:
+                await asyncio.to_thread(self._disk.set, key, json.dumps(value), self.ttl_seconds)
+            except Exception as e:
+                self.logger.warning(f"Result cache disk write failed: {e}")
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache lookup"""
+        self.bypasses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters for both tiers"""
+        memory_stats = self._memory.stats()
+        return {
+            "hits": memory_stats["hits"] + self.disk_hits,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": memory_stats["misses"] - self.disk_hits,
+            "evictions": memory_stats["evictions"],
+            "expirations": memory_stats["expirations"],
+            "stores": self.stores,
+            "bypasses": self.bypasses,
+            "size": memory_stats["size"],
+            "disk_enabled": self._disk is not None,
+        }
+
+    def close(self) -> None:
+        """Close the on-disk tier"""
+        if self._disk:
+            self._disk.close()
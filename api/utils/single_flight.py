@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one call whose result every caller receives
+
+    The call runs in its own task. A caller that is cancelled, e.g. because its client disconnected,
+    only stops waiting: the call goes on for the callers that remain, and is cancelled when the
+    last of them leaves. Errors are raised to every caller. Callers arriving after the call has
+    finished start a new one; keeping results is left to a cache in front.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a call, or join the identical call already in flight
+
+        Args:
+            key: Identifies calls that produce the same result
+            call: Coroutine function to run when no call with this key is in flight
+
+        Returns:
+            The result of the shared call
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.create_task(call()))
+            flight.task.add_done_callback(lambda _: self._discard(key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the result any more; later callers start a fresh call
+                self._discard(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+
+    def _discard(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return in-flight calls and how many callers started, joined or abandoned one"""
+        return {
+            "in_flight": len(self._flights),
+            "waiters": sum(flight.waiters for flight in self._flights.values()),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+        }
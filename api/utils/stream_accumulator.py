@@ -0,0 +1,93 @@
+from typing import Any, List, Optional, Tuple
+
+from semantic_kernel.contents import StreamingAnnotationContent, StreamingFileReferenceContent
+
+from ..models.api_models import FileReference, RequestResult, Source
+
+
+class StreamAccumulator:
+    """
+    Collects a streamed agent response: text and code chunks, sources and file references
+
+    Text is kept as a list of chunks and joined once when the result is built, instead of
+    copying the response so far on every delta. Each annotation or file reference is converted
+    once; the converted object is both streamed to the client and kept for the final result.
+    """
+
+    __slots__ = ("_chunks", "_code_chunks", "sources", "file_references")
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._code_chunks: List[str] = []
+        self.sources: List[Source] = []
+        self.file_references: List[FileReference] = []
+
+    def add_text(self, content: str, is_code: bool) -> None:
+        """
+        Append a text delta
+
+        Args:
+            content: The delta's text
+            is_code: Whether the delta is code interpreter output
+        """
+        self._chunks.append(content)
+        if is_code:
+            self._code_chunks.append(content)
+
+    def add_item(self, item: Any) -> Optional[Tuple[str, Any]]:
+        """
+        Record a streamed content item
+
+        Args:
+            item: An item of a streamed message
+
+        Returns:
+            The ("annotation", Source) or ("file", FileReference) event for the item, or None for
+            items that are not collected, such as text
+        """
+        if isinstance(item, StreamingAnnotationContent):
+            source = _to_source(item)
+            self.sources.append(source)
+            return "annotation", source
+        if isinstance(item, StreamingFileReferenceContent):
+            file_reference = FileReference(id=item.file_id if item.file_id else '')
+            self.file_references.append(file_reference)
+            return "file", file_reference
+        return None
+
+    def result(self, intermediate_steps: List[str], thread_id: str) -> RequestResult:
+        """
+        Build the final result
+
+        Args:
+            intermediate_steps: Function call steps of the run
+            thread_id: ID of the agent thread
+
+        Returns:
+            The request result with the joined response and code output
+        """
+        return RequestResult(
+            content="".join(self._chunks),
+            sources=self.sources,
+            files=self.file_references,
+            intermediate_steps=intermediate_steps,
+            thread_id=thread_id,
+            code_content="".join(self._code_chunks).strip()
+        )
+
+
+def _to_source(item: StreamingAnnotationContent) -> Source:
+    """Convert a streamed annotation into a Source"""
+    return Source(
+        quote=item.quote if hasattr(
+            item, 'quote') and item.quote else '',
+        title=item.title if hasattr(
+            item, 'title') and item.title else '',
+        url=item.url if hasattr(
+            item, 'url') and item.url else '',
+        start_index=str(item.start_index) if hasattr(
+            item, 'start_index') and item.start_index is not None else '',
+        end_index=str(item.end_index) if hasattr(
+            item, 'end_index') and item.end_index is not None else ''
+    )
+
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from .cache_utils import TTLCache, SqliteKeyValueStore
+
+
+class ThreadVectorStoreCache:
+    """
+    Maps agent thread IDs to their file search vector store ID: an in-memory LRU plus an optional shared SQLite tier
+
+    Also records which vector stores belong to a single thread, as opposed to shared document
+    stores, so files are added to them without looking the store up first. Ownership is kept in a
+    map and SQLite table of its own, outside the thread mappings' LRU and counters.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of thread mappings, and of thread-owned stores, kept in memory
+            db_path: Path of an SQLite database shared by replicas, or None to keep mappings in memory only
+        """
+        self.logger = logging.getLogger(__name__)
+        self._memory = TTLCache(max_entries=max_entries)
+        self._disk = SqliteKeyValueStore(db_path, table="thread_vector_stores") if db_path else None
+        self._own_stores = TTLCache(max_entries=max_entries)
+        self._own_stores_disk = SqliteKeyValueStore(db_path, table="thread_owned_vector_stores") if db_path else None
+
+        self.disk_hits = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    async def get(self, thread_id: str) -> Optional[str]:
+        """
+        Look up the vector store attached to a thread
+
+        Args:
+            thread_id: Agent thread ID
+
+        Returns:
+            The vector store ID, or None if the mapping is not known locally
+        """
+        return await self._get(self._memory, self._disk, thread_id)
+
+    async def _get(self, memory: TTLCache, disk: Optional[SqliteKeyValueStore], key: str) -> Optional[str]:
+        value = memory.get(key)
+        if value is not None:
+            return value
+
+        if disk:
+            try:
+                value = await asyncio.to_thread(disk.get, key)
+            except Exception as e:
+                self.logger.warning(f"Thread vector store cache disk lookup failed: {e}")
+                value = None
+            if value is not None:
+                memory.set(key, value)
+                if memory is self._memory:
+                    self.disk_hits += 1
+                return value
+
+        return None
+
+    async def set(self, thread_id: str, vector_store_id: str) -> None:
+        """
+        Record the vector store attached to a thread
+
+        Args:
+            thread_id: Agent thread ID
+            vector_store_id: ID of the vector store in the thread's file search tool resources
+        """
+        self.stores += 1
+        await self._set(self._memory, self._disk, thread_id, vector_store_id)
+
+    async def _set(self, memory: TTLCache, disk: Optional[SqliteKeyValueStore], key: str, value: str) -> None:
+        memory.set(key, value)
+        if disk:
+            try:
+                await asyncio.to_thread(disk.set, key, value)
+            except Exception as e:
+                self.logger.warning(f"Thread vector store cache disk write failed: {e}")
+
+    async def mark_own_store(self, vector_store_id: str) -> None:
+        """
+        Record that a vector store belongs to a single thread and may be changed for it
+
+        Args:
+            vector_store_id: Vector store ID
+        """
+        await self._set(self._own_stores, self._own_stores_disk, vector_store_id, "1")
+
+    async def is_own_store(self, vector_store_id: str) -> bool:
+        """
+        Check whether a vector store was recorded as belonging to a single thread
+
+        Args:
+            vector_store_id: Vector store ID
+
+        Returns:
+            True for a known thread-owned store; False if the store is shared or unknown
+        """
+        return await self._get(self._own_stores, self._own_stores_disk, vector_store_id) is not None
+
+    async def invalidate(self, thread_id: str) -> None:
+        """
+        Forget a thread's mapping, e.g. after its vector store turned out to be gone
+
+        Args:
+            thread_id: Agent thread ID
+        """
+        self._memory.invalidate(thread_id)
+        self.invalidations += 1
+        if self._disk:
+            try:
+                await asyncio.to_thread(self._disk.delete, thread_id)
+            except Exception as e:
+                self.logger.warning(f"Thread vector store cache disk delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters for both tiers"""
+        memory_stats = self._memory.stats()
+        return {
+            "hits": memory_stats["hits"] + self.disk_hits,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": memory_stats["misses"] - self.disk_hits,
+            "evictions": memory_stats["evictions"],
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "size": memory_stats["size"],
+            "disk_enabled": self._disk is not None,
+        }
+
+    def close(self) -> None:
+        """Close the on-disk tier"""
+        if self._disk:
+            self._disk.close()
+        if self._own_stores_disk:
+            self._own_stores_disk.close()
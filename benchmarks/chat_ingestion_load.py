@@ -0,0 +1,84 @@
+"""
+Latency of plain /chat requests with and without a concurrent file ingestion.
+
+Runs `--concurrency` plain chats in a loop for `--duration` seconds, twice: once on an idle
+server and once while `/chat` requests carrying `--file` (a blob name) keep a vector store
+indexing. If vector store polling blocked the event loop, the second phase's percentiles
+would jump by the indexing time.
+
+    uv run python benchmarks/chat_ingestion_load.py --file manuals/pump.pdf --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def chat_loop(client: httpx.AsyncClient, body: dict, deadline: float, latencies: list[float]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/chat", json=body)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def ingestion_loop(client: httpx.AsyncClient, file_name: str, deadline: float, durations: list[float]) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/chat", json={"message": "Summarize the attached document", "file": file_name})
+        response.raise_for_status()
+        durations.append(time.perf_counter() - start)
+
+
+def summarize(latencies: list[float]) -> dict:
+    if not latencies:
+        return {"requests": 0}
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+async def run_phase(client: httpx.AsyncClient, args: argparse.Namespace, with_ingestion: bool) -> dict:
+    body = {"message": args.message}
+    deadline = time.perf_counter() + args.duration
+    latencies: list[float] = []
+    ingestions: list[float] = []
+    tasks = [chat_loop(client, body, deadline, latencies) for _ in range(args.concurrency)]
+    if with_ingestion:
+        tasks.append(ingestion_loop(client, args.file, deadline, ingestions))
+    await asyncio.gather(*tasks)
+
+    result = {"plain_chat": summarize(latencies)}
+    if with_ingestion:
+        result["ingestion"] = summarize(ingestions)
+    return result
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--file", required=True, help="Blob name of a document to ingest")
+    parser.add_argument("--message", default="What can you help me with?")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per phase")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300) as client:
+        results = {
+            "idle": await run_phase(client, args, with_ingestion=False),
+            "during_ingestion": await run_phase(client, args, with_ingestion=True),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,332 @@
+"""
+Local stand-in for the Azure AI Agent Service with configurable latency, token rate and errors.
+
+Implements the agent, thread, message and run endpoints that ChatAgentService uses through the
+Azure AI Projects SDK. A run is streamed as server-sent events (run created, `tokens` message
+deltas `token_delay` seconds apart, step and run completed), and the finished message can then be
+read back. Uploaded files are only counted, and vector stores are indexed after
+`indexing_latency` seconds. Behaviour can be changed at runtime with POST /fake/behaviour:
+
+    uv run python benchmarks/fake_agent_service.py --port 8140 --latency 0.3 --token-delay 0.02
+
+Point an AgentClientPool at it with attach_agent_client_pool(). Used in-process by
+benchmarks/load_test.py.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+AGENT_ID = "asst_fake"
+
+
+@dataclass
+class FakeAgentServiceBehaviour:
+    latency: float = 0.0        # seconds before a run's first event
+    token_delay: float = 0.0    # seconds between streamed message deltas
+    tokens: int = 20            # message deltas per run
+    error_ratio: float = 0.0    # fraction of runs answered with 500
+    request_latency: float = 0.0  # seconds added to every other call (agents, threads, messages)
+    indexing_latency: float = 0.0  # seconds to create a vector store or add a file to one
+
+
+def create_app(behaviour: FakeAgentServiceBehaviour) -> FastAPI:
+    app = FastAPI()
+    app.state.behaviour = behaviour
+    app.state.requests = 0
+    app.state.runs = 0
+    app.state.failures = 0
+    ids = itertools.count(1)
+    threads: Dict[str, List[Dict[str, Any]]] = {}
+    thread_resources: Dict[str, Dict[str, Any]] = {}
+    files: Dict[str, Dict[str, Any]] = {}
+    vector_stores: Dict[str, Dict[str, Any]] = {}
+    app.state.bytes_uploaded = 0
+
+    def new_id(prefix: str) -> str:
+        return f"{prefix}_{next(ids):08d}"
+
+    def message(thread_id: str, role: str, text: str) -> Dict[str, Any]:
+        return {
+            "id": new_id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "status": "completed", "assistant_id": None,
+            "run_id": None, "attachments": [], "metadata": {},
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        }
+
+    def run(thread_id: str, run_id: str, status: str) -> Dict[str, Any]:
+        return {
+            "id": run_id, "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+            "assistant_id": AGENT_ID, "status": status, "model": "gpt-4o", "instructions": "",
+            "tools": [], "metadata": {}, "parallel_tool_calls": True,
+            "usage": {"prompt_tokens": 120, "completion_tokens": behaviour.tokens,
+                      "total_tokens": 120 + behaviour.tokens} if status == "completed" else None,
+        }
+
+    @app.middleware("http")
+    async def count_requests(request: Request, call_next):
+        app.state.requests += 1
+        if behaviour.request_latency and not request.url.path.startswith("/fake"):
+            await asyncio.sleep(behaviour.request_latency)
+        return await call_next(request)
+
+    @app.get("/assistants")
+    async def list_agents():
+        return {"object": "list", "data": [await get_agent(AGENT_ID)], "first_id": AGENT_ID,
+                "last_id": AGENT_ID, "has_more": False}
+
+    @app.get("/assistants/{agent_id}")
+    async def get_agent(agent_id: str):
+        return {
+            "id": agent_id, "object": "assistant", "created_at": 0, "name": "FakeAgent",
+            "description": None, "model": "gpt-4o", "instructions": "You are a helpful assistant.",
+            "tools": [], "tool_resources": {}, "temperature": 1.0, "top_p": 1.0, "metadata": {},
+        }
+
+    @app.post("/threads")
+    async def create_thread(request: Request):
+        thread_id = new_id("thread")
+        threads[thread_id] = []
+        body = await request.json()
+        thread_resources[thread_id] = body.get("tool_resources") or {}
+        return await get_thread(thread_id)
+
+    @app.get("/threads/{thread_id}")
+    async def get_thread(thread_id: str):
+        return {"id": thread_id, "object": "thread", "created_at": 0, "metadata": {},
+                "tool_resources": thread_resources.get(thread_id, {})}
+
+    @app.delete("/threads/{thread_id}")
+    async def delete_thread(thread_id: str):
+        threads.pop(thread_id, None)
+        thread_resources.pop(thread_id, None)
+        return {"id": thread_id, "object": "thread.deleted", "deleted": True}
+
+    @app.post("/threads/{thread_id}")
+    async def update_thread(thread_id: str, request: Request):
+        body = await request.json()
+        if "tool_resources" in body:
+            thread_resources[thread_id] = body["tool_resources"] or {}
+        return await get_thread(thread_id)
+
+    @app.post("/files")
+    async def upload_file(request: Request):
+        # Multipart body; only the file name is parsed, the content is counted and dropped
+        size = 0
+        head = b""
+        async for chunk in request.stream():
+            if len(head) < 4096:
+                head += chunk[:4096]
+            size += len(chunk)
+        app.state.bytes_uploaded += size
+        match = re.search(rb'name="file"; filename="([^"]*)"', head)
+        file_id = new_id("assistant-file")
+        files[file_id] = {
+            "id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+            "filename": match.group(1).decode() if match else "upload", "purpose": "assistants", "status": "processed",
+        }
+        return files[file_id]
+
+    @app.get("/files/{file_id}")
+    async def get_file(file_id: str):
+        if file_id not in files:
+            return JSONResponse(status_code=404, content={"error": {"code": "NotFound", "message": file_id}})
+        return files[file_id]
+
+    @app.delete("/files/{file_id}")
+    async def delete_file(file_id: str):
+        files.pop(file_id, None)
+        return {"id": file_id, "object": "file", "deleted": True}
+
+    def vector_store(vector_store_id: str) -> Dict[str, Any]:
+        file_ids = vector_stores[vector_store_id]["file_ids"]
+        return {
+            "id": vector_store_id, "object": "vector_store", "created_at": vector_stores[vector_store_id]["created_at"],
+            "name": vector_stores[vector_store_id]["name"], "usage_bytes": 0, "status": "completed",
+            "metadata": vector_stores[vector_store_id]["metadata"],
+            "file_counts": {"in_progress": 0, "completed": len(file_ids), "failed": 0, "cancelled": 0,
+                            "total": len(file_ids)},
+        }
+
+    def vector_store_file(vector_store_id: str, file_id: str) -> Dict[str, Any]:
+        return {"id": file_id, "object": "vector_store.file", "usage_bytes": 0, "created_at": int(time.time()),
+                "vector_store_id": vector_store_id, "status": "completed", "last_error": None}
+
+    @app.post("/vector_stores")
+    async def create_vector_store(request: Request):
+        body = await request.json()
+        await asyncio.sleep(behaviour.indexing_latency)
+        vector_store_id = new_id("vs")
+        vector_stores[vector_store_id] = {"name": body.get("name"), "created_at": int(time.time()),
+                                          "metadata": body.get("metadata") or {},
+                                          "file_ids": list(body.get("file_ids") or [])}
+        return vector_store(vector_store_id)
+
+    @app.get("/vector_stores/{vector_store_id}")
+    async def get_vector_store(vector_store_id: str):
+        if vector_store_id not in vector_stores:
+            return JSONResponse(status_code=404, content={"error": {"code": "NotFound", "message": vector_store_id}})
+        return vector_store(vector_store_id)
+
+    @app.delete("/vector_stores/{vector_store_id}")
+    async def delete_vector_store(vector_store_id: str):
+        vector_stores.pop(vector_store_id, None)
+        return {"id": vector_store_id, "object": "vector_store.deleted", "deleted": True}
+
+    @app.get("/vector_stores/{vector_store_id}/files")
+    async def list_vector_store_files(vector_store_id: str):
+        file_ids = vector_stores.get(vector_store_id, {}).get("file_ids", [])
+        return {"object": "list", "data": [vector_store_file(vector_store_id, file_id) for file_id in file_ids],
+                "first_id": file_ids[0] if file_ids else None, "last_id": file_ids[-1] if file_ids else None,
+                "has_more": False}
+
+    @app.post("/vector_stores/{vector_store_id}/files")
+    async def create_vector_store_file(vector_store_id: str, request: Request):
+        if vector_store_id not in vector_stores:
+            return JSONResponse(status_code=404, content={"error": {"code": "NotFound", "message": vector_store_id}})
+        body = await request.json()
+        await asyncio.sleep(behaviour.indexing_latency)
+        vector_stores[vector_store_id]["file_ids"].append(body["file_id"])
+        return vector_store_file(vector_store_id, body["file_id"])
+
+    @app.get("/vector_stores/{vector_store_id}/files/{file_id}")
+    async def get_vector_store_file(vector_store_id: str, file_id: str):
+        return vector_store_file(vector_store_id, file_id)
+
+    @app.post("/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        body = await request.json()
+        content = body.get("content")
+        text = content if isinstance(content, str) else json.dumps(content)
+        created = message(thread_id, body.get("role", "user"), text)
+        threads.setdefault(thread_id, []).append(created)
+        return created
+
+    @app.get("/threads/{thread_id}/messages/{message_id}")
+    async def get_message(thread_id: str, message_id: str):
+        for stored in threads.get(thread_id, []):
+            if stored["id"] == message_id:
+                return stored
+        return JSONResponse(status_code=404, content={"error": {"code": "NotFound", "message": message_id}})
+
+    @app.get("/threads/{thread_id}/runs")
+    async def list_runs(thread_id: str):
+        return {"object": "list", "data": [], "first_id": None, "last_id": None, "has_more": False}
+
+    @app.post("/threads/{thread_id}/runs/{run_id}/cancel")
+    async def cancel_run(thread_id: str, run_id: str):
+        return run(thread_id, run_id, "cancelled")
+
+    @app.post("/threads/{thread_id}/runs")
+    async def create_run(thread_id: str):
+        app.state.runs += 1
+        if random.random() < behaviour.error_ratio:
+            app.state.failures += 1
+            return JSONResponse(status_code=500, content={"error": {"code": "server_error", "message": "Injected 500"}})
+
+        run_id = new_id("run")
+        message_id = new_id("msg")
+        step_id = new_id("step")
+        words = [f"token{index} " for index in range(behaviour.tokens)]
+
+        async def events():
+            def event(name: str, data: Any) -> str:
+                return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+            yield event("thread.run.created", run(thread_id, run_id, "queued"))
+            await asyncio.sleep(behaviour.latency)
+            yield event("thread.run.in_progress", run(thread_id, run_id, "in_progress"))
+            for index, word in enumerate(words):
+                yield event("thread.message.delta", {
+                    "id": message_id, "object": "thread.message.delta",
+                    "delta": {"role": "assistant",
+                              "content": [{"index": 0, "type": "text", "text": {"value": word, "annotations": []}}]},
+                })
+                if index < len(words) - 1:
+                    await asyncio.sleep(behaviour.token_delay)
+
+            completed = message(thread_id, "assistant", "".join(words))
+            completed.update(id=message_id, assistant_id=AGENT_ID, run_id=run_id)
+            threads.setdefault(thread_id, []).append(completed)
+            yield event("thread.run.step.completed", {
+                "id": step_id, "object": "thread.run.step", "type": "message_creation", "status": "completed",
+                "assistant_id": AGENT_ID, "thread_id": thread_id, "run_id": run_id, "created_at": int(time.time()),
+                "step_details": {"type": "message_creation", "message_creation": {"message_id": message_id}},
+                "usage": {"prompt_tokens": 120, "completion_tokens": behaviour.tokens,
+                          "total_tokens": 120 + behaviour.tokens},
+            })
+            yield event("thread.run.completed", run(thread_id, run_id, "completed"))
+            yield "event: done\ndata: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/fake/behaviour")
+    async def set_behaviour(request: Request):
+        updates = await request.json()
+        for field in fields(FakeAgentServiceBehaviour):
+            if field.name in updates:
+                setattr(behaviour, field.name, updates[field.name])
+        return asdict(behaviour)
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"requests": app.state.requests, "runs": app.state.runs, "failures": app.state.failures,
+                "threads": len(threads), "files": len(files), "bytes_uploaded": app.state.bytes_uploaded,
+                "vector_stores": len(vector_stores), "behaviour": asdict(behaviour)}
+
+    return app
+
+
+class _FakeCredential:
+    """Async token credential for the fake; its token is never checked"""
+
+    async def get_token(self, *scopes, **kwargs):
+        from azure.core.credentials import AccessToken
+        return AccessToken("fake", int(time.time()) + 3600)
+
+    async def close(self) -> None:
+        pass
+
+
+def attach_agent_client_pool(pool, base_url: str) -> None:
+    """
+    Give an AgentClientPool a client for the fake at base_url, e.g. 'http://127.0.0.1:8140'
+
+    The SDK refuses to send bearer tokens over plain http, so the client is built with a no-op
+    authentication policy instead of the pool's DefaultAzureCredential.
+    """
+    from azure.core.pipeline.policies import SansIOHTTPPolicy
+    from semantic_kernel.agents import AzureAIAgent
+
+    pool._credential = _FakeCredential()
+    pool._client = AzureAIAgent.create_client(
+        credential=pool._credential, endpoint=base_url, authentication_policy=SansIOHTTPPolicy())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8140)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--error-ratio", type=float, default=0.0)
+    args = parser.parse_args()
+
+    behaviour = FakeAgentServiceBehaviour(latency=args.latency, token_delay=args.token_delay,
+                                          tokens=args.tokens, error_ratio=args.error_ratio)
+    uvicorn.run(create_app(behaviour), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
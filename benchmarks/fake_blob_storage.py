@@ -0,0 +1,164 @@
+"""
+Local stand-in for Azure Blob Storage with configurable latency, bandwidth and errors.
+
+Serves blob downloads (whole or ranged), blob and container properties for one account. Every blob
+name resolves to the same generated image unless a blob was stored with PUT. Behaviour can be
+changed at runtime with POST /fake/behaviour:
+
+    uv run python benchmarks/fake_blob_storage.py --port 8150 --latency 0.05
+
+The Azure SDK accepts it through connection_string(), which uses plain http. Used in-process by
+benchmarks/load_test.py.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import random
+from dataclasses import asdict, dataclass, fields
+from email.utils import formatdate
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+ACCOUNT = "devstoreaccount1"
+ACCOUNT_KEY = base64.b64encode(b"fake-blob-storage-account-key").decode("ascii")
+
+# A 1x1 PNG
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+
+@dataclass
+class FakeBlobStorageBehaviour:
+    latency: float = 0.0            # seconds before each response
+    bytes_per_second: float = 0.0   # download bandwidth; 0 is unlimited
+    error_ratio: float = 0.0        # fraction of requests answered with 503
+    blob_size: int = 0              # size of the default blob; 0 serves the 1x1 PNG
+
+
+def connection_string(base_url: str) -> str:
+    """Connection string for the fake at base_url, e.g. 'http://127.0.0.1:8150'"""
+    return (f"DefaultEndpointsProtocol=http;AccountName={ACCOUNT};AccountKey={ACCOUNT_KEY};"
+            f"BlobEndpoint={base_url}/{ACCOUNT};")
+
+
+def create_app(behaviour: FakeBlobStorageBehaviour) -> FastAPI:
+    app = FastAPI()
+    app.state.behaviour = behaviour
+    app.state.requests = 0
+    app.state.failures = 0
+    app.state.bytes_sent = 0
+    blobs: Dict[str, bytes] = {}
+    default_blob: Dict[int, bytes] = {}
+
+    def common_headers(content: bytes = b"") -> Dict[str, str]:
+        # The ETag follows the content, so a blob replaced with PUT is a new version
+        etag = f'"0x{hashlib.md5(content).hexdigest()[:15].upper()}"'
+        return {"ETag": etag, "Last-Modified": formatdate(usegmt=True), "x-ms-version": "2025-01-05"}
+
+    def blob_headers(content: bytes) -> Dict[str, str]:
+        return {
+            **common_headers(content),
+            "Content-Type": "image/png",
+            "x-ms-blob-type": "BlockBlob",
+            "x-ms-creation-time": formatdate(usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+
+    def content_for(name: str) -> bytes:
+        if name in blobs:
+            return blobs[name]
+        if not behaviour.blob_size:
+            return PIXEL
+        if behaviour.blob_size not in default_blob:
+            default_blob.clear()
+            default_blob[behaviour.blob_size] = PIXEL + bytes(max(0, behaviour.blob_size - len(PIXEL)))
+        return default_blob[behaviour.blob_size]
+
+    async def inject() -> Optional[Response]:
+        app.state.requests += 1
+        await asyncio.sleep(behaviour.latency)
+        if random.random() < behaviour.error_ratio:
+            app.state.failures += 1
+            return JSONResponse(status_code=503, headers={"x-ms-error-code": "ServerBusy"},
+                                content={"error": "Injected 503"})
+        return None
+
+    @app.get(f"/{ACCOUNT}/{{container}}")
+    async def container_properties(container: str):
+        return await inject() or Response(status_code=200, headers=common_headers())
+
+    @app.put(f"/{ACCOUNT}/{{container}}/{{blob:path}}")
+    async def put_blob(container: str, blob: str, request: Request):
+        content = blobs[f"{container}/{blob}"] = await request.body()
+        return Response(status_code=201, headers=common_headers(content))
+
+    @app.head(f"/{ACCOUNT}/{{container}}/{{blob:path}}")
+    async def blob_properties(container: str, blob: str):
+        error = await inject()
+        if error:
+            return error
+        content = content_for(f"{container}/{blob}")
+        return Response(status_code=200, headers={**blob_headers(content), "Content-Length": str(len(content))})
+
+    @app.get(f"/{ACCOUNT}/{{container}}/{{blob:path}}")
+    async def get_blob(container: str, blob: str, request: Request):
+        error = await inject()
+        if error:
+            return error
+        content = content_for(f"{container}/{blob}")
+        total = len(content)
+        start, end = 0, total - 1
+        range_header = request.headers.get("x-ms-range") or request.headers.get("range")
+        if range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first or 0)
+            end = min(total - 1, int(last)) if last else total - 1
+        body = content[start:end + 1]
+        if behaviour.bytes_per_second:
+            await asyncio.sleep(len(body) / behaviour.bytes_per_second)
+        app.state.bytes_sent += len(body)
+
+        headers = blob_headers(content)
+        if range_header:
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+            return Response(content=body, status_code=206, headers=headers)
+        return Response(content=body, status_code=200, headers=headers)
+
+    @app.post("/fake/behaviour")
+    async def set_behaviour(request: Request):
+        updates = await request.json()
+        for field in fields(FakeBlobStorageBehaviour):
+            if field.name in updates:
+                setattr(behaviour, field.name, updates[field.name])
+        return asdict(behaviour)
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"requests": app.state.requests, "failures": app.state.failures,
+                "bytes_sent": app.state.bytes_sent, "behaviour": asdict(behaviour)}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8150)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--bytes-per-second", type=float, default=0.0)
+    parser.add_argument("--error-ratio", type=float, default=0.0)
+    args = parser.parse_args()
+
+    behaviour = FakeBlobStorageBehaviour(latency=args.latency, bytes_per_second=args.bytes_per_second,
+                                         error_ratio=args.error_ratio)
+    uvicorn.run(create_app(behaviour), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Local stand-in for an Azure OpenAI chat deployment that injects latency, throttling and stalls.
+
+Serves POST /openai/deployments/{deployment}/chat/completions (streaming and non-streaming) with
+a fixed answer. Like Azure OpenAI, it answers 404 for deployments it does not serve and 400 for a
+request without messages, which the health probes send. Behaviour can be set on the command line
+or changed at runtime with POST /fake/behaviour, e.g. {"fail_next": 3, "fail_status": 429, "retry_after": 1}:
+
+    uv run python benchmarks/fake_openai_upstream.py --port 8100 --latency 0.2 --throttle-ratio 0.1
+
+Used in-process by benchmarks/upstream_resilience.py, benchmarks/model_deployment_balancing.py,
+benchmarks/load_test.py and the tests under tests/.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_CHUNKS = ["Serial number: ", "SN-", "4471", "-B"]
+
+
+@dataclass
+class FakeUpstreamBehaviour:
+    latency: float = 0.0            # seconds before the response (or the first chunk) is sent
+    chunk_delay: float = 0.0        # seconds between streamed chunks
+    fail_next: int = 0              # answer the next N requests with fail_status
+    fail_status: int = 429
+    retry_after: Optional[float] = None
+    throttle_ratio: float = 0.0     # fraction of other requests answered with 429
+    error_ratio: float = 0.0        # fraction of other requests answered with 503
+    tokens: int = 0                 # chunks per answer; 0 sends the fixed ANSWER_CHUNKS
+    stall_after_first_chunk: float = 0.0  # seconds a stream stalls after its first chunk
+    remaining_tokens: Optional[int] = None  # token quota, reported in x-ratelimit-remaining-tokens; 429 when spent
+    deployments: Optional[List[str]] = None  # deployment names served; None serves any name
+
+
+def create_app(behaviour: FakeUpstreamBehaviour) -> FastAPI:
+    app = FastAPI()
+    app.state.behaviour = behaviour
+    app.state.requests = 0
+    app.state.failures = 0
+    app.state.probes = 0
+
+    def error_response(status: int) -> JSONResponse:
+        app.state.failures += 1
+        headers = {"Retry-After": f"{behaviour.retry_after:g}"} if behaviour.retry_after is not None else {}
+        code = "429" if status == 429 else "ServiceUnavailable"
+        return JSONResponse(status_code=status, headers=headers,
+                            content={"error": {"code": code, "message": f"Injected {status}"}})
+
+    def validation_error(message: str) -> JSONResponse:
+        return JSONResponse(status_code=400, content={"error": {"code": "BadRequest", "message": message}})
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        if behaviour.deployments is not None and deployment not in behaviour.deployments:
+            return JSONResponse(status_code=404, content={"error": {
+                "code": "DeploymentNotFound", "message": f"The API deployment {deployment} does not exist"}})
+        if not body.get("messages"):
+            # Health probe: rejected before any completion is generated
+            app.state.probes += 1
+            if behaviour.fail_next > 0:
+                behaviour.fail_next -= 1
+                return error_response(behaviour.fail_status)
+            await asyncio.sleep(behaviour.latency)
+            return validation_error("'$.messages' is too short")
+        app.state.requests += 1
+        if behaviour.fail_next > 0:
+            behaviour.fail_next -= 1
+            return error_response(behaviour.fail_status)
+        if random.random() < behaviour.throttle_ratio:
+            return error_response(429)
+        if random.random() < behaviour.error_ratio:
+            return error_response(503)
+        answer_chunks = [f"token{index} " for index in range(behaviour.tokens)] if behaviour.tokens else ANSWER_CHUNKS
+        usage = {"prompt_tokens": 120, "completion_tokens": len(answer_chunks), "total_tokens": 120 + len(answer_chunks)}
+        headers = {}
+        if behaviour.remaining_tokens is not None:
+            if behaviour.remaining_tokens < usage["total_tokens"]:
+                return error_response(429)
+            behaviour.remaining_tokens -= usage["total_tokens"]
+            headers["x-ratelimit-remaining-tokens"] = str(behaviour.remaining_tokens)
+        await asyncio.sleep(behaviour.latency)
+
+        created = int(time.time())
+        if not body.get("stream"):
+            return JSONResponse(headers=headers, content={
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": deployment,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(answer_chunks)}}],
+                "usage": usage,
+            })
+
+        async def chunks():
+            def chunk(delta: dict, finish_reason: Optional[str] = None, **extra) -> str:
+                choices = [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else []
+                payload = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                           "model": deployment, "choices": choices, **extra}
+                return f"data: {json.dumps(payload)}\n\n"
+
+            for index, text in enumerate(answer_chunks):
+                delta = {"role": "assistant", "content": text} if index == 0 else {"content": text}
+                yield chunk(delta)
+                if index == 0 and behaviour.stall_after_first_chunk:
+                    await asyncio.sleep(behaviour.stall_after_first_chunk)
+                await asyncio.sleep(behaviour.chunk_delay)
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream", headers=headers)
+
+    @app.post("/fake/behaviour")
+    async def set_behaviour(request: Request):
+        updates = await request.json()
+        for field in fields(FakeUpstreamBehaviour):
+            if field.name in updates:
+                setattr(behaviour, field.name, updates[field.name])
+        return asdict(behaviour)
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"requests": app.state.requests, "failures": app.state.failures, "probes": app.state.probes,
+                "behaviour": asdict(behaviour)}
+
+    return app
+
+
+def redirect_deployment(deployment, base_url: str) -> None:
+    """
+    Send a ModelDeployment's requests to a fake upstream, e.g. 'http://127.0.0.1:8100'
+
+    Deployments are configured with https endpoints, so the fake is attached by swapping the base URL
+    of the deployment's OpenAI client, keeping its quota hook.
+    """
+    deployment.service.client = deployment.service.client.with_options(base_url=f"{base_url}/openai")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--throttle-ratio", type=float, default=0.0)
+    parser.add_argument("--error-ratio", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    behaviour = FakeUpstreamBehaviour(latency=args.latency, chunk_delay=args.chunk_delay,
+                                      throttle_ratio=args.throttle_ratio, error_ratio=args.error_ratio,
+                                      tokens=args.tokens, retry_after=args.retry_after)
+    uvicorn.run(create_app(behaviour), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-request setup overhead of ImageAnalysisAgent before it calls the model.
+
+"before" reproduces the old path: read the system prompt file, build PromptExecutionSettings,
+KernelArguments and a ChatCompletionAgent, and parse the instructions into a prompt template.
+"after" takes the prompt from the in-memory store and reuses the agent shared per prompt
+version and deployment, building only the per-invocation arguments. Both paths end with the
+work the agent does before the model call: merging arguments, selecting the service and
+rendering the instructions.
+
+Reports mean time per request, the memory and allocated blocks still held by the request's
+setup objects and the peak memory allocated while building them, as JSON. No model is called.
+
+    uv run python benchmarks/image_agent_setup.py --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "AZURE_OPENAI_ENDPOINT": "https://fake-upstream.invalid",
+    "AZURE_OPENAI_API_KEY": "fake",
+    "IMAGE_ANALYSIS_CACHE_ENABLED": "false",
+    "IMAGE_PREPROCESS_ENABLED": "false",
+})
+
+PROMPT_FILENAME = "image_analysis_system_prompt.txt"
+
+
+async def setup_before(agent, service_id: str):
+    from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+
+    with open(agent.agent_utils.get_prompt_file_path(PROMPT_FILENAME), 'r', encoding='utf-8') as file:
+        system_message = file.read().strip()
+    chat_agent = agent._create_agent(system_message, service_id)
+    chat_agent.arguments["diagnostics"] = []
+    arguments = chat_agent._merge_arguments(None)
+    agent.kernel.select_ai_service(arguments=arguments, type=ChatCompletionClientBase)
+    await chat_agent.format_instructions(agent.kernel, arguments)
+    return chat_agent, arguments
+
+
+async def setup_after(agent, service_id: str):
+    from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+
+    chat_agent = agent._get_agent(agent._get_system_prompt(), service_id)
+    arguments = chat_agent._merge_arguments(agent._invocation_arguments())
+    agent.kernel.select_ai_service(arguments=arguments, type=ChatCompletionClientBase)
+    await chat_agent.format_instructions(agent.kernel, arguments)
+    return chat_agent, arguments
+
+
+async def measure(setup, agent, service_id: str, requests: int, samples: int) -> dict:
+    await setup(agent, service_id)  # warm up imports and the shared agent
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await setup(agent, service_id)
+    seconds = time.perf_counter() - start
+
+    retained, blocks, peak = [], [], []
+    tracemalloc.start()
+    for _ in range(samples):
+        tracemalloc.clear_traces()
+        result = await setup(agent, service_id)
+        current, peak_bytes = tracemalloc.get_traced_memory()
+        retained.append(current)
+        blocks.append(len(tracemalloc.take_snapshot().traces))
+        peak.append(peak_bytes)
+        del result
+    tracemalloc.stop()
+
+    return {
+        "us_per_request": round(seconds / requests * 1e6, 1),
+        "retained_bytes_per_request": int(sum(retained) / samples),
+        "retained_blocks_per_request": int(sum(blocks) / samples),
+        "peak_bytes_per_request": int(sum(peak) / samples),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=50, help="Requests traced for memory")
+    args = parser.parse_args()
+
+    from api.agents.image_analysis_agent import ImageAnalysisAgent
+    agent = ImageAnalysisAgent()
+    service_id = agent.deployments.deployments[0].service_id
+    try:
+        before = await measure(setup_before, agent, service_id, args.requests, args.samples)
+        after = await measure(setup_after, agent, service_id, args.requests, args.samples)
+    finally:
+        await agent.close()
+
+    print(json.dumps({
+        "requests": args.requests,
+        "before": before,
+        "after": after,
+        "speedup": round(before["us_per_request"] / after["us_per_request"], 1),
+        "agent_cache": agent.agent_cache_stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Compare time-to-first-byte between /image-analysis and /image-analysis-stream.
+
+Run against a server started with `uv run python main.py`:
+
+    uv run python benchmarks/image_analysis_first_byte.py --image label.jpg --iterations 10
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import mimetypes
+import statistics
+import time
+
+import httpx
+
+
+async def measure(client: httpx.AsyncClient, path: str, body: dict) -> tuple[float, float]:
+    """Return (seconds to first byte, seconds to last byte) for one request"""
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream("POST", path, json=body) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first_byte if first_byte is not None else total, total
+
+
+def summarize(samples: list[tuple[float, float]]) -> dict:
+    first_bytes = sorted(sample[0] for sample in samples)
+    totals = sorted(sample[1] for sample in samples)
+    return {
+        "first_byte_p50_ms": round(statistics.median(first_bytes) * 1000, 1),
+        "first_byte_max_ms": round(first_bytes[-1] * 1000, 1),
+        "total_p50_ms": round(statistics.median(totals) * 1000, 1),
+        "total_max_ms": round(totals[-1] * 1000, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--image", required=True, help="Path to an equipment label image")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    media_type = mimetypes.guess_type(args.image)[0] or "image/jpeg"
+    with open(args.image, "rb") as image:
+        data_url = f"data:{media_type};base64,{base64.b64encode(image.read()).decode('utf-8')}"
+    body = {
+        "message": "Extract the serial number from this equipment label",
+        "files": [{"name": args.image, "data_url": data_url}],
+    }
+
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300) as client:
+        for path in ("/image-analysis", "/image-analysis-stream"):
+            samples = [await measure(client, path, body) for _ in range(args.iterations)]
+            results[path] = summarize(samples)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
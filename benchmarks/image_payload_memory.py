@@ -0,0 +1,89 @@
+"""
+Peak memory per image request for the data URL handling in ImageAnalysisAgent.
+
+"before" reproduces the old path: base64-decode the data URL, re-encode it into a new
+data URL and wrap it in ImageContent (which decodes and re-encodes it again).
+"after" uses ImagePayload/EncodedImageContent, which pass the original string through.
+Each mode runs in its own process so peak RSS is not shared between them.
+
+    uv run python benchmarks/image_payload_memory.py --megapixels 12
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_data_url(size_bytes: int) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(os.urandom(size_bytes)).decode("utf-8")
+
+
+def run_before(data_url: str) -> dict:
+    from semantic_kernel.contents import ImageContent
+
+    header_part, base64_data = data_url.split(",")
+    media_type = header_part.split(";")[0].replace("data:", "")
+    image_data = base64.b64decode(base64_data)
+    image_base64 = base64.b64encode(image_data).decode("utf-8")
+    rebuilt = f"data:{media_type};base64,{image_base64}"
+    return ImageContent(data_uri=rebuilt).to_dict()
+
+
+def run_after(data_url: str) -> dict:
+    from api.utils.image_payload import ImagePayload, EncodedImageContent
+
+    payload = ImagePayload.from_data_url(data_url)
+    payload.digest  # the result cache hashes every image
+    return EncodedImageContent(payload).to_dict()
+
+
+def measure(mode: str, size_bytes: int) -> dict:
+    # Import the heavy modules before taking the baseline so only per-request memory is counted
+    import semantic_kernel.contents  # noqa: F401
+    import api.utils.image_payload  # noqa: F401
+
+    data_url = make_data_url(size_bytes)
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    (run_before if mode == "before" else run_after)(data_url)
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "image_mb": round(size_bytes / 2**20, 1),
+        "peak_allocated_mb": round(peak_traced / 2**20, 1),
+        "peak_rss_growth_mb": round((peak_rss_kb - baseline_rss_kb) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12, help="JPEG size is approximated as 1 MB per 3 MP")
+    parser.add_argument("--mode", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    size_bytes = int(args.megapixels / 3 * 2**20)
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, size_bytes)))
+        return
+
+    results = []
+    for mode in ("before", "after"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--megapixels", str(args.megapixels), "--mode", mode],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Import time of the API package and its heaviest dependencies.
+
+Each sample runs `python -X importtime -c "import <module>"` in a fresh interpreter, so
+nothing is served from an already-populated sys.modules. Importing `api` should not load
+Semantic Kernel or the Azure SDKs; `api.main` only adds FastAPI and the route modules.
+
+    uv run python benchmarks/import_time.py --iterations 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(module: str) -> tuple[float, list[tuple[int, str]]]:
+    """Return (wall seconds for the import, [(cumulative microseconds, module name)])"""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.strip()))
+    return float(completed.stdout.strip()), modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="Module to import (repeatable); default: api and api.main")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.module or ["api", "api.main"]:
+        samples = [sample(module) for _ in range(args.iterations)]
+        walls = sorted(wall for wall, _ in samples)
+        # Cumulative times from the last run, so a package's total includes its submodules
+        top = sorted(samples[-1][1], reverse=True)[:args.top]
+        results[module] = {
+            "wall_p50_ms": round(statistics.median(walls) * 1000, 1),
+            "wall_max_ms": round(walls[-1] * 1000, 1),
+            "loads_semantic_kernel": any(name == "semantic_kernel" for _, name in samples[-1][1]),
+            "slowest_imports_ms": {name: round(cumulative / 1000, 1) for cumulative, name in top},
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Throughput and tail latency of the API against local stand-ins for every upstream.
+
+Starts two child processes: one serving fake versions of the Azure AI Agent Service, the Azure
+OpenAI deployment and blob storage (benchmarks/fake_agent_service.py, fake_openai_upstream.py and
+fake_blob_storage.py), and one running the API wired to them. The API process also samples
+its own event-loop lag and RSS. The driver then replays a request corpus at each target rate
+(open loop: requests are sent on schedule whether or not earlier ones have finished) and
+reports, per endpoint, the latency p50/p95/p99, the time to first token of streaming endpoints,
+status codes, the API's RSS, its event-loop lag and the stacks that blocked its loop (from the
+API's event loop monitor).
+
+Corpus lines are JSON objects such as
+    {"endpoint": "/image-analysis-stream", "body": {"message": "...", "files": [...]}, "weight": 2}
+Lines without "endpoint" (e.g. the backlog's requests.jsonl) are sent to /chat with their
+"message", "body" or "title" text. The default corpus is benchmarks/load_test_corpus.jsonl.
+
+Results are printed and saved as JSON under benchmarks/results/ so runs can be compared.
+
+    uv run python benchmarks/load_test.py --rps 5 10 20 --duration 30 --model-token-delay 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+DEFAULT_CORPUS = os.path.join(BENCHMARKS_DIR, "load_test_corpus.jsonl")
+STREAMING_ENDPOINTS = ("/chat-stream", "/image-analysis-stream")
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize_ms(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+class LoopLagSampler:
+    """Measures how late a periodic sleep wakes up on the API's event loop"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=100_000)
+        self.rss_peak_mb = 0.0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+            if len(self.samples) % 25 == 0:
+                self.rss_peak_mb = max(self.rss_peak_mb, rss_mb())
+
+    def stats(self) -> Dict[str, Any]:
+        current = rss_mb()
+        return {
+            "rss_mb": round(current, 1),
+            "rss_mb_peak": round(max(self.rss_peak_mb, current), 1),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "event_loop_lag": summarize_ms(list(self.samples)),
+        }
+
+    def reset(self) -> None:
+        self.samples.clear()
+        self.rss_peak_mb = 0.0
+
+
+async def serve_api(args: argparse.Namespace) -> None:
+    from fake_agent_service import AGENT_ID, attach_agent_client_pool
+    from fake_blob_storage import connection_string
+    from fake_openai_upstream import redirect_deployment
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    os.environ.update({
+        "AZURE_AI_AGENT_ID": AGENT_ID,
+        "AZURE_AI_AGENT_ENDPOINT": f"{upstream_url}/agent-service",
+        "AZURE_OPENAI_ENDPOINT": "https://fake-upstream.invalid",
+        "AZURE_OPENAI_API_KEY": "fake",
+        "AZURE_OPENAI_CHAT_DEPLOYMENTS": "",
+        "AZURE_BLOB_CONNECTION_STRING": connection_string(f"{upstream_url}/blob"),
+        "HEALTH_PROBE_ENABLED": "false",
+        "IMAGE_ANALYSIS_CACHE_ENABLED": "true" if args.result_cache else "false",
+        "IMAGE_ANALYSIS_COALESCING_ENABLED": "true" if args.coalescing else "false",
+        "LOOP_MONITOR_CAPTURE_STACKS": "true",
+    })
+
+    import uvicorn
+    from api.main import app
+    from api.agents.agent_client_pool import agent_client_pool
+    from api.agents.agent_registry import agent_registry
+    from api.utils.loop_monitor import loop_monitor
+
+    attach_agent_client_pool(agent_client_pool, f"{upstream_url}/agent-service")
+    image_analysis_agent = await agent_registry.get("image_analysis")
+    for deployment in image_analysis_agent.deployments.deployments:
+        redirect_deployment(deployment, f"{upstream_url}/model")
+    await agent_registry.get("chat")
+
+    sampler = LoopLagSampler()
+
+    def stats() -> Dict[str, Any]:
+        return {**sampler.stats(), "blocking": loop_monitor.report(limit=5)}
+
+    def reset() -> None:
+        sampler.reset()
+        loop_monitor.reset()
+
+    app.add_api_route("/_load_test/stats", stats, methods=["GET"])
+    app.add_api_route("/_load_test/reset", reset, methods=["POST"])
+    sampler_task = asyncio.create_task(sampler.run())
+    try:
+        await uvicorn.Server(uvicorn.Config(app, port=args.api_port, log_level="warning")).serve()
+    finally:
+        sampler_task.cancel()
+
+
+def serve_upstreams(args: argparse.Namespace) -> None:
+    import uvicorn
+    from fastapi import FastAPI
+    import fake_agent_service
+    import fake_blob_storage
+    import fake_openai_upstream
+
+    upstreams = FastAPI()
+    upstreams.mount("/agent-service", fake_agent_service.create_app(fake_agent_service.FakeAgentServiceBehaviour()))
+    upstreams.mount("/model", fake_openai_upstream.create_app(fake_openai_upstream.FakeUpstreamBehaviour()))
+    upstreams.mount("/blob", fake_blob_storage.create_app(fake_blob_storage.FakeBlobStorageBehaviour()))
+    uvicorn.run(upstreams, port=args.upstream_port, log_level="warning")
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    entries = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "endpoint" in record:
+                entry = {"endpoint": record["endpoint"], "body": record.get("body", {})}
+            else:
+                text = record.get("message") or record.get("body") or record.get("title")
+                if not isinstance(text, str):
+                    continue
+                entry = {"endpoint": "/chat", "body": {"message": text}}
+            entries.extend([entry] * int(record.get("weight", 1)))
+    if not entries:
+        raise ValueError(f"No requests in corpus {path}")
+    return entries
+
+
+async def send(client: httpx.AsyncClient, entry: Dict[str, Any], results: List[Dict[str, Any]]) -> None:
+    endpoint = entry["endpoint"]
+    result: Dict[str, Any] = {"endpoint": endpoint, "ttft": None}
+    start = time.perf_counter()
+    try:
+        if endpoint in STREAMING_ENDPOINTS:
+            async with client.stream("POST", endpoint, json=entry["body"]) as response:
+                result["status"] = response.status_code
+                event_name = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event_name = line[len("event: "):]
+                    elif line.startswith("data: "):
+                        data = json.loads(line[len("data: "):])
+                        kind = event_name or (data.get("type") if isinstance(data, dict) else None)
+                        if kind in ("delta", "text") and result["ttft"] is None:
+                            result["ttft"] = time.perf_counter() - start
+                        elif kind == "error":
+                            result["status"] = "stream_error"
+                        event_name = None
+        else:
+            response = await client.post(endpoint, json=entry["body"])
+            result["status"] = response.status_code
+            # /image-analysis reports model failures as content
+            if response.status_code == 200 and str(response.json().get("content", "")).startswith("Error during"):
+                result["status"] = "content_error"
+    except httpx.HTTPError as e:
+        result["status"] = type(e).__name__
+    result["seconds"] = time.perf_counter() - start
+    results.append(result)
+
+
+async def run_rate(client: httpx.AsyncClient, corpus: List[Dict[str, Any]], rps: float,
+                   duration: float, warmup: float) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    warmup_results: List[Dict[str, Any]] = []
+    tasks = []
+    late: List[float] = []
+    total = int((warmup + duration) * rps)
+    warmup_count = int(warmup * rps)
+    start = time.perf_counter()
+    for index in range(total):
+        if index == warmup_count:
+            await client.post("/_load_test/reset")
+        scheduled = start + index / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            late.append(-delay)
+        entry = random.choice(corpus)
+        tasks.append(asyncio.create_task(send(client, entry, warmup_results if index < warmup_count else results)))
+    sent = time.perf_counter() - start - warmup
+    await asyncio.gather(*tasks)
+    # Completions are counted until the last response, so a backlog shows up as completed_rps < achieved_rps
+    drained = time.perf_counter() - start - warmup
+    api_stats = (await client.get("/_load_test/stats")).json()
+
+    by_endpoint: Dict[str, Dict[str, Any]] = {}
+    for endpoint in sorted({result["endpoint"] for result in results}):
+        endpoint_results = [result for result in results if result["endpoint"] == endpoint]
+        succeeded = [result for result in endpoint_results if result["status"] == 200]
+        by_endpoint[endpoint] = {
+            "requests": len(endpoint_results),
+            "succeeded": len(succeeded),
+            "status": dict(Counter(str(result["status"]) for result in endpoint_results)),
+            "latency": summarize_ms([result["seconds"] for result in succeeded]),
+            "time_to_first_token": summarize_ms([result["ttft"] for result in succeeded if result["ttft"] is not None]),
+        }
+
+    succeeded = [result for result in results if result["status"] == 200]
+    return {
+        "target_rps": rps,
+        "achieved_rps": round(len(results) / max(sent, duration), 2),
+        "completed_rps": round(len(succeeded) / drained, 2) if drained > 0 else 0.0,
+        "requests": len(results),
+        "error_ratio": round(1 - len(succeeded) / len(results), 4) if results else 0.0,
+        "latency": summarize_ms([result["seconds"] for result in succeeded]),
+        "send_lateness": summarize_ms(late),
+        "endpoints": by_endpoint,
+        "api": api_stats,
+    }
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not start within {timeout}s")
+
+
+async def drive(args: argparse.Namespace) -> Dict[str, Any]:
+    corpus = load_corpus(args.corpus)
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    common = [sys.executable, os.path.abspath(__file__),
+              "--upstream-port", str(args.upstream_port), "--api-port", str(args.api_port)]
+    processes = []
+    try:
+        processes.append(subprocess.Popen(common + ["--role", "upstreams"]))
+        await wait_until_up(f"{upstream_url}/model/fake/stats", processes[0])
+        async with httpx.AsyncClient(base_url=upstream_url) as client:
+            await client.post("/agent-service/fake/behaviour", json={
+                "latency": args.agent_latency, "token_delay": args.agent_token_delay,
+                "tokens": args.tokens, "error_ratio": args.agent_error_ratio,
+                "request_latency": args.agent_request_latency})
+            await client.post("/model/fake/behaviour", json={
+                "latency": args.model_latency, "chunk_delay": args.model_token_delay,
+                "tokens": args.tokens, "error_ratio": args.model_error_ratio,
+                "throttle_ratio": args.model_throttle_ratio})
+            await client.post("/blob/fake/behaviour", json={
+                "latency": args.blob_latency, "error_ratio": args.blob_error_ratio})
+
+        processes.append(subprocess.Popen(
+            common + ["--role", "api"] + (["--result-cache"] if args.result_cache else [])
+            + (["--coalescing"] if args.coalescing else [])))
+        await wait_until_up(f"{api_url}/status", processes[1])
+
+        runs = []
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=api_url, timeout=300, limits=limits) as client:
+            for rps in args.rps:
+                runs.append(await run_rate(client, corpus, rps, args.duration, args.warmup))
+        async with httpx.AsyncClient(base_url=upstream_url) as client:
+            upstream_stats = {name: (await client.get(f"/{name}/fake/stats")).json()
+                              for name in ("agent-service", "model", "blob")}
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "corpus": os.path.relpath(args.corpus),
+        "corpus_requests": len(corpus),
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "upstreams": upstream_stats,
+        "runs": runs,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL request corpus")
+    parser.add_argument("--rps", type=float, nargs="+", default=[5.0], help="Target request rates, run in turn")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds per rate")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before each rate")
+    parser.add_argument("--tokens", type=int, default=20, help="Tokens streamed per answer by the fakes")
+    parser.add_argument("--agent-latency", type=float, default=0.3, help="Agent run time to first token")
+    parser.add_argument("--agent-token-delay", type=float, default=0.02)
+    parser.add_argument("--agent-request-latency", type=float, default=0.02,
+                        help="Latency of agent, thread and message calls")
+    parser.add_argument("--agent-error-ratio", type=float, default=0.0)
+    parser.add_argument("--model-latency", type=float, default=0.3, help="Model time to first token")
+    parser.add_argument("--model-token-delay", type=float, default=0.02)
+    parser.add_argument("--model-error-ratio", type=float, default=0.0)
+    parser.add_argument("--model-throttle-ratio", type=float, default=0.0)
+    parser.add_argument("--blob-latency", type=float, default=0.02)
+    parser.add_argument("--blob-error-ratio", type=float, default=0.0)
+    parser.add_argument("--result-cache", action="store_true", help="Keep the image analysis result cache on")
+    parser.add_argument("--coalescing", action="store_true", help="Keep image analysis request coalescing on")
+    parser.add_argument("--output", help="Result file; defaults to benchmarks/results/load_test-<time>.json")
+    parser.add_argument("--upstream-port", type=int, default=int(os.getenv("FAKE_UPSTREAM_PORT", "8160")))
+    parser.add_argument("--api-port", type=int, default=8170)
+    parser.add_argument("--role", choices=["driver", "api", "upstreams"], default="driver", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "upstreams":
+        serve_upstreams(args)
+        return 0
+    if args.role == "api":
+        asyncio.run(serve_api(args))
+        return 0
+
+    report = asyncio.run(drive(args))
+    output = args.output or os.path.join(
+        BENCHMARKS_DIR, "results", f"load_test-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as result_file:
+        json.dump(report, result_file, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Saved to {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Spreads ImageAnalysisAgent calls over three local fake deployments and reports where they went.
+
+Starts three benchmarks/fake_openai_upstream.py servers in-process and configures them through
+AZURE_OPENAI_CHAT_DEPLOYMENTS. Scenarios:
+
+- least_outstanding: one deployment is 6x slower; it must receive the smallest share of calls
+- throttled: one deployment answers 429 with Retry-After; it must be ejected while the others
+  serve every call, then be re-admitted and serve calls again once Retry-After has passed
+- remaining_quota: deployments report different token quota; the one with the most quota left
+  must receive the most calls
+
+Prints per-deployment counters and checks as JSON and exits non-zero if a check fails.
+
+    uv run python benchmarks/model_deployment_balancing.py --requests 90 --concurrency 9
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai_upstream import FakeUpstreamBehaviour, create_app, redirect_deployment  # noqa: E402
+
+BASE_PORT = int(os.getenv("FAKE_UPSTREAM_PORT", "8130"))
+NAMES = ["east", "west", "north"]
+
+os.environ.update({
+    "AZURE_OPENAI_CHAT_DEPLOYMENTS": json.dumps([
+        {"name": name, "endpoint": f"https://{name}.fake-upstream.invalid", "deployment": "gpt-4o"}
+        for name in NAMES
+    ]),
+    "AZURE_OPENAI_API_KEY": "fake",
+    "IMAGE_ANALYSIS_CACHE_ENABLED": "false",
+    "IMAGE_PREPROCESS_ENABLED": "false",
+    "UPSTREAM_MODEL_DEPLOYMENT_BASE_DELAY_SECONDS": "0.01",
+})
+
+# A 1x1 PNG
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+
+async def run_load(agent, total: int, concurrency: int) -> dict:
+    from api.models.api_models import ChatThreadRequest
+    from api.utils.image_payload import ImagePayload
+
+    request = ChatThreadRequest(message="Read the serial number", bypass_cache=True)
+    images = [ImagePayload.from_bytes(PIXEL, "image/png")]
+    before = {name: stats["requests"] for name, stats in agent.deployments.stats().items()}
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    errors = []
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                await agent.analyze_image_payloads(request, images)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    after = agent.deployments.stats()
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "errors": len(errors),
+        "calls": {name: after[name]["requests"] - before[name] for name in NAMES},
+    }
+
+
+def reset(agent, behaviours: dict, **per_deployment) -> None:
+    for name, behaviour in behaviours.items():
+        for field, value in {**vars(FakeUpstreamBehaviour()), **per_deployment.get(name, {})}.items():
+            setattr(behaviour, field, value)
+    agent.upstream.breaker.record_success()
+    for deployment in agent.deployments.deployments:
+        deployment.ejected_until = 0.0
+        deployment.ejections_in_row = deployment.consecutive_failures = 0
+        deployment.remaining_tokens = None
+
+
+async def run_scenarios(agent, behaviours: dict, args: argparse.Namespace) -> dict:
+    report, checks = {}, {}
+
+    agent.deployments.strategy = "least_outstanding"
+    reset(agent, behaviours, east={"latency": 0.05}, west={"latency": 0.05}, north={"latency": 0.3})
+    report["least_outstanding"] = await run_load(agent, args.requests, args.concurrency)
+    calls = report["least_outstanding"]["calls"]
+    checks["slow_deployment_gets_fewest_calls"] = calls["north"] < min(calls["east"], calls["west"])
+
+    reset(agent, behaviours, east={"latency": 0.02}, west={"latency": 0.02},
+          north={"latency": 0.02, "fail_next": 10 ** 6, "retry_after": 2})
+    report["throttled"] = await run_load(agent, args.requests, args.concurrency)
+    north = agent.deployments.stats()["north"]
+    # Only calls sent before its first 429 came back may reach it
+    checks["throttled_deployment_ejected"] = (
+        north["ejections"] == 1 and report["throttled"]["calls"]["north"] <= args.concurrency // len(NAMES))
+    checks["no_errors_while_one_deployment_throttled"] = report["throttled"]["errors"] == 0
+    behaviours["north"].fail_next = 0
+    await asyncio.sleep(2.1)
+    report["readmitted"] = await run_load(agent, args.requests, args.concurrency)
+    checks["throttled_deployment_readmitted"] = report["readmitted"]["calls"]["north"] > 0
+
+    agent.deployments.strategy = "remaining_quota"
+    reset(agent, behaviours, east={"remaining_tokens": 100_000}, west={"remaining_tokens": 20_000},
+          north={"remaining_tokens": 5_000})
+    report["remaining_quota"] = await run_load(agent, args.requests, args.concurrency)
+    calls = report["remaining_quota"]["calls"]
+    checks["most_quota_gets_most_calls"] = calls["east"] > calls["west"] and calls["east"] > calls["north"]
+
+    report["deployments"] = agent.deployments.stats()
+    report["checks"] = checks
+    return report
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=90, help="Calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=9)
+    args = parser.parse_args()
+
+    behaviours = {name: FakeUpstreamBehaviour() for name in NAMES}
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_app(behaviours[name]), port=BASE_PORT + index, log_level="warning"))
+        for index, name in enumerate(NAMES)
+    ]
+    tasks = [asyncio.create_task(server.serve()) for server in servers]
+    while not all(server.started for server in servers):
+        await asyncio.sleep(0.01)
+
+    from api.agents.image_analysis_agent import ImageAnalysisAgent
+    agent = ImageAnalysisAgent()
+    for index, deployment in enumerate(agent.deployments.deployments):
+        redirect_deployment(deployment, f"http://127.0.0.1:{BASE_PORT + index}")
+
+    try:
+        report = await run_scenarios(agent, behaviours, args)
+    finally:
+        await agent.close()
+        for server in servers:
+            server.should_exit = True
+        await asyncio.gather(*tasks)
+
+    print(json.dumps(report, indent=2))
+    return 0 if all(report["checks"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,179 @@
+"""
+Cost of accumulating a streamed chat response in ChatAgentService.stream_chat_sk.
+
+"before" reproduces the original loop: every chunk's items scanned twice by list comprehensions
+that keep the raw annotations and file references, `+=` on the response and code output strings,
+and the items converted into Sources and FileReferences after the stream ends. It streams nothing
+but the final result. "after" feeds the same stream through StreamAccumulator and also yields
+every delta, annotation and file event as the streaming endpoint does. Both consume a synthetic
+stream of Semantic Kernel streaming messages, optionally with code interpreter chunks and
+annotations, and must build the same RequestResult.
+
+Reports mean time per stream and peak memory allocated while accumulating it, as JSON, including
+the relative change of both. No agent service is called.
+
+    uv run python benchmarks/stream_accumulation.py --chunks 10000 --chunk-chars 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, AsyncGenerator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_kernel.agents import AgentResponseItem, ChatHistoryAgentThread
+from semantic_kernel.contents import (
+    StreamingAnnotationContent,
+    StreamingChatMessageContent,
+    StreamingFileReferenceContent,
+    StreamingTextContent,
+)
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from api.models.api_models import FileReference, RequestResult, Source
+from api.utils.stream_accumulator import StreamAccumulator, _to_source
+
+
+def synthetic_stream(chunks: int, chunk_chars: int, code_ratio: float, annotation_every: int) -> List[Any]:
+    """Streamed response items as AzureAIAgent.invoke_stream yields them"""
+    code_every = int(1 / code_ratio) if code_ratio else 0
+    thread = ChatHistoryAgentThread()
+    results = []
+    for index in range(chunks):
+        text = f"{index:06d}" + "x" * max(0, chunk_chars - 6)
+        items: List[Any] = [StreamingTextContent(choice_index=0, text=text)]
+        if annotation_every and index % annotation_every == annotation_every - 1:
+            items.append(StreamingAnnotationContent(
+                file_id=f"assistant-file-{index}", quote="quote", start_index=index, end_index=index + 10))
+        metadata = {"code": True} if code_every and index % code_every == 0 else {}
+        message = StreamingChatMessageContent(
+            role=AuthorRole.ASSISTANT, choice_index=0, items=items, metadata=metadata)
+        results.append(AgentResponseItem(message=message, thread=thread))
+    return results
+
+
+async def accumulate_before(results: List[Any]) -> AsyncGenerator[Tuple[str, Any], None]:
+    sources: list[Source] = []
+    file_references: list[FileReference] = []
+    annotations = []
+    files = []
+    responseContent = ''
+    code_output_content = ''
+    for result in results:
+        annotations.extend([
+            item for item in result.items
+            if isinstance(item, StreamingAnnotationContent)
+        ])
+        files.extend([
+            item for item in result.items
+            if isinstance(item, StreamingFileReferenceContent)
+        ])
+
+        if isinstance(result.message, StreamingChatMessageContent):
+            responseContent += result.message.content
+
+        if (hasattr(result, 'metadata') and result.metadata and
+                result.metadata.get("code") is True):
+            if (isinstance(result.message, StreamingChatMessageContent) and
+                    result.message.content):
+                code_output_content += result.message.content
+
+    for item in annotations:
+        sources.append(_to_source(item))
+
+    for item in files:
+        file_references.append(FileReference(
+            id=item.file_id if hasattr(item, 'file_id') and item.file_id else ''))
+
+    yield "done", RequestResult(
+        content=responseContent,
+        sources=sources,
+        files=file_references,
+        intermediate_steps=[],
+        thread_id="thread",
+        code_content=code_output_content.strip()
+    )
+
+
+async def accumulate_after(results: List[Any]) -> AsyncGenerator[Tuple[str, Any], None]:
+    accumulator = StreamAccumulator()
+    for result in results:
+        for item in result.items:
+            event = accumulator.add_item(item)
+            if event is not None:
+                yield event
+
+        message = result.message
+        if isinstance(message, StreamingChatMessageContent):
+            content = message.content
+            if content:
+                is_code = bool(message.metadata and message.metadata.get("code") is True)
+                accumulator.add_text(content, is_code)
+                yield "delta", {"content": content, "code": is_code}
+
+    yield "done", accumulator.result([], "thread")
+
+
+async def consume(accumulate, results: List[Any]) -> RequestResult:
+    final = None
+    async for event_type, payload in accumulate(results):
+        if event_type == "done":
+            final = payload
+    return final
+
+
+async def measure(accumulate, results: List[Any], repeats: int) -> dict:
+    await consume(accumulate, results)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await consume(accumulate, results)
+    elapsed = (time.perf_counter() - start) / repeats
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    await consume(accumulate, results)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms_per_stream": round(elapsed * 1000, 3), "peak_kib": round(peak / 1024, 1)}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = synthetic_stream(args.chunks, args.chunk_chars, args.code_ratio, args.annotation_every)
+    before = await consume(accumulate_before, results)
+    after = await consume(accumulate_after, results)
+    identical = before.model_dump() == after.model_dump()
+
+    report = {
+        "chunks": args.chunks,
+        "chunk_chars": args.chunk_chars,
+        "code_ratio": args.code_ratio,
+        "annotation_every": args.annotation_every,
+        "response_chars": len(after.content),
+        "results_identical": identical,
+        "before": await measure(accumulate_before, results, args.repeats),
+        "after": await measure(accumulate_after, results, args.repeats),
+    }
+    report["speedup"] = round(report["before"]["ms_per_stream"] / report["after"]["ms_per_stream"], 2)
+    # Positive when the accumulator holds more memory at its peak than the original loop
+    report["peak_memory_change"] = round(report["after"]["peak_kib"] / report["before"]["peak_kib"] - 1, 3)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--code-ratio", type=float, default=1.0, help="Fraction of chunks that are code output")
+    parser.add_argument("--annotation-every", type=int, default=100, help="Add an annotation every N chunks; 0 for none")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
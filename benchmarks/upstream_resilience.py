@@ -0,0 +1,154 @@
+"""
+Checks the upstream resilience layer of ImageAnalysisAgent against a local fake model deployment.
+
+Starts benchmarks/fake_openai_upstream.py in-process, points the agent's OpenAI client at it
+and runs one scenario per behaviour:
+
+- throttled: two 429s with Retry-After, then success; the call must wait out Retry-After
+- slow_first_token: every attempt must be cut at the first-token deadline
+- stalled_stream: a stream that stops after its first chunk must be cut at the idle deadline,
+  without restarting it
+- outage: sustained 503s must open the circuit, after which calls fail without reaching upstream
+- recovery: after the recovery period a trial call must close the circuit again
+
+Prints a JSON report and exits non-zero if a check fails.
+
+    uv run python benchmarks/upstream_resilience.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai_upstream import FakeUpstreamBehaviour, create_app, redirect_deployment  # noqa: E402
+
+PORT = int(os.getenv("FAKE_UPSTREAM_PORT", "8123"))
+
+# Short deadlines and recovery so the scenarios finish in seconds
+os.environ.update({
+    "AZURE_OPENAI_ENDPOINT": "https://fake-upstream.invalid",
+    "AZURE_OPENAI_API_KEY": "fake",
+    "IMAGE_ANALYSIS_CACHE_ENABLED": "false",
+    "IMAGE_PREPROCESS_ENABLED": "false",
+    "UPSTREAM_MODEL_DEPLOYMENT_FIRST_TOKEN_TIMEOUT_SECONDS": "0.5",
+    "UPSTREAM_MODEL_DEPLOYMENT_STREAM_IDLE_TIMEOUT_SECONDS": "0.5",
+    "UPSTREAM_MODEL_DEPLOYMENT_GENERATION_TIMEOUT_SECONDS": "2",
+    "UPSTREAM_MODEL_DEPLOYMENT_MAX_ATTEMPTS": "3",
+    "UPSTREAM_MODEL_DEPLOYMENT_BASE_DELAY_SECONDS": "0.05",
+    "UPSTREAM_MODEL_DEPLOYMENT_FAILURE_THRESHOLD": "3",
+    "UPSTREAM_MODEL_DEPLOYMENT_RECOVERY_SECONDS": "1",
+    "AZURE_OPENAI_EJECT_SECONDS": "1",
+})
+
+# A 1x1 PNG
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+
+async def timed(coroutine) -> dict:
+    start = time.perf_counter()
+    try:
+        result = await coroutine
+        outcome = {"ok": True, "content": result.content}
+    except Exception as e:
+        outcome = {"ok": False, "error": type(e).__name__, "detail": str(e)}
+    outcome["seconds"] = round(time.perf_counter() - start, 3)
+    return outcome
+
+
+async def drain_stream(agent, request) -> dict:
+    start = time.perf_counter()
+    events = []
+    async for event_type, payload in agent.analyze_images_streaming(request):
+        if event_type in ("delta", "error"):
+            events.append((event_type, payload))
+    return {"events": events, "seconds": round(time.perf_counter() - start, 3)}
+
+
+async def run_scenarios(agent, behaviour: FakeUpstreamBehaviour) -> dict:
+    from api.models.api_models import ChatThreadRequest, ImageFile
+    from api.utils.image_payload import ImagePayload
+
+    request = ChatThreadRequest(message="Read the serial number", bypass_cache=True)
+    stream_request = ChatThreadRequest(
+        message="Read the serial number", bypass_cache=True,
+        files=[ImageFile(name="label.png", data_url=ImagePayload.from_bytes(PIXEL, "image/png").data_url)])
+    images = [ImagePayload.from_bytes(PIXEL, "image/png")]
+    report, checks = {}, {}
+
+    def reset(**changes) -> None:
+        for name, value in {**vars(FakeUpstreamBehaviour()), **changes}.items():
+            setattr(behaviour, name, value)
+        # Each scenario starts with a closed circuit and the deployment admitted
+        agent.upstream.breaker.record_success()
+        for deployment in agent.deployments.deployments:
+            deployment.ejected_until = 0.0
+            deployment.ejections_in_row = deployment.consecutive_failures = 0
+
+    reset(fail_next=2, fail_status=429, retry_after=0.3)
+    report["throttled"] = await timed(agent.analyze_image_payloads(request, images))
+    checks["throttled_succeeds_after_retry_after"] = (
+        report["throttled"]["ok"] and report["throttled"]["seconds"] >= 0.6)
+
+    # Three attempts of 0.5s each instead of one 10s wait
+    reset(latency=10.0)
+    report["slow_first_token"] = await drain_stream(agent, stream_request)
+    checks["slow_first_token_cut_at_deadline"] = (
+        report["slow_first_token"]["events"][-1][0] == "error" and report["slow_first_token"]["seconds"] < 2.5)
+
+    reset(stall_after_first_chunk=2.0)
+    report["stalled_stream"] = await drain_stream(agent, stream_request)
+    checks["stalled_stream_cut_at_idle_deadline"] = (
+        report["stalled_stream"]["events"][0][0] == "delta"
+        and report["stalled_stream"]["events"][-1][0] == "error"
+        and report["stalled_stream"]["seconds"] < 1.5)
+
+    reset(fail_next=1000, fail_status=503)
+    report["outage"] = [await timed(agent.analyze_image_payloads(request, images)) for _ in range(3)]
+    checks["outage_opens_circuit"] = agent.upstream.breaker.state == "open"
+    checks["open_circuit_fails_fast"] = (
+        report["outage"][-1]["error"] == "CircuitOpenError" and report["outage"][-1]["seconds"] < 0.01)
+
+    for name, value in vars(FakeUpstreamBehaviour()).items():
+        setattr(behaviour, name, value)
+    await asyncio.sleep(agent.upstream.breaker.recovery_seconds)
+    report["recovery"] = await timed(agent.analyze_image_payloads(request, images))
+    checks["trial_call_closes_circuit"] = report["recovery"]["ok"] and agent.upstream.breaker.state == "closed"
+
+    report["upstream_stats"] = agent.upstream.stats()
+    report["checks"] = checks
+    return report
+
+
+async def main() -> int:
+    behaviour = FakeUpstreamBehaviour()
+    server = uvicorn.Server(uvicorn.Config(create_app(behaviour), port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    from api.agents.image_analysis_agent import ImageAnalysisAgent
+    agent = ImageAnalysisAgent()
+    for deployment in agent.deployments.deployments:
+        redirect_deployment(deployment, f"http://127.0.0.1:{PORT}")
+
+    try:
+        report = await run_scenarios(agent, behaviour)
+    finally:
+        await agent.close()
+        server.should_exit = True
+        await server_task
+
+    print(json.dumps(report, indent=2, default=str))
+    return 0 if all(report["checks"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
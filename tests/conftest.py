@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import pytest
+import uvicorn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The local stand-ins for Azure services live with the benchmarks that also use them
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@asynccontextmanager
+async def _serve(app) -> AsyncIterator[str]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        # Don't wait for responses the test no longer reads, e.g. ones held back by injected latency
+        server.should_exit = server.force_exit = True
+        await task
+
+
+@pytest.fixture
+def serve():
+    """Async context manager serving an ASGI app on a free local port; yields its base URL"""
+    return _serve
+
+
+@pytest.fixture
+def azure_env(monkeypatch):
+    """Settings that let the agents be built without Azure; calls go to local stand-ins"""
+    for name, value in {
+        "AZURE_OPENAI_ENDPOINT": "https://fake-upstream.invalid",
+        "AZURE_OPENAI_API_KEY": "fake",
+        "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": "gpt-4o",
+        "IMAGE_ANALYSIS_CACHE_ENABLED": "false",
+        "IMAGE_PREPROCESS_ENABLED": "false",
+    }.items():
+        monkeypatch.setenv(name, value)
+    return monkeypatch
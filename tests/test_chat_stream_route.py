@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from api.agents.agent_registry import agent_registry
+from api.main import app
+from api.utils.resilience import CircuitOpenError, UpstreamTimeoutError
+
+
+class StubChatService:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def stream_chat_sk(self, request):
+        if self.error:
+            raise self.error
+        yield "delta", {"content": "Hello", "code": False}
+
+
+def stream_with(monkeypatch, service):
+    async def get(name):
+        return service
+
+    monkeypatch.setattr(agent_registry, "get", get)
+    # Not entered as a context manager, so the lifespan (agent client, probes) does not run
+    return TestClient(app).post("/chat-stream", json={"message": "Hi"})
+
+
+def test_open_circuit_before_the_first_event_answers_503_with_retry_after(monkeypatch):
+    response = stream_with(monkeypatch, StubChatService(CircuitOpenError("Upstream down", retry_after=4.2)))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert agent_registry.limiter("chat").stats()["in_flight"] == 0
+
+
+def test_first_token_deadline_answers_504(monkeypatch):
+    response = stream_with(monkeypatch, StubChatService(UpstreamTimeoutError("No first token")))
+    assert response.status_code == 504
+
+
+def test_stream_that_starts_is_sent_as_events(monkeypatch):
+    response = stream_with(monkeypatch, StubChatService())
+    assert response.status_code == 200
+    assert response.text == 'event: delta\ndata: {"content": "Hello", "code": false}\n\n'
+    assert agent_registry.limiter("chat").stats()["in_flight"] == 0
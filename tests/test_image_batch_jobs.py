@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import fake_blob_storage
+import fake_openai_upstream
+
+
+@pytest.fixture
+def batch_env(azure_env, tmp_path):
+    azure_env.setenv("IMAGE_ANALYSIS_COALESCING_ENABLED", "false")
+    azure_env.setenv("IMAGE_BATCH_RESULTS_DIR", str(tmp_path))
+    azure_env.setenv("IMAGE_BATCH_RETRY_BACKOFF_SECONDS", "0.01")
+    return azure_env
+
+
+def run_batch(serve, env, scenario, upstream=None, **manager_options):
+    """Run scenario(manager) with an ImageBatchJobManager whose images and model are local stand-ins"""
+    upstream = upstream or fake_openai_upstream.FakeUpstreamBehaviour()
+
+    async def main():
+        blob_app = fake_blob_storage.create_app(fake_blob_storage.FakeBlobStorageBehaviour())
+        async with serve(blob_app) as blob_url, serve(fake_openai_upstream.create_app(upstream)) as model_url:
+            env.setenv("AZURE_BLOB_CONNECTION_STRING", fake_blob_storage.connection_string(blob_url))
+            from api.agents.image_analysis_agent import ImageAnalysisAgent
+            from api.agents.image_batch_jobs import ImageBatchJobManager
+
+            agent = ImageAnalysisAgent()
+            for deployment in agent.deployments.deployments:
+                fake_openai_upstream.redirect_deployment(deployment, model_url)
+            manager = ImageBatchJobManager(agent, **manager_options)
+            try:
+                return await scenario(manager)
+            finally:
+                await manager.close()
+                await agent.close()
+
+    return asyncio.run(main())
+
+
+def read_results(path):
+    with open(path, encoding="utf-8") as results_file:
+        return [json.loads(line) for line in results_file]
+
+
+def test_job_writes_one_result_per_image(batch_env, serve):
+    # With a single attempt per image and a rejected request, exactly one image fails
+    upstream = fake_openai_upstream.FakeUpstreamBehaviour(fail_next=1, fail_status=400)
+
+    async def scenario(manager):
+        job = await manager.submit(message="Read the label", blob_names=[f"labels/{index}.png" for index in range(5)])
+        await asyncio.wait_for(job.done.wait(), 10)
+        return job
+
+    job = run_batch(serve, batch_env, scenario, upstream=upstream, concurrency=2, max_attempts=1)
+    assert (job.status, job.succeeded, job.failed, job.pending) == ("completed", 4, 1, 0)
+    results = read_results(job.results_path)
+    assert sorted(result["blob_name"] for result in results) == [f"labels/{index}.png" for index in range(5)]
+    assert sorted(result["status"] for result in results) == ["failed"] + ["succeeded"] * 4
+    assert all("SN-4471-B" in result["content"] for result in results if result["status"] == "succeeded")
+
+
+def test_failed_result_write_counts_the_image_once(batch_env, serve, monkeypatch):
+    from api.agents.image_batch_jobs import ImageBatchJobManager
+    append_result = ImageBatchJobManager._append_result
+
+    def flaky_append(results_path, record):
+        if record["blob_name"] == "labels/1.png":
+            raise OSError("No space left on device")
+        append_result(results_path, record)
+
+    monkeypatch.setattr(ImageBatchJobManager, "_append_result", staticmethod(flaky_append))
+
+    async def scenario(manager):
+        job = await manager.submit(blob_names=[f"labels/{index}.png" for index in range(3)])
+        await asyncio.wait_for(job.done.wait(), 10)
+        return job
+
+    job = run_batch(serve, batch_env, scenario)
+    assert (job.status, job.succeeded, job.failed, job.pending) == ("completed", 2, 1, 0)
+    assert len(read_results(job.results_path)) == 2
+
+
+def test_completed_jobs_are_evicted_with_their_results(batch_env, serve):
+    async def scenario(manager):
+        jobs = []
+        for index in range(3):
+            job = await manager.submit(blob_names=[f"labels/{index}.png"])
+            await asyncio.wait_for(job.done.wait(), 10)
+            jobs.append(job)
+        return jobs, set(manager.jobs)
+
+    jobs, kept = run_batch(serve, batch_env, scenario, max_jobs=2)
+    assert kept == {jobs[1].job_id, jobs[2].job_id}
+    assert not os.path.exists(jobs[0].results_path)
+    assert os.path.exists(jobs[2].results_path)
+
+
+def test_expired_jobs_are_evicted_and_running_jobs_kept(batch_env, serve):
+    upstream = fake_openai_upstream.FakeUpstreamBehaviour()
+
+    async def scenario(manager):
+        finished = await manager.submit(blob_names=["labels/0.png"])
+        await asyncio.wait_for(finished.done.wait(), 10)
+        upstream.latency = 0.5
+        running = await manager.submit(blob_names=["labels/1.png"])
+        await asyncio.sleep(0.2)
+        # Submitting evicts the completed job past its retention, but not the one still running
+        await manager.submit(blob_names=["labels/2.png"])
+        return finished, running, set(manager.jobs)
+
+    finished, running, kept = run_batch(serve, batch_env, scenario, upstream=upstream, retention_seconds=0.1)
+    assert finished.job_id not in kept
+    assert running.job_id in kept
+    assert not os.path.exists(finished.results_path)
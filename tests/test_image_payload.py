@@ -0,0 +1,32 @@
+import base64
+
+import pytest
+
+from api.utils.image_payload import ImagePayload
+
+RAW = bytes(range(256))
+STANDARD = base64.b64encode(RAW).decode()
+URL_SAFE = base64.urlsafe_b64encode(RAW).decode()
+
+
+@pytest.mark.parametrize("data", [
+    STANDARD,
+    URL_SAFE,
+    URL_SAFE.rstrip("="),
+    STANDARD.rstrip("="),
+    STANDARD[:76] + "\r\n" + STANDARD[76:],
+])
+def test_data_url_decodes_to_the_original_bytes(data):
+    payload = ImagePayload.from_data_url(f"data:image/png;base64,{data}")
+    assert bytes(payload.raw) == RAW
+
+
+@pytest.mark.parametrize("data", [
+    "",
+    "====",
+    STANDARD[:10] + "*" + STANDARD[10:],
+    STANDARD[:12] + "==" + STANDARD[12:],
+    STANDARD[:-3],
+])
+def test_corrupt_or_empty_data_url_is_rejected(data):
+    assert ImagePayload.from_data_url(f"data:image/png;base64,{data}") is None
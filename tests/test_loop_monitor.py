@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from api.utils.loop_monitor import EventLoopMonitor
+
+
+def _block_loop(seconds):
+    time.sleep(seconds)
+
+
+def test_watchdog_captures_the_stack_of_a_stall_just_over_the_threshold():
+    monitor = EventLoopMonitor(interval_seconds=0.1, block_threshold_seconds=0.1, capture_stacks=True)
+    monitor.enabled = True
+
+    async def main():
+        await monitor.start()
+        try:
+            samples = monitor.samples
+            while monitor.samples == samples:
+                await asyncio.sleep(0)
+            # Starts right after a wake-up, so the sampling sleep ends 0.1s in and the lag is just over 0.1s
+            _block_loop(0.203)
+            await asyncio.sleep(0.15)
+        finally:
+            await monitor.stop()
+
+    asyncio.run(main())
+    report = monitor.report()
+    assert report["blocking_episodes"] == 1
+    assert report["stacks_captured"] == 1
+    assert "in _block_loop" in report["top_blocking_sites"][0]["site"]
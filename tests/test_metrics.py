@@ -0,0 +1,17 @@
+from api.utils.metrics import MetricsRegistry
+
+
+def test_component_totals_are_counters_and_current_values_gauges():
+    registry = MetricsRegistry()
+    text = registry.render([
+        ("cache", {"tier": "memory"}, {"hits": 3, "size": 2, "wait_seconds_total": 1.5, "hit_rate": 0.75,
+                                       "nested": {"misses": 1, "in_flight": 0}}),
+    ])
+
+    assert "# TYPE agent_hub_cache_hits counter" in text
+    assert "# TYPE agent_hub_cache_wait_seconds_total counter" in text
+    assert "# TYPE agent_hub_cache_nested_misses counter" in text
+    assert "# TYPE agent_hub_cache_size gauge" in text
+    assert "# TYPE agent_hub_cache_hit_rate gauge" in text
+    assert "# TYPE agent_hub_cache_nested_in_flight gauge" in text
+    assert 'agent_hub_cache_hits{tier="memory"} 3.0' in text
@@ -0,0 +1,204 @@
+import asyncio
+import json
+from contextlib import AsyncExitStack
+
+import pytest
+
+from fake_openai_upstream import FakeUpstreamBehaviour, create_app, redirect_deployment
+
+from api.agents.dependency_probes import DependencyProbes
+from api.models.api_models import ChatThreadRequest
+from api.utils.health_monitor import DependencyHealthMonitor
+from api.utils.image_payload import ImagePayload
+
+NAMES = ["east", "west", "north"]
+
+# A 1x1 PNG
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+
+@pytest.fixture
+def deployments_env(azure_env):
+    azure_env.delenv("AZURE_OPENAI_ENDPOINT")
+    azure_env.delenv("AZURE_AI_AGENT_ENDPOINT", raising=False)
+    azure_env.delenv("AZURE_BLOB_CONNECTION_STRING", raising=False)
+    azure_env.setenv("UPSTREAM_MODEL_DEPLOYMENT_BASE_DELAY_SECONDS", "0.01")
+    return azure_env
+
+
+def run_against_deployments(serve, env, apps, scenario, configure_urls=False, deployment_names=None):
+    """
+    Serve one fake upstream app per deployment, configure the deployments through
+    AZURE_OPENAI_CHAT_DEPLOYMENTS and run scenario(urls)
+
+    Semantic Kernel only accepts https endpoints, so agents are configured with placeholders and
+    redirected; configure_urls puts the fakes' own URLs in the configuration instead.
+    deployment_names overrides the Azure deployment name ('gpt-4o') per deployment.
+    """
+    async def main():
+        async with AsyncExitStack() as stack:
+            urls = {name: await stack.enter_async_context(serve(apps[name])) for name in NAMES}
+            env.setenv("AZURE_OPENAI_CHAT_DEPLOYMENTS", json.dumps([
+                {"name": name, "deployment": (deployment_names or {}).get(name, "gpt-4o"),
+                 "endpoint": url if configure_urls else f"https://{name}.fake-upstream.invalid"}
+                for name, url in urls.items()]))
+            return await scenario(urls)
+
+    return asyncio.run(main())
+
+
+def apps_for(behaviours):
+    return {name: create_app(behaviour) for name, behaviour in behaviours.items()}
+
+
+async def with_agent(urls, scenario):
+    from api.agents.image_analysis_agent import ImageAnalysisAgent
+    agent = ImageAnalysisAgent()
+    for deployment in agent.deployments.deployments:
+        redirect_deployment(deployment, urls[deployment.name])
+    try:
+        return await scenario(agent)
+    finally:
+        await agent.close()
+
+
+async def run_load(agent, total: int = 45, concurrency: int = 9) -> dict:
+    request = ChatThreadRequest(message="Read the serial number", bypass_cache=True)
+    images = [ImagePayload.from_bytes(PIXEL, "image/png")]
+    before = {name: stats["requests"] for name, stats in agent.deployments.stats().items()}
+    remaining = iter(range(total))
+    errors = []
+
+    async def worker():
+        for _ in remaining:
+            try:
+                await agent.analyze_image_payloads(request, images)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    after = agent.deployments.stats()
+    return {"errors": errors, "calls": {name: after[name]["requests"] - before[name] for name in NAMES}}
+
+
+def test_slow_deployment_gets_fewest_calls(deployments_env, serve):
+    behaviours = {"east": FakeUpstreamBehaviour(latency=0.05), "west": FakeUpstreamBehaviour(latency=0.05),
+                  "north": FakeUpstreamBehaviour(latency=0.3)}
+
+    async def scenario(agent):
+        agent.deployments.strategy = "least_outstanding"
+        return await run_load(agent)
+
+    result = run_against_deployments(
+        serve, deployments_env, apps_for(behaviours), lambda urls: with_agent(urls, scenario))
+    calls = result["calls"]
+    assert not result["errors"]
+    assert calls["north"] < min(calls["east"], calls["west"])
+
+
+def test_throttled_deployment_is_ejected_then_readmitted(deployments_env, serve):
+    behaviours = {"east": FakeUpstreamBehaviour(latency=0.02), "west": FakeUpstreamBehaviour(latency=0.02),
+                  "north": FakeUpstreamBehaviour(latency=0.02, fail_next=10 ** 6, retry_after=0.5)}
+
+    async def scenario(agent):
+        throttled = await run_load(agent)
+        ejections = agent.deployments.stats()["north"]["ejections"]
+        behaviours["north"].fail_next = 0
+        await asyncio.sleep(0.6)
+        readmitted = await run_load(agent)
+        return throttled, ejections, readmitted
+
+    throttled, ejections, readmitted = run_against_deployments(
+        serve, deployments_env, apps_for(behaviours), lambda urls: with_agent(urls, scenario))
+    assert not throttled["errors"]
+    assert ejections == 1
+    # Only calls sent before its first 429 came back may reach it
+    assert throttled["calls"]["north"] <= 3
+    assert readmitted["calls"]["north"] > 0
+
+
+def test_deployment_with_most_quota_gets_most_calls(deployments_env, serve):
+    behaviours = {"east": FakeUpstreamBehaviour(remaining_tokens=100_000),
+                  "west": FakeUpstreamBehaviour(remaining_tokens=20_000),
+                  "north": FakeUpstreamBehaviour(remaining_tokens=5_000)}
+
+    async def scenario(agent):
+        agent.deployments.strategy = "remaining_quota"
+        return await run_load(agent)
+
+    result = run_against_deployments(
+        serve, deployments_env, apps_for(behaviours), lambda urls: with_agent(urls, scenario))
+    calls = result["calls"]
+    assert calls["east"] > calls["west"] and calls["east"] > calls["north"]
+
+
+def test_probes_cover_every_deployment_without_completions(deployments_env, serve):
+    behaviours = {name: FakeUpstreamBehaviour() for name in NAMES}
+    apps = apps_for(behaviours)
+
+    async def scenario(urls):
+        probes = DependencyProbes()
+        monitor = DependencyHealthMonitor(interval_seconds=30, timeout_seconds=2)
+        probes.register(monitor)
+        try:
+            await monitor.refresh()
+            all_up = monitor.report()
+
+            behaviours["north"].fail_next = 1
+            await monitor.refresh()
+            one_down = monitor.report()
+
+            for behaviour in behaviours.values():
+                behaviour.fail_next, behaviour.fail_status = 1, 503
+            await monitor.refresh()
+            all_down = monitor.report()
+        finally:
+            await probes.close()
+        return all_up, one_down, all_down
+
+    all_up, one_down, all_down = run_against_deployments(
+        serve, deployments_env, apps, scenario, configure_urls=True)
+    names = [f"model_deployment:{name}" for name in NAMES]
+    assert all_up["status"] == "ready"
+    assert [all_up["dependencies"][name]["status"] for name in names] == ["ok"] * 3
+
+    # The other deployments still serve calls, so one failing deployment does not take the service out
+    assert one_down["status"] == "ready"
+    assert one_down["dependencies"]["model_deployment:north"]["status"] == "error"
+
+    assert all_down["status"] == "not_ready"
+    assert sorted(all_down["failing"]) == sorted(names)
+
+    # Every round probed each deployment; no completion was requested
+    assert [apps[name].state.probes for name in NAMES] == [3, 3, 3]
+    assert [apps[name].state.requests for name in NAMES] == [0, 0, 0]
+
+
+def test_probe_fails_for_a_deployment_that_does_not_exist(deployments_env, serve):
+    behaviours = {name: FakeUpstreamBehaviour(deployments=["gpt-4o"]) for name in NAMES}
+    apps = apps_for(behaviours)
+
+    async def scenario(urls):
+        probes = DependencyProbes()
+        monitor = DependencyHealthMonitor(interval_seconds=30, timeout_seconds=2)
+        probes.register(monitor)
+        try:
+            await monitor.refresh()
+            return monitor.report()
+        finally:
+            await probes.close()
+
+    report = run_against_deployments(
+        serve, deployments_env, apps, scenario, configure_urls=True, deployment_names={"north": "gpt-4o-typo"})
+    assert report["dependencies"]["model_deployment:east"]["status"] == "ok"
+    assert report["dependencies"]["model_deployment:north"]["status"] == "error"
+    assert "404" in report["dependencies"]["model_deployment:north"]["error"]
+
+
+def test_unconfigured_model_deployment_is_reported(deployments_env):
+    deployments_env.delenv("AZURE_OPENAI_CHAT_DEPLOYMENTS", raising=False)
+    monitor = DependencyHealthMonitor(interval_seconds=30, timeout_seconds=2)
+    DependencyProbes().register(monitor)
+    assert monitor.report()["dependencies"]["model_deployment"]["status"] == "not_configured"
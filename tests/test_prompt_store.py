@@ -0,0 +1,60 @@
+import logging
+import os
+
+import pytest
+
+from api.agents.prompt_store import PromptError, PromptStore
+
+
+def write_prompt(directory, text):
+    (directory / "image_analysis_system_prompt.txt").write_text(text, encoding="utf-8")
+
+
+def test_placeholders_render_and_escape(tmp_path):
+    write_prompt(tmp_path, "Read labels at ${site}. Keep $${literal} and $5 as they are.")
+    prompt = PromptStore(str(tmp_path), check_interval_seconds=-1).get("image_analysis_system_prompt.txt")
+
+    assert prompt.variables == {"site"}
+    assert prompt.render(site="Plant 4") == "Read labels at Plant 4. Keep ${literal} and $5 as they are."
+    with pytest.raises(PromptError):
+        prompt.render()
+
+
+def test_image_analysis_agent_renders_prompt_values(azure_env, tmp_path, monkeypatch):
+    from api.agents import image_analysis_agent
+    from api.agents.image_analysis_agent import ImageAnalysisAgent
+
+    write_prompt(tmp_path, "Read labels at ${site}.")
+    store = PromptStore(str(tmp_path), check_interval_seconds=-1)
+    monkeypatch.setattr(image_analysis_agent.AgentUtils, "get_prompt", lambda self, name: store.get(name))
+
+    azure_env.setenv("IMAGE_ANALYSIS_PROMPT_VALUES", '{"site": "Plant 4"}')
+    agent = ImageAnalysisAgent()
+    prompt = agent._get_system_prompt()
+    service_id = agent.deployments.deployments[0].service_id
+    assert agent._get_agent(prompt, service_id).instructions == "Read labels at Plant 4."
+
+    # A placeholder without a value fails the build rather than the first request
+    azure_env.delenv("IMAGE_ANALYSIS_PROMPT_VALUES")
+    with pytest.raises(PromptError):
+        ImageAnalysisAgent()
+
+
+def test_reload_needing_an_undeclared_value_keeps_the_last_good_version(tmp_path, caplog):
+    write_prompt(tmp_path, "Read labels at ${site}.")
+    store = PromptStore(str(tmp_path), check_interval_seconds=0)
+    store.declare_values("image_analysis_system_prompt.txt", {"site": "Plant 4"})
+    good = store.get("image_analysis_system_prompt.txt")
+
+    write_prompt(tmp_path, "Read labels at ${site} on ${line}.")
+    os.utime(tmp_path / "image_analysis_system_prompt.txt", ns=(good.mtime_ns + 10 ** 9,) * 2)
+    with caplog.at_level(logging.ERROR):
+        kept = store.get("image_analysis_system_prompt.txt")
+    assert kept is good
+    assert kept.render(site="Plant 4") == "Read labels at Plant 4."
+    assert store.stats()["reload_errors"] == 1
+    assert "line" in caplog.text
+
+    # Once the value is supplied the new version loads
+    store.declare_values("image_analysis_system_prompt.txt", {"site": "Plant 4", "line": "3"})
+    assert store.get("image_analysis_system_prompt.txt").variables == {"site", "line"}
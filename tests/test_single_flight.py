@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from api.utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def analyse():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(flight.do("image", analyse), flight.do("image", analyse))
+
+    assert asyncio.run(main()) == ["result", "result"]
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "waiters": 0, "leaders": 1, "followers": 1, "abandoned": 0}
+
+
+def test_cancelled_waiter_leaves_the_others_with_the_result():
+    flight = SingleFlight()
+
+    async def analyse():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("image", analyse))
+        follower = asyncio.create_task(flight.do("image", analyse))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "result"
+    assert flight.stats()["abandoned"] == 0
+
+
+def test_cancelling_the_last_waiter_cancels_the_call():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def analyse():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "result"
+
+    async def main():
+        waiters = [asyncio.create_task(flight.do("image", analyse)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # Let the shared call see its cancellation
+        await asyncio.sleep(0)
+        return flight.stats()
+
+    stats = asyncio.run(main())
+    assert cancelled == [True]
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter_and_clears_the_key():
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+
+    async def succeeding():
+        return "result"
+
+    async def main():
+        results = await asyncio.gather(
+            flight.do("image", failing), flight.do("image", failing), return_exceptions=True)
+        retried = await flight.do("image", succeeding)
+        return results, retried
+
+    results, retried = asyncio.run(main())
+    assert len(calls) == 1
+    assert [str(error) for error in results] == ["upstream failed", "upstream failed"]
+    assert all(isinstance(error, RuntimeError) for error in results)
+    assert retried == "result"
+    assert flight.stats()["in_flight"] == 0
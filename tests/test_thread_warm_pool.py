@@ -0,0 +1,38 @@
+import asyncio
+
+from fake_agent_service import FakeAgentServiceBehaviour, attach_agent_client_pool, create_app
+
+
+def test_pool_fills_when_chat_agent_is_built_and_serves_file_turns(azure_env, serve):
+    azure_env.setenv("AZURE_AI_AGENT_ENDPOINT", "https://fake-agents.invalid/api/projects/p")
+    azure_env.setenv("AZURE_AI_AGENT_ID", "asst_fake")
+    azure_env.setenv("AGENT_THREAD_POOL_SIZE", "2")
+    app = create_app(FakeAgentServiceBehaviour())
+
+    async def main():
+        from api.agents.agent_client_pool import agent_client_pool
+        from api.agents.agent_registry import _build_chat_agent
+
+        async with serve(app) as base_url:
+            attach_agent_client_pool(agent_client_pool, base_url)
+            service = await _build_chat_agent()
+            try:
+                # Filled in the background without any request asking for a thread
+                for _ in range(100):
+                    if service.thread_pool.stats()["size"] == 2:
+                        break
+                    await asyncio.sleep(0.01)
+                filled = service.thread_pool.stats()
+
+                client = await agent_client_pool.get_client()
+                thread_id = await service._attach_file_to_thread(client, None, "file-a", "a" * 64)
+                thread = await client.agents.threads.get(thread_id)
+                return filled, service.thread_pool.stats(), thread
+            finally:
+                await service.close()
+                await agent_client_pool.close()
+
+    filled, after, thread = asyncio.run(main())
+    assert filled["size"] == 2 and filled["misses"] == 0
+    assert after["hits"] == 1
+    assert thread.tool_resources.file_search.vector_store_ids
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from fake_openai_upstream import FakeUpstreamBehaviour, create_app, redirect_deployment
+
+from api.models.api_models import ChatThreadRequest, ImageFile
+from api.utils.image_payload import ImagePayload
+from api.utils.resilience import UpstreamGuard, UpstreamTimeoutError, deadline_expired
+
+# A 1x1 PNG
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+REQUEST = ChatThreadRequest(message="Read the serial number", bypass_cache=True)
+STREAM_REQUEST = ChatThreadRequest(
+    message="Read the serial number", bypass_cache=True,
+    files=[ImageFile(name="label.png", data_url=ImagePayload.from_bytes(PIXEL, "image/png").data_url)])
+
+
+@pytest.fixture
+def upstream_env(azure_env):
+    # Short deadlines and recovery so every scenario finishes in about a second
+    for name, value in {
+        "UPSTREAM_MODEL_DEPLOYMENT_FIRST_TOKEN_TIMEOUT_SECONDS": "0.3",
+        "UPSTREAM_MODEL_DEPLOYMENT_STREAM_IDLE_TIMEOUT_SECONDS": "0.3",
+        "UPSTREAM_MODEL_DEPLOYMENT_GENERATION_TIMEOUT_SECONDS": "2",
+        "UPSTREAM_MODEL_DEPLOYMENT_MAX_ATTEMPTS": "3",
+        "UPSTREAM_MODEL_DEPLOYMENT_BASE_DELAY_SECONDS": "0.05",
+        "UPSTREAM_MODEL_DEPLOYMENT_FAILURE_THRESHOLD": "3",
+        "UPSTREAM_MODEL_DEPLOYMENT_RECOVERY_SECONDS": "0.5",
+        "AZURE_OPENAI_EJECT_SECONDS": "0.5",
+    }.items():
+        azure_env.setenv(name, value)
+
+
+def run_against_upstream(serve, behaviour, scenario):
+    """Run scenario(agent) with an ImageAnalysisAgent whose deployments point at the fake upstream"""
+    from api.agents.image_analysis_agent import ImageAnalysisAgent
+
+    async def main():
+        async with serve(create_app(behaviour)) as base_url:
+            agent = ImageAnalysisAgent()
+            for deployment in agent.deployments.deployments:
+                redirect_deployment(deployment, base_url)
+            try:
+                return await scenario(agent)
+            finally:
+                await agent.close()
+
+    return asyncio.run(main())
+
+
+async def drain_stream(agent):
+    events = []
+    async for event_type, payload in agent.analyze_images_streaming(STREAM_REQUEST):
+        if event_type in ("delta", "error"):
+            events.append(event_type)
+    return events
+
+
+def test_throttled_call_waits_out_retry_after(upstream_env, serve):
+    behaviour = FakeUpstreamBehaviour(fail_next=2, fail_status=429, retry_after=0.2)
+
+    async def scenario(agent):
+        start = time.perf_counter()
+        result = await agent.analyze_image_payloads(REQUEST, [ImagePayload.from_bytes(PIXEL, "image/png")])
+        return result, time.perf_counter() - start, agent.upstream.stats()
+
+    result, seconds, stats = run_against_upstream(serve, behaviour, scenario)
+    assert "SN-4471-B" in result.content
+    assert seconds >= 0.4
+    assert stats["retries"] == 2
+
+
+def test_slow_first_token_is_cut_at_deadline(upstream_env, serve):
+    behaviour = FakeUpstreamBehaviour(latency=10.0)
+
+    async def scenario(agent):
+        start = time.perf_counter()
+        events = await drain_stream(agent)
+        return events, time.perf_counter() - start, agent.upstream.stats()
+
+    events, seconds, stats = run_against_upstream(serve, behaviour, scenario)
+    assert events[-1] == "error"
+    # Three attempts of 0.3s each instead of one 10s wait
+    assert seconds < 2.0
+    assert stats["timeouts"] == 3
+
+
+def test_stalled_stream_is_cut_at_idle_deadline_without_restart(upstream_env, serve):
+    behaviour = FakeUpstreamBehaviour(stall_after_first_chunk=2.0)
+
+    async def scenario(agent):
+        start = time.perf_counter()
+        events = await drain_stream(agent)
+        return events, time.perf_counter() - start, agent.upstream.stats()
+
+    events, seconds, stats = run_against_upstream(serve, behaviour, scenario)
+    assert events[0] == "delta"
+    assert events[-1] == "error"
+    assert seconds < 1.5
+    assert stats["retries"] == 0
+
+
+def test_outage_opens_circuit_and_trial_call_closes_it(upstream_env, serve):
+    behaviour = FakeUpstreamBehaviour(fail_next=1000, fail_status=503)
+    images = [ImagePayload.from_bytes(PIXEL, "image/png")]
+
+    async def scenario(agent):
+        errors = []
+        for _ in range(3):
+            try:
+                await agent.analyze_image_payloads(REQUEST, images)
+            except Exception as e:
+                errors.append(type(e).__name__)
+        opened = agent.upstream.breaker.state
+
+        start = time.perf_counter()
+        try:
+            await agent.analyze_image_payloads(REQUEST, images)
+        except Exception as e:
+            errors.append(type(e).__name__)
+        fail_fast_seconds = time.perf_counter() - start
+
+        behaviour.fail_next = 0
+        await asyncio.sleep(agent.upstream.breaker.recovery_seconds)
+        result = await agent.analyze_image_payloads(REQUEST, images)
+        return errors, opened, fail_fast_seconds, result, agent.upstream.breaker.state
+
+    errors, opened, fail_fast_seconds, result, closed = run_against_upstream(serve, behaviour, scenario)
+    assert opened == "open"
+    assert errors[-1] == "CircuitOpenError"
+    assert fail_fast_seconds < 0.05
+    assert "SN-4471-B" in result.content
+    assert closed == "closed"
+
+
+def test_deadline_is_visible_inside_the_attempt():
+    guard = UpstreamGuard("test", {"call": 0.05}, max_attempts=1)
+    seen = []
+
+    async def operation():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            seen.append(deadline_expired())
+            raise
+
+    with pytest.raises(UpstreamTimeoutError):
+        asyncio.run(guard.call("call", operation))
+    assert seen == [True]
+    assert guard.stats()["timeouts"] == 1
+
+
+def test_client_cancellation_is_not_a_deadline():
+    guard = UpstreamGuard("test", {"call": 5}, max_attempts=1)
+    seen = []
+
+    async def operation():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            seen.append(deadline_expired())
+            raise
+
+    async def main():
+        task = asyncio.create_task(guard.call("call", operation))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert seen == [False]
+    assert guard.stats()["timeouts"] == 0
+    assert guard.breaker.state == "closed"
+
+
+def test_stream_keeps_span_context_of_a_traced_iterator(caplog):
+    # Semantic Kernel keeps its invocation span current across the items of a stream
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer(__name__)
+    guard = UpstreamGuard("test", {"first_token": 1, "stream_idle": 1}, max_attempts=1)
+
+    async def invoke_stream():
+        with tracer.start_as_current_span("invoke_stream"):
+            for index in range(3):
+                await asyncio.sleep(0)
+                with tracer.start_as_current_span(f"item {index}"):
+                    pass
+                yield index
+
+    async def main():
+        with tracer.start_as_current_span("request"):
+            return [item async for item in guard.stream("generation", invoke_stream)]
+
+    with caplog.at_level(logging.ERROR, logger="opentelemetry.context"):
+        items = asyncio.run(main())
+
+    assert items == [0, 1, 2]
+    assert "Failed to detach context" not in caplog.text
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans["invoke_stream"].parent.span_id == spans["request"].context.span_id
+    for index in range(3):
+        assert spans[f"item {index}"].parent.span_id == spans["invoke_stream"].context.span_id